@@ -180,6 +180,10 @@ def upload(identifier, files,
            retries_sleep=None,
            debug=None,
            request_kwargs=None,
+           workers=None,
+           multipart_threshold=None,
+           part_size=None,
+           journal=None,
            **get_item_kwargs):
     """Upload files to an item. The item will be created if it does not exist.
 
@@ -208,7 +212,9 @@ def upload(identifier, files,
 
     :type verify: bool
     :param verify: (optional) Verify local MD5 checksum matches the MD5 checksum of the
-                   file received by IAS3.
+                   file received by IAS3. Unless its md5 is already known, or
+                   ``delete`` is set, a file is checked against the ETag of the
+                   response after IAS3 has stored it, see :meth:`Item.upload_file`.
 
     :type checksum: bool
     :param checksum: (optional) Skip uploading files based on checksum.
@@ -222,12 +228,28 @@ def upload(identifier, files,
                     503 SlowDown error.
 
     :type retries_sleep: int
-    :param retries_sleep: (optional) Amount of time to sleep between ``retries``.
+    :param retries_sleep: (optional) Maximum amount of time to sleep between
+                          ``retries``, which back off exponentially.
 
     :type debug: bool
     :param debug: (optional) Set to True to print headers to stdout, and exit without
                   sending the upload request.
 
+    :type workers: int
+    :param workers: (optional) Number of files to upload concurrently.
+
+    :type multipart_threshold: int
+    :param multipart_threshold: (optional) Size in bytes above which files are sent
+                                with a multipart upload (default: 1 GiB).
+
+    :type part_size: int
+    :param part_size: (optional) Size in bytes of each part of a multipart upload
+                      (default: 100 MiB).
+
+    :type journal: :class:`UploadJournal <UploadJournal>`
+    :param journal: (optional) Record confirmed uploads in this journal, and skip files
+                    it records as uploaded, e.g. to resume an interrupted upload.
+
     :param \*\*kwargs: Optional arguments that ``get_item`` takes.
     """
     item = get_item(identifier, **get_item_kwargs)
@@ -244,7 +266,11 @@ def upload(identifier, files,
                        retries=retries,
                        retries_sleep=retries_sleep,
                        debug=debug,
-                       request_kwargs=request_kwargs)
+                       request_kwargs=request_kwargs,
+                       workers=workers,
+                       multipart_threshold=multipart_threshold,
+                       part_size=part_size,
+                       journal=journal)
 
 
 def download(identifier,
@@ -262,6 +288,9 @@ def download(identifier,
              retries=None,
              item_index=None,
              ignore_errors=None,
+             workers=None,
+             segments=None,
+             verify=None,
              **get_item_kwargs):
     """Download files from an item.
 
@@ -300,6 +329,17 @@ def download(identifier,
     :type verbose: bool
     :param verbose: (optional) Display download progress.
 
+    :type workers: int
+    :param workers: (optional) Number of files to download concurrently.
+
+    :type segments: int
+    :param segments: (optional) Download files larger than 100 MiB as this many
+                     concurrent byte ranges.
+
+    :type verify: bool
+    :param verify: (optional) Verify downloaded files against the checksums in the
+                   item metadata.
+
     :param \*\*kwargs: Optional arguments that ``get_item`` takes.
     """
     item = get_item(identifier, **get_item_kwargs)
@@ -316,7 +356,10 @@ def download(identifier,
                   no_directory=no_directory,
                   retries=retries,
                   item_index=item_index,
-                  ignore_errors=ignore_errors)
+                  ignore_errors=ignore_errors,
+                  workers=workers,
+                  segments=segments,
+                  verify=verify)
 
 
 def delete(identifier,
@@ -431,7 +474,10 @@ def search_items(query,
                  config=None,
                  config_file=None,
                  http_adapter_kwargs=None,
-                 request_kwargs=None):
+                 request_kwargs=None,
+                 scrape=None,
+                 rows=None,
+                 prefetch=None):
     """Search for items on Archive.org.
 
     :type query: str
@@ -449,6 +495,17 @@ def search_items(query,
     :type config: dict
     :param secure: (optional) Configuration options for session.
 
+    :type scrape: bool
+    :param scrape: (optional) Page through results with the scrape API's cursor, for
+                   large result sets.
+
+    :type rows: int
+    :param rows: (optional) Number of results to request per page.
+
+    :type prefetch: int
+    :param prefetch: (optional) Number of pages to request concurrently, ahead of the
+                     results being iterated over.
+
     :returns: A :class:`Search` object, yielding search results.
     """
     if not archive_session:
@@ -457,7 +514,10 @@ def search_items(query,
                                         fields=fields,
                                         params=params,
                                         config=config,
-                                        request_kwargs=request_kwargs)
+                                        request_kwargs=request_kwargs,
+                                        scrape=scrape,
+                                        rows=rows,
+                                        prefetch=prefetch)
 
 
 def configure(username=None, password=None):
@@ -37,3 +37,30 @@ def get_args_dict(strings):
         if len(args[key]) <= 1:
             args[key] = args[key][0]
     return args
+
+
+def get_jobs(jobs, workers, single=None, progress=None):
+    """Split a ``--jobs`` budget of concurrent connections into items
+    processed in parallel, each using up to ``workers`` connections.
+
+    :type jobs: int
+    :param jobs: The maximum number of concurrent connections in total
+                 (defaults to ``workers``).
+
+    :type single: bool
+    :param single: (optional) Only one item is processed.
+
+    :type progress: bool
+    :param progress: (optional) Per-file progress would be printed.
+
+    :rtype: tuple
+    :returns: ``(item_jobs, workers, summary_only)``, where
+              ``summary_only`` is True if concurrent items should only
+              report a summary line each, as their interleaved per-file
+              progress is unreadable.
+    """
+    jobs = jobs if jobs else workers
+    workers = min(workers, jobs)
+    item_jobs = 1 if single else max(1, jobs // workers)
+    summary_only = (item_jobs > 1) and bool(progress)
+    return (item_jobs, workers, summary_only)
@@ -13,7 +13,19 @@ options:
     -d, --dry-run               Print URLs to stdout and exit.
     -i, --ignore-existing       Clobber files already downloaded.
     -C, --checksum              Skip files based on checksum [default: False].
+    --verify                    Verify downloaded files against the checksums
+                                in the item metadata [default: False].
     -R, --retries=<retries>     Set number of retries to <retries> [default: 5]
+    -w, --workers=<workers>     Number of files to download concurrently from
+                                each item [default: 1].
+    -j, --jobs=<jobs>           Maximum number of concurrent file downloads in
+                                total (defaults to the number of workers). When
+                                downloading an itemlist or search results, items
+                                are downloaded in parallel within this limit.
+    --queue-size=<size>         Maximum number of items to fetch metadata for
+                                ahead of the downloads in progress [default: 10].
+    --segments=<segments>       Download files larger than 100 MiB as this many
+                                concurrent byte ranges [default: 1].
     -I, --itemlist=<itemlist>   Download items from a specified itemlist.
     -S, --search=<query>        Download items returned from a specified search query.
     -s, --source=<source>...    Only download files matching the given source.
@@ -41,6 +53,8 @@ from docopt import docopt, printable_usage
 from schema import Schema, Use, Or, And, SchemaError
 
 from internetarchive import search_items
+from internetarchive.cli.argparser import get_jobs
+from internetarchive.utils import iter_threaded
 
 
 def itemlist_ids(itemlist):
@@ -48,8 +62,23 @@ def itemlist_ids(itemlist):
         yield line.strip()
 
 
-def search_ids(query):
-    for doc in search_items(query):
+def iter_items(session, ids, workers, queue_size):
+    """Yield ``(identifier, item, exception)`` tuples in itemlist order.
+
+    Metadata for up to ``queue_size`` upcoming items is fetched in the
+    background while earlier items are being downloaded.
+    """
+    def get_item(identifier):
+        try:
+            return (identifier, session.get_item(identifier), None)
+        except Exception as exc:
+            return (identifier, None, exc)
+
+    return iter_threaded(get_item, ids, workers, window=queue_size)
+
+
+def search_ids(search):
+    for doc in search:
         yield doc.get('identifier')
 
 
@@ -87,6 +116,15 @@ def main(argv, session):
         '--itemlist': Or(str, None),
         '<identifier>': Or(str, None),
         '--retries': Use(lambda x: x[0]),
+        '--workers': And(Use(lambda x: int(x[0])), lambda x: x > 0,
+                         error='--workers must be a positive integer.'),
+        '--jobs': Or(None, And(Use(lambda x: int(x[0]) if x else None),
+                               Or(None, lambda x: x > 0)),
+                     error='--jobs must be a positive integer.'),
+        '--queue-size': And(Use(lambda x: int(x[0])), lambda x: x > 0,
+                            error='--queue-size must be a positive integer.'),
+        '--segments': And(Use(lambda x: int(x[0])), lambda x: x > 0,
+                          error='--segments must be a positive integer.'),
     })
 
     # Filenames should be unicode literals. Support PY2 and PY3.
@@ -103,12 +141,17 @@ def main(argv, session):
     retries = int(args['--retries'])
 
     if args['--itemlist']:
-        ids = [x.strip() for x in open(args['--itemlist'])]
-        total_ids = len(ids)
+        # Count the itemlist rather than loading it, it is streamed below.
+        with open(args['--itemlist']) as fh:
+            total_ids = sum(1 for _ in fh)
+        ids = itemlist_ids(args['--itemlist'])
     elif args['--search']:
-        _search = search_items(args['--search'])
-        total_ids = _search.num_found
-        ids = search_ids(args['--search'])
+        _search = search_items(args['--search'], fields=['identifier'],
+                               archive_session=session)
+        # The count is read from the first page of results once they are
+        # being iterated over, rather than requested on its own.
+        total_ids = None
+        ids = search_ids(_search)
 
     # Download specific files.
     if args['<identifier>']:
@@ -123,26 +166,31 @@ def main(argv, session):
     else:
         files = None
 
-    errors = list()
-    for i, identifier in enumerate(ids):
-        if total_ids > 1:
-            item_index = '{0}/{1}'.format((i + 1), total_ids)
+    if args['--source']:
+        ia_source = args['--source']
+    elif args['--original']:
+        ia_source = ['original']
+    else:
+        ia_source = None
+
+    item_jobs, workers, summary_only = get_jobs(
+        args['--jobs'], args['--workers'],
+        single=args['<identifier>'] or args['--dry-run'],
+        progress=not (args['--verbose'] or args['--silent']))
+    session._mount_http_adapter(max_retries=retries,
+                                pool_maxsize=item_jobs * workers * args['--segments'])
+
+    def download_item(job):
+        i, (identifier, item, exc) = job
+        total = len(_search) if total_ids is None else total_ids
+        if total > 1:
+            item_index = '{0}/{1}'.format((i + 1), total)
         else:
             item_index = None
 
-        try:
-            item = session.get_item(identifier)
-        except Exception as exc:
+        if exc is not None:
             print('{0}: failed to retrieve item metadata - errors'.format(identifier))
-            continue
-
-        # Otherwise, download the entire item.
-        if args['--source']:
-            ia_source = args['--source']
-        elif args['--original']:
-            ia_source = ['original']
-        else:
-            ia_source = None
+            return (None, None)
 
         _errors = item.download(
             files=files,
@@ -151,15 +199,34 @@ def main(argv, session):
             glob_pattern=args['--glob'],
             dry_run=args['--dry-run'],
             verbose=args['--verbose'],
-            silent=args['--silent'],
+            silent=True if summary_only else args['--silent'],
             ignore_existing=args['--ignore-existing'],
             checksum=args['--checksum'],
             destdir=args['--destdir'],
             no_directory=args['--no-directories'],
             retries=retries,
-            item_index=item_index,
-            ignore_errors=True
+            item_index=None if summary_only else item_index,
+            ignore_errors=True,
+            workers=workers,
+            segments=args['--segments'],
+            verify=args['--verify'],
         )
+        if summary_only:
+            if _errors is None:
+                status = 'skipped'
+            elif _errors:
+                status = 'errors'
+            else:
+                status = 'success'
+            msg = identifier if not item_index else '{0} ({1})'.format(identifier,
+                                                                       item_index)
+            print('{0}: - {1}'.format(msg, status))
+        return (identifier, _errors)
+
+    errors = list()
+    items = enumerate(iter_items(session, ids, item_jobs, args['--queue-size']))
+    for identifier, _errors in iter_threaded(download_item, items, item_jobs,
+                                             ordered=False):
         if _errors:
             errors.append(_errors)
     if errors:
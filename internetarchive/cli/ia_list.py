@@ -17,7 +17,6 @@ options:
 import sys
 import csv
 from itertools import chain
-from fnmatch import fnmatch
 import six
 
 from docopt import docopt
@@ -41,10 +40,11 @@ def main(argv, session):
     dict_writer = csv.DictWriter(sys.stdout, columns, delimiter='\t', lineterminator='\n')
 
     if args.get('--glob'):
-        patterns = args['--glob'].split('|')
-        files = [f for f in files if any(fnmatch(f['name'], p) for p in patterns)]
+        rows = item.get_file_table().filter(glob_pattern=args['--glob'])
+        files = [files[i] for i in rows]
     elif args.get('--source'):
-        files = [f.__dict__ for f in item.get_files(source=args['--source'])]
+        rows = item.get_file_table().filter(source=args['--source'])
+        files = [files[i] for i in rows]
 
     output = []
     for f in files:
@@ -13,6 +13,8 @@ options:
     -i, --itemlist                   Output identifiers only.
     -f, --field=<field>...           Metadata fields to return.
     -n, --num-found                  Print the number of results to stdout.
+    --scrape                         Page through results with the scrape API,
+                                     which is faster for large result sets.
 """
 from __future__ import absolute_import, print_function, unicode_literals
 import sys
@@ -53,7 +55,8 @@ def main(argv, session=None):
 
     search = search_items(args['<query>'],
                           fields=args['--field'],
-                          params=args['--parameters'])
+                          params=args['--parameters'],
+                          scrape=args['--scrape'])
 
     if args['--num-found']:
         print('{0}'.format(search.num_found))
@@ -6,6 +6,7 @@ usage:
     ia upload <identifier> <file> --remote-name=<name> [options]...
     ia upload --spreadsheet=<metadata.csv> [options]...
     ia upload <identifier> --status-check
+    ia upload --spreadsheet=<metadata.csv> --status-check
     ia upload --help
 
 options:
@@ -14,7 +15,8 @@ options:
     -d, --debug                       Print S3 request parameters to stdout and exit
                                       without sending request.
     -r, --remote-name=<name>          When uploading data from stdin, this option sets the
-                                      remote filename.
+                                      remote filename. Large streams are uploaded in
+                                      parts if a size hint is given.
     -S, --spreadsheet=<metadata.csv>  bulk uploading.
     -m, --metadata=<key:value>...     Metadata to add to your item.
     -H, --header=<key:value>...       S3 HTTP headers to send with your request.
@@ -25,25 +27,39 @@ options:
                                       [default: False].
     -R, --retries=<i>                 Number of times to retry request if S3 retruns a
                                       503 SlowDown error.
-    -s, --sleep=<i>                   The amount of time to sleep between retries
+    -s, --sleep=<i>                   The maximum amount of time to sleep between retries
                                       [default: 30].
     -l, --log                         Log upload results to file.
-    --status-check                    Check if S3 is accepting requests to the given item.
+    -w, --workers=<workers>           Number of files to upload concurrently
+                                      [default: 1].
+    -j, --jobs=<jobs>                 Maximum number of concurrent file uploads in
+                                      total (defaults to the number of workers). When
+                                      uploading a spreadsheet, items are uploaded in
+                                      parallel within this limit.
+    --report=<file>                   Write the result of each upload in a
+                                      spreadsheet to this CSV file.
+    --journal=<file>                  Record every confirmed upload in this
+                                      append-only file.
+    --resume                          Skip files that the journal records as
+                                      uploaded, if they haven't changed since.
+    --status-check                    Check if S3 is accepting requests to the given item,
+                                      or to every item in the spreadsheet.
 """
 from __future__ import absolute_import, unicode_literals, print_function
 import sys
 import os
-from tempfile import TemporaryFile
 import csv
 
 from docopt import docopt, printable_usage
 from requests.exceptions import HTTPError
 from schema import Schema, Use, Or, And, SchemaError
 import six
+from six.moves.urllib.parse import unquote
 
-from internetarchive.session import ArchiveSession
-from internetarchive.cli.argparser import get_args_dict, get_xml_text
-from internetarchive.utils import validate_ia_identifier
+from internetarchive.exceptions import ChecksumError
+from internetarchive.cli.argparser import get_args_dict, get_xml_text, get_jobs
+from internetarchive.item import iter_uploads
+from internetarchive.utils import validate_ia_identifier, iter_threaded, UploadJournal
 
 
 def _upload_files(item, files, upload_kwargs, prev_identifier=None, archive_session=None,
@@ -58,6 +74,11 @@ def _upload_files(item, files, upload_kwargs, prev_identifier=None, archive_sess
         responses += response
     except HTTPError as exc:
         responses += [exc.response]
+    except ChecksumError as exc:
+        # IA-S3 stored the upload, but it doesn't match the local file.
+        print(' * error uploading to {0}: {1}'.format(item.identifier, exc),
+              file=sys.stderr)
+        responses += [None]
     finally:
         # Debug mode.
         if upload_kwargs['debug']:
@@ -83,6 +104,70 @@ def _upload_files(item, files, upload_kwargs, prev_identifier=None, archive_sess
     return responses
 
 
+def _read_spreadsheet(path, metadata=None):
+    """Group the rows of a spreadsheet by identifier.
+
+    :returns: A list of ``(identifier, files, metadata)`` tuples, in the
+              order each identifier first appears. A row without an
+              identifier belongs to the item of the previous row.
+    """
+    items = []
+    items_by_identifier = dict()
+    prev_identifier = None
+    with open(path, 'rU') as fh:
+        for row in csv.DictReader(fh):
+            identifier = row.pop('identifier') or prev_identifier
+            local_file = row.pop('file')
+            if identifier not in items_by_identifier:
+                item = (identifier, [], dict(metadata or {}))
+                items_by_identifier[identifier] = item
+                items.append(item)
+            _, files, item_metadata = items_by_identifier[identifier]
+            files.append(local_file)
+            # TODO: Clean up how indexed metadata items are coerced
+            # into metadata.
+            md_args = ['{0}:{1}'.format(k.lower(), v) for (k, v) in row.items() if v]
+            item_metadata.update(get_args_dict(md_args))
+            prev_identifier = identifier
+    return items
+
+
+def _uploaded_keys(journal, identifier, files):
+    """Return the keys of ``files`` if the journal records all of them
+    as uploaded to ``identifier``, None otherwise.
+    """
+    keys = []
+    for key, body in iter_uploads(files):
+        if not isinstance(body, six.string_types):
+            return None
+        key = body.split('/')[-1] if key is None else key
+        if not journal.is_uploaded(identifier, key, body):
+            return None
+        keys.append(key)
+    return keys
+
+
+def _open_report(path):
+    """Open a CSV report at ``path`` and return it with a function
+    writing a row to it. Rows are flushed as they are written.
+    """
+    if six.PY2:
+        fh = open(path, 'wb')
+    else:
+        fh = open(path, 'w', newline='')
+    writer = csv.writer(fh)
+
+    def writerow(row):
+        if six.PY2:
+            row = [v if isinstance(v, bytes) else six.text_type(v).encode('utf-8')
+                   for v in row]
+        writer.writerow(row)
+        fh.flush()
+
+    writerow(['identifier', 'file', 'status', 'error'])
+    return fh, writerow
+
+
 def main(argv, session):
     args = docopt(__doc__, argv=argv)
 
@@ -110,26 +195,39 @@ def main(argv, session):
         '--size-hint': Or(Use(lambda l: int(l[0]) if l else None), int, None,
             error='--size-hint value must be an integer.'),
         '--status-check': bool,
+        '--workers': And(Use(lambda x: int(x[0])), lambda x: x > 0,
+                         error='--workers must be a positive integer.'),
+        '--jobs': Or(None, And(Use(lambda x: int(x[0]) if x else None),
+                               Or(None, lambda x: x > 0)),
+                     error='--jobs must be a positive integer.'),
+        '--report': Or(None, Use(lambda x: x[0] if x else None)),
+        '--journal': Or(None, Use(lambda x: x[0] if x else None)),
     })
     try:
         args = s.validate(args)
     except SchemaError as exc:
         print('{0}\n{1}'.format(str(exc), printable_usage(__doc__)), file=sys.stderr)
         sys.exit(1)
+    if args['--resume'] and not args['--journal']:
+        print('--resume requires --journal\n{0}'.format(printable_usage(__doc__)),
+              file=sys.stderr)
+        sys.exit(1)
 
     # Status check.
     if args['--status-check']:
-        if session.s3_is_overloaded():
-            print('warning: {0} is over limit, and not accepting requests. '
-                  'Expect 503 SlowDown errors.'.format(args['<identifier>']),
-                  file=sys.stderr)
-            sys.exit(1)
+        if args['--spreadsheet']:
+            identifiers = [i for i, _, _ in _read_spreadsheet(args['--spreadsheet']) if i]
         else:
-            print('success: {0} is accepting requests.'.format(args['<identifier>']))
-            sys.exit()
-
-    elif args['<identifier>']:
-        item = session.get_item(args['<identifier>'])
+            identifiers = [args['<identifier>']]
+        overloaded = session.s3_are_overloaded(identifiers, session.access_key)
+        for identifier in identifiers:
+            if overloaded[identifier]:
+                print('warning: {0} is over limit, and not accepting requests. '
+                      'Expect 503 SlowDown errors.'.format(identifier),
+                      file=sys.stderr)
+            else:
+                print('success: {0} is accepting requests.'.format(identifier))
+        sys.exit(1 if any(overloaded.values()) else 0)
 
     # Upload keyword arguments.
     if args['--size-hint']:
@@ -148,14 +246,19 @@ def main(argv, session):
         retries=args['--retries'],
         retries_sleep=args['--sleep'],
         delete=args['--delete'],
+        workers=args['--workers'],
     )
+    journal = None
+    if args['--journal']:
+        journal = UploadJournal(args['--journal'], resume=args['--resume'])
+        upload_kwargs['journal'] = journal
 
     # Upload files.
     if not args['--spreadsheet']:
         if args['-']:
-            local_file = TemporaryFile()
-            local_file.write(sys.stdin.read())
-            local_file.seek(0)
+            # Stream stdin, with a multipart upload if --size-hint is
+            # larger than the multipart threshold.
+            local_file = getattr(sys.stdin, 'buffer', sys.stdin)
         else:
             local_file = args['<file>']
 
@@ -166,32 +269,95 @@ def main(argv, session):
         else:
             files = local_file
 
-        responses = _upload_files(item, files, upload_kwargs)
+        upload_kwargs['workers'] = get_jobs(args['--jobs'], args['--workers'],
+                                            single=True)[1]
+        try:
+            # Nothing to do, without fetching the item, if a resumed upload
+            # has already been completed.
+            if journal and _uploaded_keys(journal, args['<identifier>'], files):
+                if verbose:
+                    print('{0}: already uploaded, skipping.'.format(
+                        args['<identifier>']))
+                sys.exit(0)
+            item = session.get_item(args['<identifier>'])
+            responses = _upload_files(item, files, upload_kwargs)
+        finally:
+            if journal:
+                journal.close()
 
     # Bulk upload using spreadsheet.
     else:
-        # Use the same session for each upload request.
-        session = ArchiveSession()
-        spreadsheet = csv.DictReader(open(args['--spreadsheet'], 'rU'))
-        prev_identifier = None
+        items = _read_spreadsheet(args['--spreadsheet'], args['--metadata'])
+        item_jobs, workers, summary_only = get_jobs(args['--jobs'], args['--workers'],
+                                                    single=args['--debug'],
+                                                    progress=verbose)
+        upload_kwargs['workers'] = workers
+        if summary_only:
+            upload_kwargs['verbose'] = False
+        session._mount_s3_adapter(pool_maxsize=item_jobs * workers)
+
+        def upload_item(job):
+            """Upload the files of one item, returning the identifier,
+            a list of ``(key, status)`` tuples and any exception.
+            """
+            identifier, files, metadata = job
+            kwargs = dict(upload_kwargs, metadata=metadata)
+            keys = _uploaded_keys(journal, identifier, files) if journal else None
+            if keys:
+                if kwargs['verbose']:
+                    print('{0}: already uploaded, skipping.'.format(identifier))
+                return (identifier, [(key, 'skipped') for key in keys], None)
+            try:
+                item = session.get_item(identifier)
+            except Exception as exc:
+                print('{0}: failed to retrieve item metadata - errors'.format(identifier),
+                      file=sys.stderr)
+                return (identifier, [], exc)
+            if args['--debug']:
+                _upload_files(item, files, kwargs)
+                return (identifier, [], None)
+            if kwargs['verbose']:
+                print('{0}:'.format(identifier))
+            try:
+                _responses = item.upload(files, **kwargs)
+            except Exception as exc:
+                # HTTP errors have already been reported by the upload.
+                if not (summary_only or isinstance(exc, HTTPError)):
+                    print(' * error uploading to {0}: {1}'.format(identifier, exc),
+                          file=sys.stderr)
+                return (identifier, [], exc)
+            base_url = '//s3.us.archive.org/{0}/'.format(identifier)
+            results = []
+            for r in _responses:
+                key = unquote(r.url.split(base_url, 1)[-1]) if r.url else ''
+                results.append((key, 'uploaded' if r.request else 'skipped'))
+            return (identifier, results, None)
+
+        report, write_report = (None, None)
+        if args['--report']:
+            report, write_report = _open_report(args['--report'])
         responses = []
-        for row in spreadsheet:
-            local_file = row['file']
-            identifier = row['identifier']
-            del row['file']
-            del row['identifier']
-            if (not identifier) and (prev_identifier):
-                identifier = prev_identifier
-            item = session.get_item(identifier)
-            # TODO: Clean up how indexed metadata items are coerced
-            # into metadata.
-            md_args = ['{0}:{1}'.format(k.lower(), v) for (k, v) in row.items() if v]
-            metadata = get_args_dict(md_args)
-            upload_kwargs['metadata'].update(metadata)
-            r = _upload_files(item, local_file, upload_kwargs, prev_identifier, session,
-                              responses)
-            responses += r
-            prev_identifier = identifier
+        errors = False
+        try:
+            for identifier, results, exc in iter_threaded(upload_item, items,
+                                                          item_jobs, ordered=False):
+                errors = errors or exc is not None
+                if summary_only:
+                    print('{0}: - {1}'.format(identifier,
+                                              'errors' if exc else 'success'))
+                if not report:
+                    continue
+                for key, status in results:
+                    write_report([identifier, key, status, ''])
+                if exc is not None:
+                    write_report([identifier, '', 'error', exc])
+        finally:
+            if report:
+                report.close()
+            if journal:
+                journal.close()
+        if errors:
+            sys.exit(1)
 
     if responses and not all(r and r.ok for r in responses):
         sys.exit(1)
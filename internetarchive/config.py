@@ -104,6 +104,17 @@ def parse_config_file(config_file=None):
     return (config_file, config)
 
 
+def get_checksum_cache_path():
+    """Return the default path of the local checksum cache database,
+    next to the default config file.
+    """
+    config_dir = os.path.expanduser('~/.config')
+    if not os.path.isdir(config_dir):
+        return os.path.expanduser('~/.ia-checksums.sqlite')
+    else:
+        return '{0}/ia-checksums.sqlite'.format(config_dir)
+
+
 def get_config(config=None, config_file=None):
     _config = {} if not config else config
     config_file, config = parse_config_file(config_file)
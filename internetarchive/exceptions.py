@@ -10,3 +10,7 @@ internetarchive.exceptions
 
 class AuthenticationError(Exception):
     """Authentication Failed"""
+
+
+class ChecksumError(IOError):
+    """Downloaded data does not match the checksums in the item metadata"""
@@ -9,27 +9,159 @@ internetarchive.files
 from __future__ import absolute_import, unicode_literals, print_function
 
 import os
+import re
 import sys
+import heapq
 import logging
 import socket
-
-from requests.exceptions import HTTPError, RetryError, ConnectTimeout, ConnectionError
+import threading
+from array import array
+from fnmatch import translate
+try:
+    import ujson as json
+except ImportError:
+    import json
+
+from requests.exceptions import HTTPError, RetryError, ConnectTimeout, ConnectionError, \
+    ChunkedEncodingError, ReadTimeout
+from requests.packages.urllib3.exceptions import MaxRetryError
+import six
 import six.moves.urllib as urllib
+from six.moves import http_client
 
 from internetarchive import iarequest, utils
+from internetarchive.exceptions import ChecksumError
 
 
 log = logging.getLogger(__name__)
 
+# Python 2 has no 'q' array typecode, doubles hold sizes exactly up to 8 PiB.
+try:
+    _INT64 = array(str('q')).typecode
+except ValueError:
+    _INT64 = str('d')
+
+# Serializes progress output when files are downloaded concurrently.
+_print_lock = threading.Lock()
+
+
+def _print_status(msg, status_char, verbose=None, silent=None):
+    """Print ``msg`` in verbose mode, or a single ``status_char``
+    progress marker unless silent.
+    """
+    with _print_lock:
+        if verbose:
+            print(' ' + msg)
+        elif silent is False:
+            print(status_char, end='')
+            sys.stdout.flush()
+
+
+def _read_journal(path):
+    """Read a partial download journal, returning an empty dict if it
+    is missing or unreadable.
+    """
+    try:
+        with open(path, 'r') as fh:
+            return json.load(fh)
+    except (IOError, OSError, ValueError):
+        return {}
+
+
+def _write_journal(path, journal):
+    with open(path, 'w') as fh:
+        json.dump(journal, fh)
+
+
+def _remove(*paths):
+    for path in paths:
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def _replace(src, dst):
+    """Move ``src`` to ``dst``, overwriting ``dst`` if it exists."""
+    if hasattr(os, 'replace'):
+        os.replace(src, dst)
+    else:
+        # os.rename() can not overwrite files on Windows in Python 2.
+        if os.name == 'nt' and os.path.exists(dst):
+            os.remove(dst)
+        os.rename(src, dst)
 
-class BaseFile(object):
 
-    def __init__(self, item_metadata, name):
-        _file = {}
-        for f in item_metadata.get('files', []):
-            if f.get('name') == name:
-                _file = f
+def _retried(exc):
+    """Return True if ``exc`` was raised once the HTTP adapter had
+    already retried the request, rather than while reading the body.
+    """
+    return bool(exc.args) and isinstance(exc.args[0], MaxRetryError)
+
+
+def _iter_response(response, chunk_size, readinto=None):
+    """Iterate over the body of a streamed ``response`` in chunks of up
+    to ``chunk_size`` bytes.
+
+    With ``readinto``, the body is read straight from the underlying
+    connection into a single reusable buffer, and memoryviews of it are
+    yielded instead of new bytes objects. Each view is only valid until
+    the next one is requested. Falls back to ``iter_content`` if the body
+    is content-encoded, already consumed, or the connection doesn't
+    support ``readinto``.
+    """
+    fp = getattr(response.raw, '_fp', None)
+    if not readinto or response.headers.get('content-encoding') \
+            or not hasattr(fp, 'readinto') or getattr(fp, 'closed', True):
+        for chunk in response.iter_content(chunk_size=chunk_size):
+            if chunk:
+                yield chunk
+        return
+
+    view = memoryview(bytearray(chunk_size))
+    complete = False
+    try:
+        while True:
+            try:
+                size = fp.readinto(view)
+            except (socket.error, http_client.IncompleteRead) as exc:
+                raise ConnectionError(exc)
+            if not size:
                 break
+            yield view[:size]
+        complete = True
+    finally:
+        # Only a fully read connection can be reused.
+        if complete:
+            response.raw.release_conn()
+        else:
+            response.close()
+
+
+def _makedirs(path):
+    """Create ``path`` and any missing parents, tolerating concurrent
+    creation by another download thread.
+    """
+    try:
+        os.makedirs(path)
+    except OSError:
+        if not os.path.isdir(path):
+            raise
+
+
+class BaseFile(object):
+    # The columns every file has are stored in slots. Any other keys in
+    # the file's metadata go in __dict__, which is only allocated for
+    # files that have them.
+    __slots__ = ('identifier', 'name', 'size', 'source', 'format', 'md5', 'sha1',
+                 'mtime', 'crc32', 'exists', '__dict__')
+
+    def __init__(self, item_metadata, name, file_metadata=None):
+        if file_metadata is None:
+            file_metadata = {}
+            for f in item_metadata.get('files', []):
+                if f.get('name') == name:
+                    file_metadata = f
+                    break
+        _file = file_metadata
 
         self.identifier = item_metadata.get('metadata', {}).get('identifier')
         self.name = name
@@ -49,6 +181,172 @@ class BaseFile(object):
         self.size = int(self.size) if self.size else 0
 
 
+# FileTable class
+# ________________________________________________________________________________________
+class FileTable(object):
+    """A columnar table of an item's ``files`` metadata, for filtering,
+    sorting and aggregating large numbers of files without building a
+    :class:`File` object for each of them::
+
+        >>> table = item.get_file_table()
+        >>> rows = table.filter(formats='JPEG', min_size=1048576)
+        >>> table.total_size(by='format')
+        {'JPEG': 104857600, 'Metadata': 7852}
+        >>> [table.names[i] for i in table.newest(10)]
+
+    Files are referred to by row number, their position in ``files``.
+    Sizes and mtimes are stored in arrays, and sources and formats as
+    integer codes into the ``sources`` and ``formats`` lists.
+    """
+
+    def __init__(self, files):
+        """
+        :type files: list
+        :param files: The ``files`` list of an item's metadata.
+        """
+        self.files = files
+        self.names = []
+        self.sizes = array(_INT64)
+        self.mtimes = array(_INT64)
+        self.sources = []
+        self.source_codes = array(str('i'))
+        self.formats = []
+        self.format_codes = array(str('i'))
+        self._name_rows = dict()
+        # Row numbers of the files with each source and format.
+        self._source_rows = dict()
+        self._format_rows = dict()
+
+        for i, f in enumerate(files):
+            name = f.get('name')
+            self.names.append(name)
+            self._name_rows.setdefault(name, i)
+            self.sizes.append(int(f.get('size') or 0))
+            self.mtimes.append(int(float(f.get('mtime') or 0)))
+            self.source_codes.append(self._add_row(self.sources, self.source_codes,
+                                                   self._source_rows, f.get('source'), i))
+            self.format_codes.append(self._add_row(self.formats, self.format_codes,
+                                                   self._format_rows, f.get('format'), i))
+
+    @staticmethod
+    def _add_row(labels, codes, label_rows, label, i):
+        """Record row ``i`` under ``label``, returning the label's code."""
+        rows = label_rows.get(label)
+        if rows is None:
+            labels.append(label)
+            label_rows[label] = array(str('l'), [i])
+            return len(labels) - 1
+        rows.append(i)
+        # Any earlier row with this label has its code.
+        return codes[rows[0]]
+
+    def __len__(self):
+        return len(self.names)
+
+    def get_row(self, name):
+        """Return the row number of the file named ``name``, or None."""
+        return self._name_rows.get(name)
+
+    def filter(self, files=None, source=None, formats=None, glob_pattern=None,
+               min_size=None, max_size=None, rows=None):
+        """Return the row numbers of matching files, in metadata order.
+
+        Like :meth:`Item.get_files`, files matching any of ``files``,
+        ``source``, ``formats`` or ``glob_pattern`` are selected, or all
+        files if none of them are given. The size limits then apply to
+        all selected files.
+
+        :type glob_pattern: str or list
+        :param glob_pattern: (optional) One or more glob patterns, either
+                             as a list or separated by ``|``.
+
+        :type min_size: int
+        :param min_size: (optional) Only return files of at least this size.
+
+        :type max_size: int
+        :param max_size: (optional) Only return files of at most this size.
+
+        :type rows: list
+        :param rows: (optional) Only consider these rows.
+
+        :rtype: list
+        """
+        files = _as_list(files)
+        source = _as_list(source)
+        formats = _as_list(formats)
+
+        if not any(k for k in [files, source, formats, glob_pattern]):
+            selected = list(range(len(self))) if rows is None else list(rows)
+        else:
+            positions = set(self._name_rows[n] for n in files if n in self._name_rows)
+            for s in source:
+                positions.update(self._source_rows.get(s, []))
+            for fmt in formats:
+                positions.update(self._format_rows.get(fmt, []))
+            if glob_pattern:
+                if not isinstance(glob_pattern, list):
+                    glob_pattern = glob_pattern.split('|')
+                match = re.compile('|'.join('(?:{0})'.format(translate(p))
+                                            for p in glob_pattern)).match
+                names = self.names
+                positions.update(i for i in range(len(names)) if match(names[i] or ''))
+            if rows is not None:
+                positions.intersection_update(rows)
+            selected = sorted(positions)
+
+        sizes = self.sizes
+        if min_size is not None:
+            selected = [i for i in selected if sizes[i] >= min_size]
+        if max_size is not None:
+            selected = [i for i in selected if sizes[i] <= max_size]
+        return selected
+
+    def sort(self, rows=None, key=None, reverse=None):
+        """Return row numbers sorted by ``key``, one of ``'name'``,
+        ``'size'`` or ``'mtime'`` (default).
+
+        :rtype: list
+        """
+        key = 'mtime' if not key else key
+        reverse = False if reverse is None else reverse
+        column = dict(name=self.names, size=self.sizes, mtime=self.mtimes)[key]
+        rows = range(len(self)) if rows is None else rows
+        return sorted(rows, key=column.__getitem__, reverse=reverse)
+
+    def newest(self, n, rows=None):
+        """Return the row numbers of the ``n`` most recently modified
+        files, newest first.
+
+        :rtype: list
+        """
+        rows = range(len(self)) if rows is None else rows
+        return heapq.nlargest(n, rows, key=self.mtimes.__getitem__)
+
+    def total_size(self, by=None, rows=None):
+        """Return the total size of all files, or a dict of total sizes
+        by ``'format'`` or ``'source'``.
+        """
+        sizes = self.sizes
+        if rows is None:
+            rows = range(len(self))
+        if not by:
+            return int(sum(sizes[i] for i in rows))
+        labels, codes = dict(format=(self.formats, self.format_codes),
+                             source=(self.sources, self.source_codes))[by]
+        totals = [None] * len(labels)
+        for i in rows:
+            totals[codes[i]] = (totals[codes[i]] or 0) + sizes[i]
+        return dict((labels[c], int(t)) for c, t in enumerate(totals) if t is not None)
+
+
+def _as_list(x):
+    if not x:
+        return []
+    if not isinstance(x, (list, tuple, set)):
+        return [x]
+    return x
+
+
 # File class
 # ________________________________________________________________________________________
 class File(BaseFile):
@@ -77,7 +375,9 @@ class File(BaseFile):
     <https://archive.org/account/s3.php>`__
 
     """
-    def __init__(self, item, name):
+    __slots__ = ('item', '_url')
+
+    def __init__(self, item, name, file_metadata=None):
         """
         :type item: Item
         :param item: The item that the file is part of.
@@ -85,29 +385,56 @@ class File(BaseFile):
         :type name: str
         :param name: The filename of the file.
 
+        :type file_metadata: dict
+        :param file_metadata: (optional) The entry for this file in the item's
+                              ``files`` metadata. Looked up by name if not given.
+
         """
-        super(File, self).__init__(item.item_metadata, name)
+        if file_metadata is None:
+            file_metadata = item._get_file_metadata(name)
+        super(File, self).__init__(item.item_metadata, name, file_metadata or {})
         self.item = item
-        url_parts = dict(
-            protocol=item.session.protocol,
-            id=self.identifier,
-            name=urllib.parse.quote(name.encode('utf-8')),
-        )
-        self.url = '{protocol}//archive.org/download/{id}/{name}'.format(**url_parts)
+        self._url = None
+
+    @property
+    def url(self):
+        """The download URL of the file, built on first access."""
+        if self._url is None:
+            url_parts = dict(
+                protocol=self.item.session.protocol,
+                id=self.identifier,
+                name=urllib.parse.quote(self.name.encode('utf-8')),
+            )
+            self._url = '{protocol}//archive.org/download/{id}/{name}'.format(
+                **url_parts)
+        return self._url
+
+    @url.setter
+    def url(self, url):
+        self._url = url
 
     def __repr__(self):
-        return ('File(identifier={identifier!r}, '
-                'filename={name!r}, '
-                'size={size!r}, '
-                'source={source!r}, '
-                'format={format!r})'.format(**self.__dict__))
+        return ('File(identifier={0.identifier!r}, '
+                'filename={0.name!r}, '
+                'size={0.size!r}, '
+                'source={0.source!r}, '
+                'format={0.format!r})'.format(self))
 
     # download()
     # ____________________________________________________________________________________
     def download(self, file_path=None, verbose=None, silent=None, ignore_existing=None,
-                 checksum=None, destdir=None, retries=None, ignore_errors=None):
+                 checksum=None, destdir=None, retries=None, ignore_errors=None,
+                 verify=None, segments=None, segment_threshold=None, chunk_size=None,
+                 readinto=None):
         """Download the file into the current working directory.
 
+        Data is written to ``<file_path>.part``, alongside a
+        ``<file_path>.part.json`` journal, and only moved into place once
+        the download is complete. Unless ``verify`` is set, a download is
+        complete once the length reported by the server was received, as
+        the item metadata can be stale. Interrupted downloads are resumed
+        with HTTP Range requests, both on retry and on later calls.
+
         :type file_path: str
         :param file_path: Download file to the given file_path.
 
@@ -118,6 +445,36 @@ class File(BaseFile):
         :type checksum: bool
         :param checksum: Skip downloading file based on checksum.
 
+        :type retries: int
+        :param retries: (optional) Number of times to retry a failed
+                        request, and separately the number of times to
+                        resume an interrupted transfer (default: 2).
+
+        :type verify: bool
+        :param verify: (optional) Verify the md5, sha1 and crc32 checksums of
+                       the downloaded file match the item metadata before
+                       moving it into place. Checksums are computed as the
+                       data is received, and a mismatch is retried.
+
+        :type segments: int
+        :param segments: (optional) Split files larger than
+                         ``segment_threshold`` into this many byte ranges,
+                         and download them concurrently. Segmented downloads
+                         are always verified against the item metadata.
+
+        :type segment_threshold: int
+        :param segment_threshold: (optional) Minimum file size in bytes for
+                                  segmented downloads (default: 100 MiB).
+
+        :type chunk_size: int
+        :param chunk_size: (optional) Number of bytes to read and write at a
+                           time (default: 1 MiB).
+
+        :type readinto: bool
+        :param readinto: (optional) Read the response body straight into a
+                         reusable buffer, rather than allocating a new
+                         bytes object for every chunk.
+
         """
         verbose = False if verbose is None else verbose
         silent = False if silent is None else silent
@@ -125,13 +482,20 @@ class File(BaseFile):
         checksum = False if checksum is None else checksum
         retries = 2 if not retries else retries
         ignore_errors = False if not ignore_errors else ignore_errors
-
-        self.item.session._mount_http_adapter(max_retries=retries)
+        verify = False if verify is None else verify
+        segments = 1 if not segments else segments
+        segment_threshold = (100 * 1024 * 1024 if segment_threshold is None
+                             else segment_threshold)
+        chunk_size = 1024 * 1024 if not chunk_size else chunk_size
+        readinto = False if readinto is None else readinto
+
+        self.item.session._mount_http_adapter(max_retries=retries,
+                                              pool_maxsize=segments)
         file_path = self.name if not file_path else file_path
 
         if destdir:
             if not os.path.exists(destdir):
-                os.mkdir(destdir)
+                _makedirs(destdir)
             if os.path.isfile(destdir):
                 raise IOError('{} is not a directory!'.format(destdir))
             file_path = os.path.join(destdir, file_path)
@@ -140,23 +504,16 @@ class File(BaseFile):
             if ignore_existing:
                 msg = 'skipping {0}, file already exists.'.format(file_path)
                 log.info(msg)
-                if verbose:
-                    print(' ' + msg)
-                elif silent is False:
-                    print('.', end='')
-                    sys.stdout.flush()
+                _print_status(msg, '.', verbose, silent)
                 return
             elif checksum:
-                md5_sum = utils.get_md5(open(file_path, 'rb'))
+                with open(file_path, 'rb') as fp:
+                    md5_sum = utils.get_md5(fp, self.item.session.checksum_cache)
                 if md5_sum == self.md5:
                     msg = ('skipping {0}, '
                            'file already exists based on checksum.'.format(file_path))
                     log.info(msg)
-                    if verbose:
-                        print(' ' + msg)
-                    elif silent is False:
-                        print('.', end='')
-                        sys.stdout.flush()
+                    _print_status(msg, '.', verbose, silent)
                     return
             else:
                 st = os.stat(file_path)
@@ -165,39 +522,64 @@ class File(BaseFile):
                     msg = ('skipping {0}, file already exists '
                            'based on length and date.'.format(file_path))
                     log.info(msg)
-                    if verbose:
-                        print(' ' + msg)
-                    elif silent is False:
-                        print('.', end='')
-                        sys.stdout.flush()
+                    _print_status(msg, '.', verbose, silent)
                     return
 
         parent_dir = os.path.dirname(file_path)
         if parent_dir != '' and not os.path.exists(parent_dir):
-            os.makedirs(parent_dir)
+            _makedirs(parent_dir)
 
+        part_path = '{0}.part'.format(file_path)
+        journal_path = '{0}.json'.format(part_path)
+        segmented = (segments > 1) and self.size and (self.size >= segment_threshold)
+        resumed_attempts = 0
         try:
-            response = self.item.session.get(self.url, stream=True, timeout=12)
-            response.raise_for_status()
-
-            chunk_size = 2048
-            with open(file_path, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=chunk_size):
-                    if chunk:
-                        f.write(chunk)
-                        f.flush()
-        except (RetryError, HTTPError, ConnectTimeout,
-                ConnectionError, socket.error) as exc:
+            while True:
+                try:
+                    checksums = None
+                    if segmented:
+                        segmented = self._download_segments(part_path, journal_path,
+                                                            segments, retries,
+                                                            chunk_size, readinto)
+                        verify = verify or segmented
+                    if not segmented:
+                        checksums = self._download_part(part_path, journal_path,
+                                                        chunk_size, readinto, verify)
+                    if verify:
+                        if checksums is None:
+                            # Segments arrive out of order, so they can only
+                            # be hashed once the file is complete.
+                            with open(part_path, 'rb') as fp:
+                                checksums = utils.get_checksums(fp)
+                        try:
+                            self._verify_checksums(part_path, checksums)
+                        except ChecksumError:
+                            _remove(part_path, journal_path)
+                            raise
+                    break
+                except (ConnectionError, ChunkedEncodingError, ReadTimeout,
+                        socket.error, ChecksumError) as exc:
+                    # Retry from where the transfer stopped, the partial
+                    # file and journal are kept for later calls as well.
+                    # Requests that failed outright were already retried
+                    # by the HTTP adapter, and segments resume on their
+                    # own, so only interrupted transfers are retried here.
+                    if resumed_attempts >= retries or _retried(exc) \
+                            or (segmented and not isinstance(exc, ChecksumError)):
+                        raise
+                    resumed_attempts += 1
+                    log.warning('error downloading file {0}, resuming '
+                                '({1} retries left): {2}'.format(
+                                    file_path, retries - resumed_attempts + 1, exc))
+
+            _replace(part_path, file_path)
+            _remove(journal_path)
+        except (RetryError, HTTPError, ConnectTimeout, ConnectionError,
+                ChunkedEncodingError, ReadTimeout, socket.error, IOError) as exc:
             msg = ('error downloading file {0}, '
                    'exception raised: {1}'.format(file_path, exc))
             log.error(msg)
-            if os.path.exists(file_path):
-                os.remove(file_path)
-            if verbose:
-                print(' ' + msg)
-            elif silent is False:
-                print('e', end='')
-                sys.stdout.flush()
+            _print_status(msg, 'e', verbose, silent)
             if ignore_errors is True:
                 return False
             else:
@@ -205,16 +587,206 @@ class File(BaseFile):
 
         # Set mtime with mtime from files.xml.
         os.utime(file_path, (0, self.mtime))
+        if verify and self.item.session.checksum_cache:
+            self.item.session.checksum_cache.set(file_path,
+                                                 checksums.hexdigests()['md5'])
 
         msg = 'downloaded {0}/{1} to {2}'.format(self.identifier,
                                                  self.name,
                                                  file_path)
         log.info(msg)
-        if verbose:
-            print(' ' + msg)
-        elif silent is False:
-            print('d', end='')
-            sys.stdout.flush()
+        _print_status(msg, 'd', verbose, silent)
+        return True
+
+    def _verify_checksums(self, path, checksums):
+        """Check the :class:`internetarchive.utils.Checksums` of the
+        file downloaded to ``path`` against the item metadata.
+
+        :raises: :class:`internetarchive.exceptions.ChecksumError`
+        """
+        if self.size and os.path.getsize(path) != self.size:
+            raise ChecksumError('"{0}" failed size verification, expected {1} '
+                                'bytes'.format(path, self.size))
+        digests = checksums.hexdigests()
+        for key in ('md5', 'sha1', 'crc32'):
+            expected = getattr(self, key, None)
+            if expected and expected.lower() != digests[key]:
+                raise ChecksumError('"{0}" failed checksum verification, expected '
+                                    '{1} {2} but got {3}'.format(path, key, expected,
+                                                                 digests[key]))
+
+    def _download_part(self, part_path, journal_path, chunk_size, readinto,
+                       verify=None):
+        """Download the file to ``part_path``, resuming from any
+        existing partial download recorded in ``journal_path``.
+
+        :rtype: :class:`internetarchive.utils.Checksums`
+        :returns: The checksums of the downloaded file if ``verify`` is
+                  True, computed while downloading.
+
+        :raises: :class:`requests.exceptions.ConnectionError` if the
+                 transfer ends before the full file was received.
+        """
+        journal = dict(size=self.size, md5=self.md5, mtime=self.mtime)
+        previous = _read_journal(journal_path)
+        offset = 0
+        if os.path.exists(part_path):
+            # Only resume if the remote file hasn't changed since, and the
+            # partial file isn't a preallocated segmented download.
+            if all(previous.get(k) == v for (k, v) in journal.items()) \
+                    and not previous.get('segments'):
+                offset = os.path.getsize(part_path)
+                journal['etag'] = previous.get('etag')
+            else:
+                _remove(part_path, journal_path)
+
+        # Ranges refer to the stored bytes, so no content-encoding.
+        headers = {'Accept-Encoding': 'identity'}
+        if offset:
+            headers['Range'] = 'bytes={0}-'.format(offset)
+            if journal.get('etag'):
+                headers['If-Range'] = journal['etag']
+        response = self.item.session.get(self.url, stream=True, timeout=12,
+                                         headers=headers)
+        if offset and response.status_code == 416:
+            # The partial file can't be resumed, start over.
+            _remove(part_path, journal_path)
+            return self._download_part(part_path, journal_path, chunk_size, readinto,
+                                       verify)
+        response.raise_for_status()
+
+        if response.status_code == 206:
+            total = response.headers.get('content-range', '').split('/')[-1]
+        else:
+            # The server ignored the Range header, or the file changed.
+            offset = 0
+            total = response.headers.get('content-length')
+        expected_size = int(total) if total and total.isdigit() else None
+
+        journal['etag'] = response.headers.get('etag')
+        journal['bytes_written'] = offset
+        journal['expected_size'] = expected_size
+        _write_journal(journal_path, journal)
+
+        checksums = utils.Checksums() if verify else None
+        with open(part_path, 'r+b' if offset else 'wb') as f:
+            if checksums and offset:
+                # Only the resumed prefix has to be read back from disk.
+                checksums = utils.get_checksums(f, offset)
+            f.seek(offset)
+            f.truncate()
+            try:
+                for chunk in _iter_response(response, chunk_size, readinto):
+                    f.write(chunk)
+                    offset += len(chunk)
+                    if checksums:
+                        checksums.update(chunk)
+            finally:
+                journal['bytes_written'] = offset
+                _write_journal(journal_path, journal)
+
+        if expected_size is not None and offset != expected_size:
+            if offset > expected_size:
+                _remove(part_path, journal_path)
+            raise ConnectionError('incomplete download, received {0} of {1} '
+                                  'bytes'.format(offset, expected_size))
+        return checksums
+
+    def _download_segments(self, part_path, journal_path, segments, retries,
+                           chunk_size, readinto):
+        """Download the file to ``part_path`` as ``segments`` byte ranges
+        fetched concurrently, each written in place into a preallocated
+        file. Progress for every range is recorded in ``journal_path`` so
+        an interrupted download can be resumed.
+
+        :rtype: bool
+        :returns: False if the server doesn't support range requests for
+                  this file, in which case nothing was downloaded.
+        """
+        journal = dict(size=self.size, md5=self.md5, mtime=self.mtime)
+        previous = _read_journal(journal_path)
+        if os.path.exists(part_path) and previous.get('segments') \
+                and all(previous.get(k) == v for (k, v) in journal.items()):
+            ranges = previous['segments']
+        else:
+            _remove(part_path, journal_path)
+            segment_size = -(-self.size // segments)
+            # [first byte, last byte, bytes written] for each segment.
+            ranges = [[start, min(start + segment_size, self.size) - 1, 0]
+                      for start in range(0, self.size, segment_size)]
+            with open(part_path, 'wb') as f:
+                f.truncate(self.size)
+        journal['segments'] = ranges
+        _write_journal(journal_path, journal)
+        journal_lock = threading.Lock()
+        # Set once a segment fails, so the others stop writing to the
+        # partial file before it is retried or given up on.
+        failed = threading.Event()
+
+        def download_segment(segment):
+            try:
+                return _download_segment(segment), None
+            except Exception:
+                failed.set()
+                return None, sys.exc_info()
+
+        def _download_segment(segment):
+            start, end = segment[0], segment[1]
+            attempts = 0
+            while start + segment[2] <= end and not failed.is_set():
+                offset = start + segment[2]
+                headers = {
+                    'Accept-Encoding': 'identity',
+                    'Range': 'bytes={0}-{1}'.format(offset, end),
+                }
+                try:
+                    response = self.item.session.get(self.url, stream=True, timeout=12,
+                                                     headers=headers)
+                    response.raise_for_status()
+                    total = response.headers.get('content-range', '').split('/')[-1]
+                    if response.status_code != 206 or total != str(self.size):
+                        response.close()
+                        return False
+                    # Each segment writes through its own file handle.
+                    with open(part_path, 'r+b') as f:
+                        f.seek(offset)
+                        for chunk in _iter_response(response, chunk_size, readinto):
+                            if failed.is_set():
+                                response.close()
+                                return True
+                            chunk = chunk[:end + 1 - offset]
+                            f.write(chunk)
+                            offset += len(chunk)
+                            segment[2] = offset - start
+                    if offset <= end:
+                        raise ConnectionError('incomplete segment, received {0} of '
+                                              '{1} bytes'.format(segment[2],
+                                                                 end + 1 - start))
+                except (HTTPError, ConnectionError, ChunkedEncodingError, ReadTimeout,
+                        socket.error) as exc:
+                    if attempts >= retries or _retried(exc):
+                        raise
+                    attempts += 1
+                    log.warning('error downloading bytes {0}-{1} of {2}, resuming: '
+                                '{3}'.format(offset, end, self.url, exc))
+                finally:
+                    with journal_lock:
+                        _write_journal(journal_path, journal)
+            return True
+
+        pending = [r for r in ranges if r[0] + r[2] <= r[1]]
+        # Every segment has returned by the time the results are in, so
+        # nothing is still writing to the partial file when an error is
+        # raised here.
+        results = list(utils.iter_threaded(download_segment, pending, segments))
+        for supported, exc_info in results:
+            if exc_info:
+                six.reraise(*exc_info)
+        if not all(supported for (supported, exc_info) in results):
+            log.info('{0} does not support range requests, downloading without '
+                     'segments.'.format(self.url))
+            _remove(part_path, journal_path)
+            return False
         return True
 
     def delete(self, cascade_delete=None, access_key=None, secret_key=None, verbose=None,
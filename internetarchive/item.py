@@ -9,20 +9,25 @@ internetarchive.item
 from __future__ import absolute_import, unicode_literals, print_function
 
 from logging import getLogger
-from fnmatch import fnmatch
 import os
 from time import sleep
 import sys
+import hashlib
+import threading
+from xml.etree import ElementTree
 
-from six import string_types
-from requests import Response
+from six import string_types, PY3
+from requests import Response, Request
 from clint.textui import progress
-from requests.exceptions import HTTPError
+from requests.exceptions import HTTPError, ConnectionError, Timeout
 
 from internetarchive.utils import IdentifierListAsItems, get_md5, chunk_generator, \
-    IterableToFileAdapter
-from internetarchive.files import File
+    IterableToFileAdapter, iter_threaded, FileSlice, get_cached_md5, HashingFileAdapter, \
+    MmapFileAdapter
+from internetarchive.exceptions import ChecksumError
+from internetarchive.files import File, FileTable
 from internetarchive.iarequest import MetadataRequest, S3Request
+from internetarchive.auth import S3Auth
 from internetarchive import __version__
 
 
@@ -51,6 +56,7 @@ class BaseItem(object):
         self.updated = None
         self.tasks = None
         self.is_dark = None
+        self._file_table = None
 
         # Load item.
         self.load()
@@ -67,6 +73,7 @@ class BaseItem(object):
 
         for key in self.item_metadata:
             setattr(self, key, self.item_metadata[key])
+        self._file_table = None
 
         if not self.identifier:
             self.identifier = self.metadata.get('identifier')
@@ -74,6 +81,29 @@ class BaseItem(object):
         mc = self.metadata.get('collection', [])
         self.collection = IdentifierListAsItems(mc, self.session)
 
+    def get_file_table(self, rebuild=None):
+        """Get a :class:`FileTable <FileTable>` of the item's files, also
+        used to look up files by name, source and format.
+
+        The table is built on first use, and rebuilt after the item
+        metadata is reloaded or files are added to or removed from
+        ``self.files``.
+
+        :rtype: :class:`internetarchive.files.FileTable <FileTable>`
+        """
+        key = (id(self.files), len(self.files))
+        if rebuild or self._file_table is None or self._file_table[0] != key:
+            self._file_table = (key, FileTable(self.files))
+        return self._file_table[1]
+
+    def _get_file_metadata(self, name):
+        """Return the ``files`` metadata entry for ``name``, or None."""
+        i = self.get_file_table().get_row(name)
+        if i is not None and self.files[i].get('name') != name:
+            # The files list was modified in place.
+            i = self.get_file_table(rebuild=True).get_row(name)
+        return self.files[i] if i is not None else None
+
 
 class Item(BaseItem):
     """This class represents an archive.org item. You can use this
@@ -142,36 +172,13 @@ class Item(BaseItem):
         return File(self, file_name)
 
     def get_files(self, files=None, source=None, formats=None, glob_pattern=None):
-        files = [] if not files else files
-        source = [] if not source else source
-        formats = [] if not formats else formats
-
-        if not isinstance(files, (list, tuple, set)):
-            files = [files]
-        if not isinstance(source, (list, tuple, set)):
-            source = [source]
-        if not isinstance(formats, (list, tuple, set)):
-            formats = [formats]
-
         if not any(k for k in [files, source, formats, glob_pattern]):
-            for f in self.files:
-                yield self.get_file(f.get('name'))
-
-        for f in self.files:
-            if f.get('name') in files:
-                yield self.get_file(f.get('name'))
-            elif f.get('source') in source:
-                yield self.get_file(f.get('name'))
-            elif f.get('format') in formats:
-                yield self.get_file(f.get('name'))
-            elif glob_pattern:
-                if not isinstance(glob_pattern, list):
-                    patterns = glob_pattern.split('|')
-                else:
-                    patterns = glob_pattern
-                for p in patterns:
-                    if fnmatch(f.get('name', ''), p):
-                        yield self.get_file(f.get('name'))
+            rows = range(len(self.files))
+        else:
+            rows = self.get_file_table().filter(files, source, formats, glob_pattern)
+        for i in rows:
+            f = self.files[i]
+            yield File(self, f.get('name'), f)
 
     def download(self,
                  files=None,
@@ -187,7 +194,10 @@ class Item(BaseItem):
                  no_directory=None,
                  retries=None,
                  item_index=None,
-                 ignore_errors=None):
+                 ignore_errors=None,
+                 workers=None,
+                 segments=None,
+                 verify=None):
         """Download files from an item.
 
         :param files: (optional) Only download files matching given file names.
@@ -216,6 +226,18 @@ class Item(BaseItem):
         :param no_directory: (optional) Download files to current working directory rather
                              than creating an item directory.
 
+        :type workers: int
+        :param workers: (optional) Number of files to download concurrently. Files are
+                        fetched over the session's shared connection pool.
+
+        :type segments: int
+        :param segments: (optional) Download files larger than 100 MiB as this many
+                         concurrent byte ranges. See :meth:`File.download`.
+
+        :type verify: bool
+        :param verify: (optional) Verify downloaded files against the checksums in
+                       the item metadata, retrying files that don't match.
+
         :rtype: bool
         :returns: True if if files have been downloaded successfully.
         """
@@ -226,6 +248,8 @@ class Item(BaseItem):
         ignore_errors = False if not ignore_errors else ignore_errors
         checksum = False if checksum is None else checksum
         no_directory = False if no_directory is None else no_directory
+        workers = 1 if not workers else workers
+        segments = 1 if not segments else segments
 
         if not dry_run:
             if item_index and verbose is True:
@@ -255,18 +279,24 @@ class Item(BaseItem):
                 print(msg)
             return
 
+        table = self.get_file_table()
         if files:
-            files = self.get_files(files)
+            rows = table.filter(files)
         else:
-            files = self.get_files()
+            rows = table.filter()
         if source:
-            files = self.get_files(source=source)
+            rows = table.filter(source=source)
         if formats:
-            files = self.get_files(formats=formats)
+            rows = table.filter(formats=formats)
         if glob_pattern:
-            files = self.get_files(glob_pattern=glob_pattern)
-
-        if not files:
+            rows = table.filter(glob_pattern=glob_pattern)
+        if workers > 1:
+            # Start the largest files first, so they don't hold up the
+            # end of the download.
+            rows = table.sort(rows, key='size', reverse=True)
+        files = (File(self, self.files[i].get('name'), self.files[i]) for i in rows)
+
+        if not rows:
             msg = 'skipping {0}, no matching files found.'.format(self.identifier)
             log.info(msg)
             if verbose:
@@ -274,19 +304,32 @@ class Item(BaseItem):
             elif silent is False:
                 print(msg, end='')
 
-        errors = list()
-        for f in files:
+        def _download(f):
             if no_directory:
                 path = f.name
             else:
                 path = os.path.join(self.identifier, f.name)
-            if dry_run:
-                print(f.url)
-                continue
             r = f.download(path, verbose, silent, ignore_existing, checksum, destdir,
-                           retries, ignore_errors)
-            if r is False:
-                errors.append(f.name)
+                           retries, ignore_errors, verify=verify, segments=segments)
+            return (f, r)
+
+        errors = list()
+        if dry_run:
+            for f in files:
+                print(f.url)
+        elif workers > 1:
+            # Mount the adapter once, sized for all workers, so every thread
+            # shares the same connection pool.
+            self.session._mount_http_adapter(max_retries=2 if not retries else retries,
+                                             pool_maxsize=workers * segments)
+            for f, r in iter_threaded(_download, files, workers, ordered=False):
+                if r is False:
+                    errors.append(f.name)
+        else:
+            for f in files:
+                f, r = _download(f)
+                if r is False:
+                    errors.append(f.name)
         if silent is False and verbose is False and dry_run is False:
             if errors:
                 print(' - errors')
@@ -355,6 +398,41 @@ class Item(BaseItem):
         self.refresh()
         return resp
 
+    def _is_uploaded(self, key, body, checksum=None, journal=None):
+        """Check if :meth:`upload_file` would skip ``body``, because
+        ``journal`` records it as uploaded or, with ``checksum``, the
+        item already has a file with the same md5.
+
+        :rtype: tuple
+        :returns: A ``(skipped, md5)`` tuple, ``md5`` is the digest of
+                  ``body`` if it had to be hashed and None otherwise.
+        """
+        if hasattr(body, 'read'):
+            path = getattr(body, 'name', None)
+        else:
+            path = body
+        if key is None:
+            if not isinstance(path, string_types):
+                return (False, None)
+            key = path.split('/')[-1]
+        if journal and journal.is_uploaded(self.identifier, key, path):
+            return (True, None)
+        ia_file = self.get_file(key)
+        if not (checksum and not self.tasks and ia_file.exists):
+            return (False, None)
+        cache = self.session.checksum_cache
+        if not hasattr(body, 'read'):
+            with open(body, 'rb') as fp:
+                md5 = get_md5(fp, cache)
+            return (md5 == ia_file.md5, md5)
+        try:
+            body.seek(0, os.SEEK_SET)
+        except IOError:
+            # A stream can't be hashed before it is sent.
+            return (False, None)
+        md5 = get_md5(body, cache)
+        return (md5 == ia_file.md5, md5)
+
     def upload_file(self, body,
                     key=None,
                     metadata=None,
@@ -369,10 +447,19 @@ class Item(BaseItem):
                     retries=None,
                     retries_sleep=None,
                     debug=None,
-                    request_kwargs=None):
+                    request_kwargs=None,
+                    multipart_threshold=None,
+                    part_size=None,
+                    part_workers=None,
+                    journal=None,
+                    md5=None):
         """Upload a single file to an item. The item will be created
         if it does not exist.
 
+        Files larger than ``multipart_threshold`` are sent with the IA-S3
+        multipart upload API, as parts uploaded concurrently and retried
+        individually.
+
         :type body: Filepath or file-like object.
         :param body: File or data to be uploaded.
 
@@ -391,7 +478,14 @@ class Item(BaseItem):
 
         :type verify: bool
         :param verify: (optional) Verify local MD5 checksum matches the MD5
-                       checksum of the file received by IAS3.
+                       checksum of the file received by IAS3. Files are
+                       hashed before they are sent, so IAS3 rejects a
+                       corrupted upload. Streams can only be hashed while
+                       they are sent, and are checked against the ETag of
+                       the response instead. IAS3 has stored the stream by
+                       then, so a mismatch raises :class:`ChecksumError`
+                       but does not prevent it being stored, and a response
+                       without an ETag can not be verified at all.
 
         :type checksum: bool
         :param checksum: (optional) Skip based on checksum.
@@ -405,8 +499,10 @@ class Item(BaseItem):
                         if S3 returns a 503 SlowDown error.
 
         :type retries_sleep: int
-        :param retries_sleep: (optional) Amount of time to sleep between
-                              ``retries``.
+        :param retries_sleep: (optional) Maximum amount of time to sleep
+                              between ``retries``. Uploads to the same item
+                              back off exponentially, with jitter, up to
+                              this limit (default: 30).
 
         :type verbose: bool
         :param verbose: (optional) Print progress to stdout.
@@ -415,6 +511,27 @@ class Item(BaseItem):
         :param debug: (optional) Set to True to print headers to stdout, and
                       exit without sending the upload request.
 
+        :type multipart_threshold: int
+        :param multipart_threshold: (optional) Size in bytes above which a
+                                    multipart upload is used (default: 1 GiB).
+
+        :type part_size: int
+        :param part_size: (optional) Size in bytes of each part of a
+                          multipart upload (default: 100 MiB).
+
+        :type part_workers: int
+        :param part_workers: (optional) Number of parts of a multipart upload
+                             to send concurrently (default: 4).
+
+        :type journal: :class:`UploadJournal <UploadJournal>`
+        :param journal: (optional) Record the upload in this journal once it
+                        is confirmed, and skip the file if the journal
+                        already records it as uploaded.
+
+        :type md5: str
+        :param md5: (optional) The md5 hex digest of ``body``, if it is
+                    already known, so the file isn't hashed again.
+
         Usage::
 
             >>> import internetarchive
@@ -423,9 +540,10 @@ class Item(BaseItem):
             ...                  key='photos/image1.jpg')
             True
         """
-        # Set defaults.
-        headers = {} if headers is None else headers
-        metadata = {} if metadata is None else metadata
+        # Set defaults. Copy headers and metadata, they are modified below
+        # and may be shared with concurrent uploads.
+        headers = {} if headers is None else dict(headers)
+        metadata = {} if metadata is None else dict(metadata)
         access_key = self.session.access_key if access_key is None else access_key
         secret_key = self.session.secret_key if secret_key is None else secret_key
         queue_derive = True if queue_derive is None else queue_derive
@@ -438,6 +556,10 @@ class Item(BaseItem):
         retries_sleep = 30 if retries_sleep is None else retries_sleep
         debug = False if debug is None else debug
         request_kwargs = {} if request_kwargs is None else request_kwargs
+        multipart_threshold = (1024 ** 3 if multipart_threshold is None
+                               else multipart_threshold)
+        part_size = 100 * 1024 ** 2 if part_size is None else part_size
+        part_workers = 4 if part_workers is None else part_workers
 
         if not hasattr(body, 'read'):
             body = open(body, 'rb')
@@ -451,10 +573,16 @@ class Item(BaseItem):
             size = body.tell()
             body.seek(0, os.SEEK_SET)
         except IOError:
+            # Not seekable, e.g. stdin. The body is streamed, and can't be
+            # skipped based on checksum or deleted.
             size = None
+            delete = False
 
-        if not headers.get('x-archive-size-hint'):
+        if not headers.get('x-archive-size-hint') and size is not None:
             headers['x-archive-size-hint'] = size
+        total_size = size
+        if size is None:
+            total_size = int(headers.get('x-archive-size-hint') or 0)
 
         key = body.name.split('/')[-1] if key is None else key
         base_url = '{protocol}//s3.us.archive.org/{identifier}'.format(
@@ -462,14 +590,46 @@ class Item(BaseItem):
             identifier=self.identifier)
         url = '{base_url}/{key}'.format(base_url=base_url,
                                         key=key.lstrip('/'))
+        path = getattr(body, 'name', None)
 
-        # Skip based on checksum.
-        md5_sum = get_md5(body)
+        # Skip files already uploaded by an earlier run, without hashing
+        # them or contacting Archive.org.
+        if journal and not debug and journal.is_uploaded(self.identifier, key, path):
+            log.info('{f} is recorded as uploaded in {j}, skipping'.format(
+                f=key, j=journal.path))
+            if verbose:
+                print(' {f} already uploaded, skipping.'.format(f=key))
+            response = Response()
+            response.url = url
+            return response
+
+        def record(md5, status=None):
+            if journal:
+                journal.record(self.identifier, key, path, md5, status)
+
+        # Skip based on checksum. The file is only hashed before it is
+        # sent if it may be skipped, or if IA-S3 must verify it before it
+        # is stored. Otherwise it is hashed while it is being uploaded, to
+        # add it to the checksum cache once the ETag of the response
+        # confirms it.
+        cache = self.session.checksum_cache
+        md5_sum = None
         ia_file = self.get_file(key)
-        if (checksum) and (not self.tasks) and (ia_file) and (ia_file.md5 == md5_sum):
+        may_skip = checksum and not self.tasks and ia_file.exists
+        if size is None:
+            # A stream can only be read once, while it is sent.
+            may_skip = False
+        elif md5:
+            md5_sum = md5
+        elif may_skip or verify or delete or debug:
+            md5_sum = get_md5(body, cache)
+        else:
+            md5_sum = get_cached_md5(body, cache)
+        if may_skip and ia_file.md5 == md5_sum:
             log.info('{f} already exists: {u}'.format(f=key, u=url))
             if verbose:
                 print(' {f} already exists, skipping.'.format(f=key))
+            record(md5_sum, 'skipped')
             if delete:
                 log.info(
                     '{f} successfully uploaded to https://archive.org/download/{i}/{f} '
@@ -479,19 +639,68 @@ class Item(BaseItem):
                 os.remove(body.name)
             # Return an empty response object if checksums match.
             # TODO: Is there a better way to handle this?
-            return Response()
+            response = Response()
+            response.url = url
+            return response
 
         # require the Content-MD5 header when delete is True.
-        if verify or delete:
+        if (verify or delete) and md5_sum:
             headers['Content-MD5'] = md5_sum
 
+        # The adapters hashing each attempt at sending the body, and the
+        # memory maps to close once it has been sent.
+        hashed_bodies = []
+        mmap_bodies = []
+
+        def _progress_callback():
+            chunk_size = 1048576
+            bar = progress.Bar(label=' uploading {f}: '.format(f=key),
+                               expected_size=-(-size // chunk_size))
+
+            def callback(sent):
+                bar.show(-(-sent // chunk_size))
+                if sent == size:
+                    bar.done()
+            return callback
+
         def _build_request():
+            if size is None:
+                # Streams are sent with chunked transfer encoding.
+                data = HashingFileAdapter(body, None)
+                hashed_bodies.append(data)
+                if verbose:
+                    print(' uploading {f}'.format(f=key))
+                return S3Request(method='PUT',
+                                 url=url,
+                                 headers=headers,
+                                 data=IterableToFileAdapter(chunk_generator(data,
+                                                                            1048576)),
+                                 metadata=metadata,
+                                 access_key=access_key,
+                                 secret_key=secret_key,
+                                 queue_derive=queue_derive)
+
             body.seek(0, os.SEEK_SET)
-            if verbose:
+            data = body
+            if PY3 and size and not debug:
+                try:
+                    # Files on disk are sent from a memory map without
+                    # copying them.
+                    data = MmapFileAdapter(body, size, md5=md5_sum is None)
+                    mmap_bodies.append(data)
+                except (AttributeError, EnvironmentError, ValueError):
+                    pass
+            if md5_sum is None and size is not None:
+                if data is body:
+                    data = HashingFileAdapter(body, size)
+                hashed_bodies.append(data)
+            if verbose and data in mmap_bodies:
+                data.callback = _progress_callback()
+            elif verbose:
                 try:
                     chunk_size = 1048576
                     expected_size = size / chunk_size + 1
-                    chunks = chunk_generator(body, chunk_size)
+                    chunks = chunk_generator(data, chunk_size)
                     progress_generator = progress.bar(
                         chunks,
                         expected_size=expected_size,
@@ -499,9 +708,6 @@ class Item(BaseItem):
                     data = IterableToFileAdapter(progress_generator, size)
                 except:
                     print(' uploading {f}'.format(f=key))
-                    data = body
-            else:
-                data = body
 
             request = S3Request(method='PUT',
                                 url=url,
@@ -515,38 +721,89 @@ class Item(BaseItem):
 
         if debug:
             return _build_request()
+        elif total_size > multipart_threshold:
+            try:
+                response = self._upload_multipart(body, url, size,
+                                                  headers=headers,
+                                                  metadata=metadata,
+                                                  access_key=access_key,
+                                                  secret_key=secret_key,
+                                                  queue_derive=queue_derive,
+                                                  part_size=part_size,
+                                                  workers=part_workers,
+                                                  retries=retries,
+                                                  retries_sleep=retries_sleep,
+                                                  verbose=verbose,
+                                                  request_kwargs=request_kwargs)
+            except HTTPError as exc:
+                error_msg = (' error uploading {0} to {1}, '
+                             '{2}'.format(key, self.identifier, exc))
+                log.error(error_msg)
+                if verbose:
+                    print(error_msg, file=sys.stderr)
+                raise type(exc)(error_msg)
+            log.info('uploaded {f} to {u}'.format(f=key, u=url))
+            record(md5_sum)
+            if delete:
+                log.info(
+                    '{f} successfully uploaded to '
+                    'https://archive.org/download/{i}/{f} and verified, deleting '
+                    'local copy'.format(i=self.identifier,
+                                        f=key))
+                os.remove(body.name)
+            return response
         else:
+            limiter = self.session._get_s3_rate_limiter(self.identifier)
+
+            def s3_is_overloaded():
+                # The limiter already shares one check per epoch, a result
+                # cached from before the last backoff would be stale.
+                return self.session.s3_is_overloaded(self.identifier, access_key,
+                                                     ttl=0)
+
+            def backoff(epoch):
+                delay = limiter.throttle(epoch, retries_sleep)
+                error_msg = ('s3 is overloaded, sleeping for {0:.1f} seconds and '
+                             'retrying. {1} retries left.'.format(delay, retries))
+                log.info(error_msg)
+                if verbose:
+                    print(' warning: {0}'.format(error_msg), file=sys.stderr)
+
             try:
-                error_msg = ('s3 is overloaded, sleeping for '
-                             '{0} seconds and retrying. '
-                             '{1} retries left.'.format(retries_sleep, retries))
                 while True:
-                    if retries > 0:
-                        if self.session.s3_is_overloaded(access_key):
-                            sleep(retries_sleep)
-                            log.info(error_msg)
-                            if verbose:
-                                print(' warning: {0}'.format(error_msg), file=sys.stderr)
-                            retries -= 1
-                            continue
+                    # Uploads to the same bucket share one rate limiter,
+                    # and one overload check until S3 throttles again.
+                    epoch = limiter.acquire()
+                    if retries > 0 and limiter.probe(s3_is_overloaded):
+                        backoff(epoch)
+                        retries -= 1
+                        continue
                     request = _build_request()
                     prepared_request = request.prepare()
-                    response = self.session.send(prepared_request,
-                                                 stream=True,
-                                                 **request_kwargs)
-                    if (response.status_code == 503) and (retries > 0):
-                        log.info(error_msg)
-                        if verbose:
-                            print(' warning: {0}'.format(error_msg), file=sys.stderr)
-                        sleep(retries_sleep)
+                    try:
+                        response = self.session.send(prepared_request,
+                                                     stream=True,
+                                                     **request_kwargs)
+                    finally:
+                        while mmap_bodies:
+                            mmap_bodies.pop().close()
+                    if response.status_code != 503:
+                        limiter.success(epoch)
+                        break
+                    # A stream has been consumed and can't be sent again.
+                    if (retries > 0) and (size is not None):
+                        backoff(epoch)
                         retries -= 1
                         continue
-                    else:
-                        if response.status_code == 503:
-                            log.info('maximum retries exceeded, upload failed.')
-                        break
+                    limiter.throttle(epoch, retries_sleep)
+                    log.info('maximum retries exceeded, upload failed.')
+                    break
                 response.raise_for_status()
+                if hashed_bodies and hashed_bodies[-1].hexdigest():
+                    md5_sum = hashed_bodies[-1].hexdigest()
+                    self._verify_etag(body, response, md5_sum, verify)
                 log.info('uploaded {f} to {u}'.format(f=key, u=url))
+                record(md5_sum)
                 if delete and response.status_code == 200:
                     log.info(
                         '{f} successfully uploaded to '
@@ -564,6 +821,207 @@ class Item(BaseItem):
                 # Raise HTTPError with error message.
                 raise type(exc)(error_msg)
 
+    def _verify_etag(self, body, response, md5_sum, verify):
+        """Check the md5 of an uploaded body, computed while it was
+        sent, against the ETag returned by IA-S3, and add it to the
+        checksum cache.
+        """
+        etag = response.headers.get('ETag', '').strip('"')
+        if not etag:
+            # The md5 can't be confirmed, so it isn't cached either.
+            if verify:
+                log.warning('{0} could not be verified, the response has no '
+                            'ETag'.format(response.url))
+            return
+        if etag != md5_sum:
+            msg = ('{0} was corrupted during upload, the local md5 {1} does not '
+                   'match the ETag {2}'.format(response.url, md5_sum, etag))
+            log.error(msg)
+            if verify:
+                raise ChecksumError(msg)
+            return
+        path = getattr(body, 'name', None)
+        cache = self.session.checksum_cache
+        if cache and isinstance(path, string_types) and os.path.isfile(path):
+            cache.set(path, md5_sum)
+
+    def _upload_multipart(self, body, url, size, headers, metadata, access_key,
+                          secret_key, queue_derive, part_size, workers, retries,
+                          retries_sleep, verbose, request_kwargs):
+        """Upload ``body`` to ``url`` with the IA-S3 multipart upload API.
+
+        Parts are sent concurrently, each with a Content-MD5 header, and
+        every request is retried at least 3 times on connection errors,
+        5xx responses and digest mismatches. The upload is aborted if a
+        part can not be uploaded.
+
+        If ``size`` is None, ``body`` is a stream which is read one part
+        at a time, keeping at most ``workers + 1`` parts in memory.
+        """
+        tries = max(retries, 3) + 1
+        auth = S3Auth(access_key, secret_key)
+        # IA-S3 allows at most 10000 parts per upload.
+        total_size = size
+        if size is None:
+            total_size = int(headers.get('x-archive-size-hint') or 0)
+        part_size = max(part_size, -(-total_size // 10000))
+        stream_md5 = hashlib.md5()
+        stream_size = [0]
+
+        def iter_stream_parts():
+            for i, data in enumerate(chunk_generator(body, part_size)):
+                stream_md5.update(data)
+                yield (i + 1, stream_size[0], len(data), data)
+                stream_size[0] += len(data)
+
+        if size is None:
+            parts = iter_stream_parts()
+            part_count = None
+        else:
+            parts = [(i + 1, offset, min(part_size, size - offset), None)
+                     for i, offset in enumerate(range(0, size, part_size))]
+            part_count = len(parts)
+        # Parts of files on disk are read through their own file handles,
+        # other file-like objects are read into memory one part at a time.
+        path = getattr(body, 'name', None)
+        if size is None or not (isinstance(path, string_types) and
+                                os.path.isfile(path)):
+            path = None
+        body_lock = threading.Lock()
+
+        def get_part(offset, length, data):
+            if data is not None:
+                return data
+            elif path:
+                return FileSlice(path, offset, length)
+            with body_lock:
+                body.seek(offset, os.SEEK_SET)
+                return body.read(length)
+
+        limiter = self.session._get_s3_rate_limiter(self.identifier)
+
+        def send(build_request):
+            for attempt in range(tries):
+                epoch = limiter.acquire()
+                try:
+                    response = self.session.send(build_request().prepare(),
+                                                 **request_kwargs)
+                except (ConnectionError, Timeout):
+                    if attempt == tries - 1:
+                        raise
+                    sleep(min(retries_sleep, 2 ** attempt))
+                    continue
+                # 503 SlowDown slows down every upload to this bucket.
+                if response.status_code == 503:
+                    limiter.throttle(epoch, retries_sleep)
+                else:
+                    limiter.success(epoch)
+                bad_digest = (response.status_code == 400 and
+                              'BadDigest' in response.text)
+                retry = bad_digest or response.status_code >= 500
+                if not retry or attempt == tries - 1:
+                    response.raise_for_status()
+                    return response
+                log.info('{0} {1} failed with status {2}, retrying'.format(
+                    response.request.method, response.url, response.status_code))
+                if response.status_code != 503:
+                    sleep(min(retries_sleep, 2 ** attempt))
+
+        def upload_part(part):
+            part_number, offset, length, part_bytes = part
+            data = get_part(offset, length, part_bytes)
+            if path:
+                md5 = hashlib.md5()
+                for chunk in chunk_generator(data, 1048576):
+                    md5.update(chunk)
+                data.close()
+                md5 = md5.hexdigest()
+            else:
+                md5 = hashlib.md5(data).hexdigest()
+            slices = []
+
+            def build_request():
+                # Every attempt needs a fresh file handle.
+                part_data = get_part(offset, length, part_bytes)
+                if path:
+                    slices.append(part_data)
+                return Request(method='PUT',
+                               url=url,
+                               params={'partNumber': part_number,
+                                       'uploadId': upload_id},
+                               headers={'Content-MD5': md5},
+                               data=part_data,
+                               auth=auth)
+            try:
+                response = send(build_request)
+            finally:
+                for part_data in slices:
+                    part_data.close()
+            return (part_number, response.headers.get('ETag', '"{0}"'.format(md5)))
+
+        initiate_headers = dict(headers)
+        initiate_headers.pop('Content-MD5', None)
+        response = send(lambda: S3Request(method='POST',
+                                          url=url,
+                                          params={'uploads': ''},
+                                          headers=dict(initiate_headers),
+                                          metadata=metadata,
+                                          auth=auth,
+                                          queue_derive=queue_derive))
+        upload_id = _find_xml_text(response.content, 'UploadId')
+        if not upload_id:
+            raise HTTPError('initiating multipart upload failed, no UploadId in '
+                            'response: {0}'.format(response.text), response=response)
+        log.info('initiated multipart upload of {0}, upload id: {1}'.format(
+            url, upload_id))
+
+        self.session._mount_s3_adapter(pool_maxsize=workers)
+        etags = {}
+        try:
+            results = iter_threaded(upload_part, parts, workers, ordered=False,
+                                    window=workers)
+            if verbose and part_count:
+                results = progress.bar(results,
+                                       expected_size=part_count,
+                                       label=' uploading {0} in {1} parts: '.format(
+                                           url.split('/')[-1], part_count))
+            elif verbose:
+                print(' uploading {0} in parts of {1} bytes'.format(
+                    url.split('/')[-1], part_size))
+            for part_number, etag in results:
+                etags[part_number] = etag
+        except BaseException:
+            log.error('aborting multipart upload {0} of {1}'.format(upload_id, url))
+            try:
+                self.session.send(Request(method='DELETE',
+                                          url=url,
+                                          params={'uploadId': upload_id},
+                                          auth=auth).prepare(),
+                                  **request_kwargs)
+            except Exception as exc:
+                log.error('aborting multipart upload failed: {0}'.format(exc))
+            raise
+
+        xml = ['<CompleteMultipartUpload>']
+        for part_number in sorted(etags):
+            xml.append('<Part><PartNumber>{0}</PartNumber><ETag>{1}</ETag>'
+                       '</Part>'.format(part_number, etags[part_number]))
+        xml.append('</CompleteMultipartUpload>')
+        response = send(lambda: S3Request(method='POST',
+                                          url=url,
+                                          params={'uploadId': upload_id},
+                                          data=''.join(xml).encode('utf-8'),
+                                          auth=auth,
+                                          queue_derive=queue_derive))
+        # Completing can fail after the response status has been sent.
+        if _find_xml_text(response.content, 'Code'):
+            raise HTTPError('completing multipart upload failed: '
+                            '{0}'.format(response.text), response=response)
+        if size is None:
+            log.info('uploaded {0} bytes to {1} from a stream, md5: {2}'.format(
+                stream_size[0], url, stream_md5.hexdigest()))
+        return response
+
     def upload(self, files,
                metadata=None,
                headers=None,
@@ -577,13 +1035,29 @@ class Item(BaseItem):
                retries=None,
                retries_sleep=None,
                debug=None,
-               request_kwargs=None):
+               request_kwargs=None,
+               workers=None,
+               multipart_threshold=None,
+               part_size=None,
+               journal=None):
         """Upload files to an item. The item will be created if it
         does not exist.
 
+        Only the last file that is actually uploaded queues a derive of
+        the item, after all other files have been uploaded. Files
+        skipped with ``checksum`` or ``journal`` never do.
+
         :type files: list
         :param files: The filepaths or file-like objects to upload.
 
+        :type workers: int
+        :param workers: (optional) Number of files to upload concurrently.
+
+        :type journal: :class:`UploadJournal <UploadJournal>`
+        :param journal: (optional) Record confirmed uploads in this journal,
+                        and skip files it records as uploaded, e.g. to
+                        resume an interrupted upload.
+
         :type kwargs: dict
         :param kwargs: The keyword arguments from the call to
                        upload_file().
@@ -600,83 +1074,135 @@ class Item(BaseItem):
         :returns: True if the request was successful and all files were
                   uploaded, False otherwise.
         """
-        def iter_directory(directory):
-            for path, dir, files in os.walk(directory):
-                for f in files:
-                    filepath = os.path.join(path, f)
-                    key = os.path.relpath(filepath, directory)
-                    yield (filepath, key)
-
+        # The last upload is held back, it is the only request allowed to
+        # queue a derive and is sent once all others have finished.
+        # Uploads that will be skipped are sent straight away instead, so
+        # the held back one is never skipped. Each file is checked by the
+        # worker that picks it up, and passes the md5 hashed for the check
+        # on to upload_file(), so it is only read once.
+        last_upload = []
+        last_upload_lock = threading.Lock()
         queue_derive = True if queue_derive is None else queue_derive
-        if isinstance(files, dict):
-            files = list(files.items())
-        if not isinstance(files, (list, tuple)):
-            files = [files]
-
+        # Set checksum after delete, as upload_file() does.
+        checksum = True if delete or checksum is None else checksum
+        check_skipped = queue_derive and (checksum or journal) and not debug
+
+        def hold_back(upload):
+            """Return the upload to send now, if any, holding back the
+            last one in input order of those that aren't skipped.
+            """
+            i, key, body = upload
+            md5 = None
+            if check_skipped:
+                skipped, md5 = self._is_uploaded(key, body, checksum, journal)
+                if skipped:
+                    return (i, key, body, md5)
+            with last_upload_lock:
+                if last_upload and last_upload[0][0] > i:
+                    return (i, key, body, md5)
+                last_upload.append((i, key, body, md5))
+                return last_upload.pop(0) if len(last_upload) > 1 else None
+
+        def _upload(upload, queue_derive=False, verbose=verbose):
+            i, key, body, md5 = upload
+            return self.upload_file(body,
+                                    key=key,
+                                    metadata=metadata,
+                                    headers=headers,
+                                    access_key=access_key,
+                                    secret_key=secret_key,
+                                    queue_derive=queue_derive,
+                                    verbose=verbose,
+                                    verify=verify,
+                                    checksum=checksum,
+                                    delete=delete,
+                                    retries=retries,
+                                    retries_sleep=retries_sleep,
+                                    debug=debug,
+                                    request_kwargs=request_kwargs,
+                                    multipart_threshold=multipart_threshold,
+                                    part_size=part_size,
+                                    journal=journal,
+                                    md5=md5)
+
+        workers = 1 if not workers else workers
+
+        # (input index, response) pairs, returned in input order.
         responses = []
-        file_index = 0
-        for f in files:
-            file_index += 1
-            if isinstance(f, string_types) and os.path.isdir(f):
-                fdir_index = 0
-                for filepath, key in iter_directory(f):
-                    # Set derive header if queue_derive is True,
-                    # and this is the last request being made.
-                    fdir_index += 1
-                    if queue_derive is True and file_index >= len(files) \
-                            and fdir_index >= len(os.listdir(f)):
-                        queue_derive = True
-                    else:
-                        queue_derive = False
+        uploads = ((i, key, body) for i, (key, body) in enumerate(iter_uploads(files)))
+        if workers > 1 and not debug:
+            self.session._mount_s3_adapter(pool_maxsize=workers)
+
+            def check_and_upload(upload):
+                upload = hold_back(upload)
+                if upload:
+                    # Progress bars would be interleaved, report finished
+                    # files instead.
+                    return (upload, _upload(upload, verbose=False))
+
+            for result in iter_threaded(check_and_upload, uploads, workers,
+                                        ordered=False):
+                if not result:
+                    continue
+                (i, key, body, md5), r = result
+                if verbose:
+                    key = key if key else getattr(body, 'name', body)
+                    status = 'uploaded' if r.request else 'skipped'
+                    print(' {0} {1}'.format(status, key))
+                responses.append((i, r))
+        else:
+            for upload in uploads:
+                upload = hold_back(upload)
+                if upload:
+                    responses.append((upload[0], _upload(upload)))
+        if last_upload:
+            upload = last_upload.pop()
+            responses.append((upload[0], _upload(upload, queue_derive=queue_derive)))
+        return [r for (i, r) in sorted(responses, key=lambda x: x[0])]
+
+
+def iter_uploads(files):
+    """Yield a ``(key, body)`` tuple for every file to upload, as
+    given to :meth:`Item.upload`. Directories are walked, ``key`` is
+    None if it is to be derived from the name of ``body``.
+    """
+    if isinstance(files, dict):
+        files = list(files.items())
+    if not isinstance(files, (list, tuple)):
+        files = [files]
+    for f in files:
+        if isinstance(f, string_types) and os.path.isdir(f):
+            for path, dir, filenames in os.walk(f):
+                for filename in filenames:
+                    filepath = os.path.join(path, filename)
+                    key = os.path.relpath(filepath, f)
                     if not f.endswith('/'):
                         key = '{0}/{1}'.format(f, key)
-                    resp = self.upload_file(filepath,
-                                            key=key,
-                                            metadata=metadata,
-                                            headers=headers,
-                                            access_key=access_key,
-                                            secret_key=secret_key,
-                                            queue_derive=queue_derive,
-                                            verbose=verbose,
-                                            verify=verify,
-                                            checksum=checksum,
-                                            delete=delete,
-                                            retries=retries,
-                                            retries_sleep=retries_sleep,
-                                            debug=debug,
-                                            request_kwargs=request_kwargs)
-                    responses.append(resp)
+                    yield (key, filepath)
+        else:
+            if not isinstance(f, (list, tuple)):
+                key, body = (None, f)
             else:
-                # Set derive header if queue_derive is True,
-                # and this is the last request being made.
-                if queue_derive is True and file_index >= len(files):
-                    queue_derive = True
-                else:
-                    queue_derive = False
+                key, body = f
+            if key and not isinstance(key, string_types):
+                key = str(key)
+            yield (key, body)
 
-                if not isinstance(f, (list, tuple)):
-                    key, body = (None, f)
-                else:
-                    key, body = f
-                if key and not isinstance(key, string_types):
-                    key = str(key)
-                resp = self.upload_file(body,
-                                        key=key,
-                                        metadata=metadata,
-                                        headers=headers,
-                                        access_key=access_key,
-                                        secret_key=secret_key,
-                                        queue_derive=queue_derive,
-                                        verbose=verbose,
-                                        verify=verify,
-                                        checksum=checksum,
-                                        delete=delete,
-                                        retries=retries,
-                                        retries_sleep=retries_sleep,
-                                        debug=debug,
-                                        request_kwargs=request_kwargs)
-                responses.append(resp)
-        return responses
+
+def _find_xml_text(xml, tag):
+    """Return the text of the first element named ``tag`` in ``xml``,
+    ignoring namespaces, or None.
+    """
+    try:
+        root = ElementTree.fromstring(xml)
+    except Exception:
+        return None
+    # Element.iter() is not available on Python 2.6.
+    elements = root.iter() if hasattr(root, 'iter') else root.getiterator()
+    for element in elements:
+        if element.tag.split('}')[-1] == tag:
+            return element.text
+    return None
 
 
 class Collection(Item):
@@ -694,12 +1220,15 @@ class Collection(Item):
         self._make_search('subcollections',
                           'collection:{0.identifier} AND mediatype:collection')
 
-    def _do_search(self, query, name):
+    def _do_search(self, query, name, **kwargs):
         _search = self.session.search_items(query, fields=['identifier'])
-        rtn = self.searches.setdefault(name, _search).iter_as_items()
+        rtn = self.searches.setdefault(name, _search).iter_as_items(**kwargs)
         if not hasattr(self, name + '_count'):
             setattr(self, name + "_count", self.searches[name].num_found)
         return rtn
 
     def _make_search(self, name, query):
-        setattr(self, name, lambda: self._do_search(query.format(self), name))
+        # Keyword arguments are passed to Search.iter_as_items, e.g.
+        # ``collection.contents(workers=8)``.
+        setattr(self, name,
+                lambda **kwargs: self._do_search(query.format(self), name, **kwargs))
@@ -12,9 +12,37 @@ search engine.
 from __future__ import absolute_import, unicode_literals
 
 import itertools
+try:
+    import ujson as json
+except ImportError:
+    import json
 
 import six
 
+from internetarchive.utils import iter_threaded, JSONStream
+
+
+# Pages of results larger than this many bytes, or of at least this
+# many rows if their size is not known, are parsed as they arrive.
+STREAM_SIZE = 1024 * 1024
+STREAM_ROWS = 1000
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+def _iter_json_array(stream, path, obj):
+    """Yield the values of the array found at ``path`` in the JSON
+    object read from ``stream``, storing its other members in ``obj``.
+    """
+    for key in stream.members():
+        if key != path[0]:
+            obj[key] = stream.value()
+        elif len(path) == 1:
+            for value in stream.items():
+                yield value
+        else:
+            for value in _iter_json_array(stream, path[1:], obj.setdefault(key, {})):
+                yield value
+
 
 class Search(object):
     """This class represents an archive.org item search. You can use
@@ -33,7 +61,29 @@ class Search(object):
                  fields=None,
                  params=None,
                  config=None,
-                 request_kwargs=None):
+                 request_kwargs=None,
+                 scrape=None,
+                 rows=None,
+                 prefetch=None):
+        """
+        :type rows: int
+        :param rows: (optional) Number of results to request per page
+                     (default: 250, or 10,000 with ``scrape``).
+
+        :type prefetch: int
+        :param prefetch: (optional) Number of pages to request ahead of
+                         the results being iterated over (default: 4).
+                         Pages are fetched concurrently, and still yielded
+                         in order.
+
+        :type scrape: bool
+        :param scrape: (optional) Page through the results with the cursor
+                       of the scrape API rather than advancedsearch page
+                       numbers. Every page costs the same, however deep,
+                       and results are neither skipped nor repeated if
+                       the result set changes. Ignored if a ``page``
+                       parameter is given.
+        """
         fields = [] if not fields else fields
         # Support str or list values for fields param.
         fields = [fields] if not isinstance(
@@ -45,8 +95,14 @@ class Search(object):
 
         self.session = archive_session
         self.request_kwargs = request_kwargs
-        self.url = '{0}//archive.org/advancedsearch.php'.format(
-            self.session.protocol)
+        self.prefetch = 4 if not prefetch else int(prefetch)
+        self.scrape = bool(scrape) and 'page' not in params
+        if self.scrape:
+            self.url = '{0}//archive.org/services/search/v1/scrape'.format(
+                self.session.protocol)
+        else:
+            self.url = '{0}//archive.org/advancedsearch.php'.format(
+                self.session.protocol)
         default_params = dict(
             q=query,
             rows=250,
@@ -63,37 +119,136 @@ class Search(object):
         # not provided.
         has_page_param = 'page' in params
         has_sort_param = any(k.startswith('sort') for k, v in params.items())
-        if not (has_page_param or has_sort_param):
+        self._default_sort = not (has_page_param or has_sort_param)
+        if self._default_sort:
             default_params['sort[0]'] = 'identifier asc'
 
+        self._user_rows = params.get('rows') if rows is None else rows
         self.params = default_params.copy()
         self.params.update(params)
+        if rows is not None:
+            self.params['rows'] = rows
         if not self.params.get('output'):
             self.params['output'] = 'json'
 
         for k, v in enumerate(fields):
             key = 'fl[{0}]'.format(k)
             self.params[key] = v
-        self._search_info = self._get_search_info()
-        self.num_found = self._search_info['response']['numFound']
-        self.query = self._search_info['responseHeader']['params']['q']
+        self.query = query
+        # num_found is read from the first page of results once they are
+        # iterated over, or else requested on its own.
+        self._num_found = None
 
     def __repr__(self):
-        return ('Search(query={query!r}, '
-                'num_found={num_found!r})'.format(**self.__dict__))
-
-    def _get_search_info(self):
-        info_params = self.params.copy()
-        info_params['rows'] = 0
-        r = self.session.get(self.url, params=info_params,
-                             **self.request_kwargs)
-        results = r.json()
-        del results['response']['docs']
-        return results
+        # num_found is only shown once it is known, without requesting it.
+        if self._num_found is None:
+            return 'Search(query={0.query!r})'.format(self)
+        return ('Search(query={0.query!r}, '
+                'num_found={0._num_found!r})'.format(self))
+
+    @property
+    def num_found(self):
+        """The number of results. It is requested on its own if no page
+        of results has been fetched yet."""
+        if self._num_found is None:
+            if self.scrape:
+                params = self._get_scrape_params()
+                del params['count']
+                params['total_only'] = 'true'
+            else:
+                params = self.params.copy()
+                params.pop('page', None)
+                params['rows'] = 0
+            page = {}
+            for doc in self._iter_page(params, page):
+                pass
+            self._num_found = self._get_num_found(page)
+        return self._num_found
+
+    def _get_num_found(self, page):
+        if self.scrape:
+            return page['total']
+        return page['response']['numFound']
+
+    def _update_num_found(self, page):
+        if self._num_found is None:
+            try:
+                self._num_found = self._get_num_found(page)
+            except KeyError:
+                pass
+
+    def _get_docs(self, page):
+        if self.scrape:
+            return page.get('items', [])
+        return page.get('response', {}).get('docs', [])
+
+    def _iter_page(self, params, page):
+        """Request a page of results and yield its docs. The rest of the
+        response is stored in ``page``.
+
+        Large pages are parsed as they arrive, so the first docs are
+        yielded before the page has been downloaded, and the page is
+        never held in memory as a whole. Smaller pages are parsed at
+        once, which is faster. Only pages of fewer than ``STREAM_ROWS``
+        rows are prefetched.
+        """
+        if self.scrape:
+            rows, path = params.get('count'), ['items']
+        else:
+            rows, path = params.get('rows'), ['response', 'docs']
+        r = self.session.get(self.url, params=params, stream=True, **self.request_kwargs)
+        try:
+            if self.scrape:
+                r.raise_for_status()
+            length = int(r.headers.get('content-length', 0))
+            if length > STREAM_SIZE or (not length and int(rows or 0) >= STREAM_ROWS):
+                stream = JSONStream(r.iter_content(STREAM_CHUNK_SIZE))
+                docs = _iter_json_array(stream, path, page)
+            else:
+                page.update(json.loads(r.content.decode('utf-8')))
+                docs = self._get_docs(page)
+            for doc in docs:
+                yield doc
+        finally:
+            r.close()
+        if self.scrape and page.get('error'):
+            raise ValueError('scrape API error: {0}'.format(page['error']))
+
+    def _get_scrape_params(self):
+        """Translate the advancedsearch parameters of this search to
+        scrape API parameters.
+        """
+        params = dict(q=self.params['q'])
+        fields = self._get_indexed_params('fl')
+        if fields:
+            params['fields'] = ','.join(fields)
+        # The scrape API always sorts by identifier last.
+        sorts = self._get_indexed_params('sort')
+        if sorts and not self._default_sort:
+            params['sorts'] = ','.join(sorts)
+        # Pages hold between 100 and 10,000 results.
+        rows = 10000 if self._user_rows is None else self._user_rows
+        params['count'] = min(max(int(rows), 100), 10000)
+        return params
+
+    def _get_indexed_params(self, name):
+        """Return the values of the ``name[0]``, ``name[1]``, ...
+        parameters, in order.
+        """
+        values = []
+        for k, v in self.params.items():
+            if k.startswith('{0}['.format(name)) and k.endswith(']'):
+                index = k[len(name) + 1:-1]
+                values.append((int(index) if index.isdigit() else 0, v))
+        return [v for (i, v) in sorted(values)]
 
     def _get_item_from_search_result(self, search_result):
         return self.session.get_item(search_result['identifier'])
 
+    def _make_item_from_search_result(self, search_result):
+        item_metadata = dict(metadata=search_result)
+        return self.session.get_item(search_result['identifier'], item_metadata)
+
     def __iter__(self):
         return self.iter_as_results()
 
@@ -102,34 +257,99 @@ class Search(object):
 
     def make_results_generator(self):
         """Generator for iterating over search results"""
-        start_page = 1
-        end_page = int((self.num_found / int(self.params['rows'])) + 2)
-        if 'page' in self.params:
-            start_page = int(self.params['page'])
-            end_page = start_page + 1
-
-        for page in range(start_page, end_page):
-            self.params['page'] = page
-            r = self.session.get(
-                self.url, params=self.params, **self.request_kwargs)
-            results = r.json()
-            for doc in results['response']['docs']:
+        if self.scrape:
+            return self._iter_scrape()
+        return self._iter_pages()
+
+    def _iter_scrape(self):
+        params = self._get_scrape_params()
+        while True:
+            page = {}
+            for doc in self._iter_page(params, page):
                 yield doc
+            self._update_num_found(page)
+            if not page.get('cursor'):
+                break
+            params['cursor'] = page['cursor']
+
+    def _iter_pages(self):
+        params = self.params.copy()
+        params.setdefault('page', 1)
+        page = {}
+        for doc in self._iter_page(params, page):
+            # numFound precedes the docs, also in streamed pages.
+            self._update_num_found(page)
+            yield doc
+        self._update_num_found(page)
+        rows = int(self.params['rows'])
+        if 'page' in self.params or not rows:
+            return
+        pages = range(2, 1 + (self.num_found + rows - 1) // rows)
+
+        if rows >= STREAM_ROWS:
+            # Large pages are parsed as they arrive rather than
+            # prefetched, so only part of one is held in memory.
+            for page in pages:
+                params['page'] = page
+                for doc in self._iter_page(params, {}):
+                    yield doc
+            return
+
+        def get_docs(page):
+            params = self.params.copy()
+            params['page'] = page
+            return list(self._iter_page(params, {}))
+
+        # Up to ``prefetch`` pages are requested while earlier ones are
+        # consumed. Closing this generator cancels the pending requests.
+        pages = iter_threaded(get_docs, pages,
+                              workers=self.prefetch, window=self.prefetch)
+        try:
+            for docs in pages:
+                for doc in docs:
+                    yield doc
+        finally:
+            pages.close()
 
     def iter_as_results(self):
         return SearchIterator(self, self.make_results_generator())
 
-    def iter_as_items(self):
-        """Returns iterator of search results as full Items"""
-        fields = [v for (k, v) in self.params.items() if k.startswith('fl[')]
+    def iter_as_items(self, workers=None, ordered=None, metadata_fields=None):
+        """Returns iterator of search results as full Items
+
+        :type workers: int
+        :param workers: (optional) Number of items to retrieve metadata for
+                        concurrently (default: 1). At most ``workers * 2``
+                        items are retrieved ahead of the one being iterated
+                        over.
+
+        :type ordered: bool
+        :param ordered: (optional) Yield items in search result order rather
+                        than as soon as their metadata has been retrieved
+                        (default: True).
+
+        :type metadata_fields: list
+        :param metadata_fields: (optional) The metadata fields needed from
+                                each item. If the fields of this search
+                                include all of them, items are made from the
+                                search results with only those fields as
+                                their metadata, without retrieving it.
+        """
+        fields = self._get_indexed_params('fl')
         if fields and not any(f == 'identifier' for f in fields):
             raise KeyError('This search did not include item identifiers!')
-        if six.PY2:
-            _map = itertools.imap(self._get_item_from_search_result,
-                                  self.make_results_generator())
+        if metadata_fields and fields and set(metadata_fields) <= set(fields):
+            get_item = self._make_item_from_search_result
+        else:
+            get_item = self._get_item_from_search_result
+        workers = 1 if not workers else int(workers)
+        if workers > 1:
+            _map = iter_threaded(get_item, self.make_results_generator(),
+                                 workers=workers, ordered=ordered)
+        elif six.PY2:
+            _map = itertools.imap(get_item, self.make_results_generator())
         else:
-            _map = map(self._get_item_from_search_result,
-                       self.make_results_generator())
+            _map = map(get_item, self.make_results_generator())
         return SearchIterator(self, _map)
 
 
@@ -137,7 +357,8 @@ class SearchIterator(object):
     """This class is an iterator wrapper for search results.
 
     It provides access to the underlying Search, and supports
-    len() (since that is known initially)."""
+    len(), which requests the number of results if no page of them has
+    been fetched yet."""
 
     def __init__(self, search, iterator):
         self.search = search
@@ -15,17 +15,21 @@ import os
 import locale
 import sys
 import logging
+import threading
+import time
 
 import requests.sessions
+from requests.compat import OrderedDict, urlparse
 from requests.utils import default_headers
-from requests.adapters import HTTPAdapter
+from requests.adapters import HTTPAdapter, DEFAULT_POOLSIZE
 from requests.packages.urllib3 import Retry
 
 from internetarchive import __version__
-from internetarchive.config import get_config
+from internetarchive.config import get_config, get_checksum_cache_path
 from internetarchive.item import Item, Collection
 from internetarchive.search import Search
 from internetarchive.catalog import Catalog
+from internetarchive.utils import ChecksumCache, RateLimiter, iter_threaded
 
 
 logger = logging.getLogger(__name__)
@@ -84,9 +88,29 @@ class ArchiveSession(requests.sessions.Session):
         self.access_key = self.config.get('s3', {}).get('access')
         self.secret_key = self.config.get('s3', {}).get('secret')
         self.http_adapter_kwargs = http_adapter_kwargs
+        self._http_adapter_key = None
+        self._datanode_adapter = None
+        self._s3_pool_maxsize = None
+        self._mount_lock = threading.Lock()
+        self._s3_rate_limiters = dict()
+        self._s3_rate_limiters_lock = threading.Lock()
+        self._s3_limits = dict()
+        self._s3_limit_requests = dict()
+        self._s3_limits_lock = threading.Lock()
+        # The checksum cache is stored at the path given by the
+        # ``checksum_cache`` option of the ``general`` config section, and
+        # disabled if that is set to false, off, no or 0.
+        checksum_cache_path = self.config.get('general', {}).get('checksum_cache')
+        if str(checksum_cache_path).lower() in ('false', 'off', 'no', '0'):
+            self.checksum_cache = None
+        else:
+            if not checksum_cache_path:
+                checksum_cache_path = get_checksum_cache_path()
+            self.checksum_cache = ChecksumCache(checksum_cache_path)
 
         self.headers = default_headers()
         self.headers['User-Agent'] = self._get_user_agent_string()
+        self._mount_s3_adapter()
         self._mount_http_adapter()
 
         logging_config = self.config.get('logging', {})
@@ -109,29 +133,101 @@ class ArchiveSession(requests.sessions.Session):
         return 'internetarchive/{0} ({1} {2}; N; {3}; {4}) Python/{5}'.format(
             __version__, uname[0], uname[-1], lang, self.access_key, py_version)
 
-    def _mount_http_adapter(self, protocol=None, max_retries=None, status_forcelist=None):
+    def _mount_http_adapter(self, protocol=None, max_retries=None, status_forcelist=None,
+                            pool_maxsize=None):
         """Mount an HTTP adapter to the
         :class:`ArchiveSession <ArchiveSession>` object.
+
+        The adapter is only replaced if its configuration has changed, so
+        pooled connections are reused across requests and threads.
         """
         protocol = protocol if protocol else self.protocol
         if not max_retries:
             max_retries = self.http_adapter_kwargs.get('max_retries', 3)
-
         if not status_forcelist:
             status_forcelist = [500, 501, 502, 503, 504, 400, 408]
-        if max_retries and isinstance(max_retries, (int, float)):
-            max_retries = Retry(total=max_retries,
-                                connect=max_retries,
-                                read=max_retries,
-                                redirect=False,
-                                method_whitelist=Retry.DEFAULT_METHOD_WHITELIST,
-                                status_forcelist=status_forcelist,
-                                backoff_factor=1)
-        self.http_adapter_kwargs['max_retries'] = max_retries
-        max_retries_adapter = HTTPAdapter(**self.http_adapter_kwargs)
-        # Don't mount on s3.us.archive.org, only archive.org!
-        # IA-S3 requires a more complicated retry workflow.
-        self.mount('{0}//archive.org'.format(self.protocol), max_retries_adapter)
+
+        with self._mount_lock:
+            if pool_maxsize:
+                # Never shrink the pool, other threads may be sharing it.
+                current_maxsize = self.http_adapter_kwargs.get('pool_maxsize',
+                                                               DEFAULT_POOLSIZE)
+                self.http_adapter_kwargs['pool_maxsize'] = max(pool_maxsize,
+                                                               current_maxsize)
+
+            adapter_key = (protocol, max_retries, tuple(status_forcelist),
+                           self.http_adapter_kwargs.get('pool_maxsize'))
+            if adapter_key == self._http_adapter_key:
+                return
+            self._http_adapter_key = adapter_key
+
+            if max_retries and isinstance(max_retries, (int, float)):
+                max_retries = Retry(total=max_retries,
+                                    connect=max_retries,
+                                    read=max_retries,
+                                    redirect=False,
+                                    method_whitelist=Retry.DEFAULT_METHOD_WHITELIST,
+                                    status_forcelist=status_forcelist,
+                                    backoff_factor=1)
+            self.http_adapter_kwargs['max_retries'] = max_retries
+            max_retries_adapter = HTTPAdapter(**self.http_adapter_kwargs)
+            # Don't mount on s3.us.archive.org, only archive.org! The
+            # datanodes that downloads are redirected to share the adapter
+            # through get_adapter().
+            self._mount_adapter(['{0}//archive.org'.format(protocol)],
+                                max_retries_adapter)
+            self._datanode_adapter = max_retries_adapter
+
+    def get_adapter(self, url):
+        """Return the adapter for ``url``. Datanodes, such as
+        ia800201.us.archive.org, share the adapter mounted for
+        archive.org, over http as well as https. IA-S3 requires a more
+        complicated retry workflow, and keeps its own adapter.
+        """
+        adapter = self._datanode_adapter
+        if adapter:
+            host = urlparse(url).hostname or ''
+            if host.endswith('.us.archive.org') and host != 's3.us.archive.org':
+                return adapter
+        return super(ArchiveSession, self).get_adapter(url)
+
+    def _mount_s3_adapter(self, pool_maxsize=None):
+        """Mount an HTTP adapter for s3.us.archive.org with room for
+        ``pool_maxsize`` concurrent connections.
+
+        The adapter doesn't retry requests, uploads handle that
+        themselves. It is only replaced if it needs to grow.
+        """
+        pool_maxsize = DEFAULT_POOLSIZE if not pool_maxsize else pool_maxsize
+        with self._mount_lock:
+            if self._s3_pool_maxsize and self._s3_pool_maxsize >= pool_maxsize:
+                return
+            self._s3_pool_maxsize = pool_maxsize
+            adapter = HTTPAdapter(pool_maxsize=pool_maxsize, max_retries=0)
+            self._mount_adapter(['{0}//s3.us.archive.org'.format(self.protocol)], adapter)
+
+    def _mount_adapter(self, prefixes, adapter):
+        """Mount ``adapter`` on ``prefixes``.
+
+        Unlike :meth:`requests.Session.mount`, the adapters are replaced
+        with an updated copy rather than modified in place, so threads
+        sending requests concurrently never see them half updated.
+        Adapters are sorted by descending prefix length, like requests
+        does.
+        """
+        adapters = self.adapters.copy()
+        for prefix in prefixes:
+            adapters[prefix] = adapter
+        self.adapters = OrderedDict(sorted(adapters.items(), key=lambda a: -len(a[0])))
+
+    def _get_s3_rate_limiter(self, identifier):
+        """Return the :class:`RateLimiter <RateLimiter>` shared by all
+        requests to the IA-S3 bucket ``identifier`` in this session.
+        """
+        with self._s3_rate_limiters_lock:
+            if identifier not in self._s3_rate_limiters:
+                self._s3_rate_limiters[identifier] = RateLimiter()
+            return self._s3_rate_limiters[identifier]
 
     def set_file_logger(self, log_level, path, logger_name='internetarchive'):
         """Convenience function to quickly configure any level of
@@ -221,7 +317,10 @@ class ArchiveSession(requests.sessions.Session):
                      fields=None,
                      params=None,
                      config=None,
-                     request_kwargs=None):
+                     request_kwargs=None,
+                     scrape=None,
+                     rows=None,
+                     prefetch=None):
         """Search for items on Archive.org.
 
         :type query: str
@@ -239,6 +338,17 @@ class ArchiveSession(requests.sessions.Session):
         :type config: dict
         :param secure: (optional) Configuration options for session.
 
+        :type scrape: bool
+        :param scrape: (optional) Page through results with the scrape API's
+                       cursor, for large result sets.
+
+        :type rows: int
+        :param rows: (optional) Number of results to request per page.
+
+        :type prefetch: int
+        :param prefetch: (optional) Number of pages to request concurrently,
+                         ahead of the results being iterated over.
+
         :returns: A :class:`Search` object, yielding search results.
         """
         request_kwargs = {} if not request_kwargs else request_kwargs
@@ -246,7 +356,10 @@ class ArchiveSession(requests.sessions.Session):
                       fields=fields,
                       params=params,
                       config=config,
-                      request_kwargs=request_kwargs)
+                      request_kwargs=request_kwargs,
+                      scrape=scrape,
+                      rows=rows,
+                      prefetch=prefetch)
 
     def get_tasks(self,
                   identifier=None,
@@ -299,7 +412,71 @@ class ArchiveSession(requests.sessions.Session):
         else:
             return _catalog.tasks
 
-    def s3_is_overloaded(self, identifier=None, access_key=None):
+    def s3_is_overloaded(self, identifier=None, access_key=None, ttl=None):
+        """Check whether IA-S3 is over its limit for ``identifier`` and
+        ``access_key``, and will reply to uploads with 503 SlowDown.
+
+        Results are cached per bucket and access key for ``ttl``
+        seconds. Concurrent calls for the same bucket and access key
+        share a single request.
+
+        :type identifier: str
+        :param identifier: (optional) The bucket to check.
+
+        :type access_key: str
+        :param access_key: (optional) The IA-S3 access key to check.
+
+        :type ttl: float
+        :param ttl: (optional) Number of seconds a result is reused for
+                    (default: 10).
+
+        :rtype: bool
+        """
+        ttl = 10 if ttl is None else ttl
+        key = (access_key, identifier)
+        while True:
+            with self._s3_limits_lock:
+                cached = self._s3_limits.get(key)
+                if cached and time.time() - cached[0] < ttl:
+                    return cached[1]
+                pending = self._s3_limit_requests.get(key)
+                if pending is None:
+                    pending = threading.Event()
+                    self._s3_limit_requests[key] = pending
+                    break
+            # Another thread is checking, wait for its result.
+            pending.wait()
+        try:
+            over_limit = self._check_s3_limit(identifier, access_key)
+            with self._s3_limits_lock:
+                self._s3_limits[key] = (time.time(), over_limit)
+        finally:
+            with self._s3_limits_lock:
+                del self._s3_limit_requests[key]
+            pending.set()
+        return over_limit
+
+    def s3_are_overloaded(self, identifiers, access_key=None, ttl=None, workers=None):
+        """Check many buckets with :meth:`s3_is_overloaded`, e.g. before
+        a bulk upload.
+
+        :type identifiers: iterable
+        :param identifiers: The buckets to check.
+
+        :type workers: int
+        :param workers: (optional) Number of buckets to check
+                        concurrently (default: 4).
+
+        :rtype: dict
+        :returns: A dict mapping each identifier to True if it is over
+                  limit, False otherwise.
+        """
+        def check(identifier):
+            return (identifier, self.s3_is_overloaded(identifier, access_key, ttl))
+
+        return dict(iter_threaded(check, identifiers, workers, ordered=False))
+
+    def _check_s3_limit(self, identifier, access_key):
         u = '{protocol}//s3.us.archive.org'.format(protocol=self.protocol)
         p = dict(
             check_limit=1,
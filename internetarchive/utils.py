@@ -9,11 +9,20 @@ This module provides utility functions for the internetarchive library.
 :license: AGPL 3, see LICENSE for more details.
 """
 import sys
+import codecs
 import hashlib
+import json
+import mmap
 import os
+import random
 import re
-from itertools import starmap
-from six.moves import zip_longest
+import sqlite3
+import threading
+import time
+import zlib
+from itertools import starmap, islice
+import six
+from six.moves import zip_longest, queue
 from collections import Mapping
 
 
@@ -50,7 +59,161 @@ def needs_quote(s):
     return re.search(r'\s', s) is not None
 
 
-def get_md5(file_object):
+class ChecksumCache(object):
+    """A persistent cache of the md5 digests of local files, stored in
+    an SQLite database at ``path``.
+
+    Entries are keyed by path, inode, size and mtime, so modified files
+    are rehashed automatically. The cache is best effort: if the
+    database can't be used, lookups miss and updates are ignored.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._connection = None
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        if self._connection is None:
+            parent_dir = os.path.dirname(self.path)
+            if parent_dir and not os.path.isdir(parent_dir):
+                os.makedirs(parent_dir)
+            connection = sqlite3.connect(self.path, timeout=30,
+                                         check_same_thread=False)
+            connection.execute('CREATE TABLE IF NOT EXISTS checksums ('
+                               'path TEXT PRIMARY KEY, inode INTEGER, size INTEGER, '
+                               'mtime REAL, md5 TEXT)')
+            self._connection = connection
+        return self._connection
+
+    def _stat(self, path):
+        st = os.stat(path)
+        return (os.path.abspath(path), st.st_ino, st.st_size, st.st_mtime)
+
+    def get(self, path):
+        """Return the cached md5 of the file at ``path``, or None if it
+        isn't cached or the file has changed since.
+        """
+        try:
+            key = self._stat(path)
+            with self._lock:
+                row = self._connect().execute(
+                    'SELECT inode, size, mtime, md5 FROM checksums WHERE path = ?',
+                    key[:1]).fetchone()
+        except (OSError, sqlite3.Error):
+            return None
+        if row and tuple(row[:3]) == key[1:]:
+            return row[3]
+        return None
+
+    def set(self, path, md5):
+        """Record ``md5`` as the digest of the file at ``path``."""
+        try:
+            key = self._stat(path)
+            with self._lock:
+                connection = self._connect()
+                with connection:
+                    connection.execute('INSERT OR REPLACE INTO checksums '
+                                       'VALUES (?, ?, ?, ?, ?)', key + (md5,))
+        except (OSError, sqlite3.Error):
+            pass
+
+
+class UploadJournal(object):
+    """An append-only record of confirmed uploads, stored as one JSON
+    object per line in the file at ``path``.
+
+    Every line records the identifier, key, local size and mtime, md5
+    and status of an upload. If ``resume`` is True, the uploads already
+    recorded at ``path`` are loaded, so unchanged files can be skipped
+    without hashing them or contacting Archive.org.
+    """
+
+    def __init__(self, path, resume=None):
+        self.path = path
+        self._entries = dict()
+        self._fh = None
+        self._lock = threading.Lock()
+        if resume and os.path.exists(path):
+            with open(path) as fh:
+                for line in fh:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # The last line may have been cut short.
+                        continue
+                    self._entries[(entry['identifier'], entry['key'])] = entry
+
+    def is_uploaded(self, identifier, key, path):
+        """Return True if the file at ``path`` has been recorded as
+        uploaded to ``key`` in ``identifier``, and hasn't changed since.
+        """
+        entry = self._entries.get((identifier, key))
+        if not entry or not isinstance(path, six.string_types):
+            return False
+        try:
+            st = os.stat(path)
+        except OSError:
+            return False
+        return (entry['size'], entry['mtime']) == (st.st_size, st.st_mtime)
+
+    def record(self, identifier, key, path, md5=None, status=None):
+        """Record the upload of the file at ``path`` to ``key`` in
+        ``identifier``. Uploads that aren't files on disk are ignored.
+
+        :type status: str
+        :param status: (optional) ``uploaded``, or ``skipped`` if the file
+                       already existed (default: uploaded).
+        """
+        if not isinstance(path, six.string_types) or not os.path.isfile(path):
+            return
+        st = os.stat(path)
+        entry = dict(
+            identifier=identifier,
+            key=key,
+            size=st.st_size,
+            mtime=st.st_mtime,
+            md5=md5,
+            status='uploaded' if status is None else status,
+        )
+        line = '{0}\n'.format(json.dumps(entry, sort_keys=True))
+        with self._lock:
+            if self._fh is None:
+                self._fh = open(self.path, 'a')
+                # Don't append to a line cut short by an interrupted run.
+                if os.path.getsize(self.path) and not _ends_with_newline(self.path):
+                    self._fh.write('\n')
+            self._fh.write(line)
+            self._fh.flush()
+            self._entries[(identifier, key)] = entry
+
+    def close(self):
+        with self._lock:
+            if self._fh is not None:
+                self._fh.close()
+                self._fh = None
+
+
+def _ends_with_newline(path):
+    with open(path, 'rb') as fh:
+        fh.seek(-1, os.SEEK_END)
+        return fh.read(1) == b'\n'
+
+
+def get_md5(file_object, cache=None):
+    """Return the md5 hex digest of ``file_object``.
+
+    :type cache: :class:`ChecksumCache`
+    :param cache: (optional) Look the digest up in, and add it to, this
+                  cache if ``file_object`` is a file on disk.
+    """
+    path = _cache_path(file_object, cache)
+    if path:
+        md5 = cache.get(path)
+        if md5:
+            file_object.seek(0, os.SEEK_SET)
+            return md5
+
     m = hashlib.md5()
     while True:
         data = file_object.read(8192)
@@ -58,7 +221,68 @@ def get_md5(file_object):
             break
         m.update(data)
     file_object.seek(0, os.SEEK_SET)
-    return m.hexdigest()
+    md5 = m.hexdigest()
+    if path:
+        cache.set(path, md5)
+    return md5
+
+
+def get_cached_md5(file_object, cache):
+    """Return the md5 hex digest of ``file_object`` if it is a file on
+    disk with a digest in ``cache``, None otherwise. The file is never
+    read.
+    """
+    path = _cache_path(file_object, cache)
+    return cache.get(path) if path else None
+
+
+def _cache_path(file_object, cache):
+    path = getattr(file_object, 'name', None)
+    if cache is None or not isinstance(path, six.string_types) \
+            or not os.path.isfile(path):
+        return None
+    return path
+
+
+class Checksums(object):
+    """Compute the md5, sha1 and crc32 digests of a stream of data in
+    a single pass, e.g. while it is being downloaded.
+    """
+
+    def __init__(self):
+        self._md5 = hashlib.md5()
+        self._sha1 = hashlib.sha1()
+        self._crc32 = 0
+
+    def update(self, data):
+        self._md5.update(data)
+        self._sha1.update(data)
+        self._crc32 = zlib.crc32(data, self._crc32)
+
+    def hexdigests(self):
+        """Return a dict of hex digests, keyed like the checksums in
+        item file metadata.
+        """
+        return dict(
+            md5=self._md5.hexdigest(),
+            sha1=self._sha1.hexdigest(),
+            crc32='{0:08x}'.format(self._crc32 & 0xffffffff),
+        )
+
+
+def get_checksums(file_object, size=None):
+    """Return a :class:`Checksums` of the contents of ``file_object``,
+    read from its current position up to ``size`` bytes if given.
+    """
+    checksums = Checksums()
+    while size is None or size > 0:
+        data = file_object.read(1048576 if size is None else min(size, 1048576))
+        if not data:
+            break
+        checksums.update(data)
+        if size is not None:
+            size -= len(data)
+    return checksums
 
 
 def chunk_generator(fp, chunk_size):
@@ -69,6 +293,98 @@ def chunk_generator(fp, chunk_size):
         yield chunk
 
 
+def iter_threaded(func, iterable, workers=None, ordered=None, window=None):
+    """Map ``func`` over ``iterable`` using a pool of worker threads.
+
+    At most ``window`` calls are queued or running at any time, so
+    ``iterable`` is consumed lazily and memory use stays bounded no
+    matter how long it is. Exceptions raised by ``func`` are re-raised
+    in the consuming thread when their result is reached. Closing the
+    generator early cancels any work that has not yet started.
+
+    :type workers: int
+    :param workers: (optional) Number of worker threads (default: 4).
+
+    :type ordered: bool
+    :param ordered: (optional) Yield results in input order rather than
+                    in completion order (default: True).
+
+    :type window: int
+    :param window: (optional) Maximum number of outstanding calls
+                   (default: ``workers * 2``).
+    """
+    workers = 4 if not workers else int(workers)
+    ordered = True if ordered is None else ordered
+    window = workers * 2 if not window else max(int(window), workers)
+
+    tasks = queue.Queue()
+    results = queue.Queue()
+
+    def worker():
+        while True:
+            task = tasks.get()
+            if task is None:
+                break
+            i, arg = task
+            try:
+                results.put((i, True, func(arg)))
+            except BaseException:
+                # Every task must produce a result, or the consumer would
+                # wait for it forever, so e.g. SystemExit is passed on too.
+                results.put((i, False, sys.exc_info()))
+
+    def get_result():
+        # Poll with a timeout, a blocking Queue.get() can not be
+        # interrupted by KeyboardInterrupt on Python 2.
+        while True:
+            try:
+                return results.get(timeout=1)
+            except queue.Empty:
+                continue
+
+    threads = [threading.Thread(target=worker) for _ in range(workers)]
+    for t in threads:
+        t.daemon = True
+        t.start()
+
+    iterator = iter(iterable)
+    submitted = 0
+    received = 0
+    next_index = 0
+    finished = {}
+    try:
+        for arg in islice(iterator, window):
+            tasks.put((submitted, arg))
+            submitted += 1
+        while received < submitted:
+            i, ok, value = get_result()
+            received += 1
+            finished[i] = (ok, value)
+            if ordered:
+                ready = []
+                while next_index in finished:
+                    ready.append(finished.pop(next_index))
+                    next_index += 1
+            else:
+                ready = [finished.pop(i)]
+            for ok, value in ready:
+                for arg in islice(iterator, 1):
+                    tasks.put((submitted, arg))
+                    submitted += 1
+                if not ok:
+                    six.reraise(*value)
+                yield value
+    finally:
+        # Drop work that hasn't started yet, and stop the workers.
+        while True:
+            try:
+                tasks.get_nowait()
+            except queue.Empty:
+                break
+        for _ in threads:
+            tasks.put(None)
+
+
 def suppress_keyboard_interrupt_message():
     """Register a new excepthook to suppress KeyboardInterrupt
     exception messages, and exit with status code 130.
@@ -85,16 +401,423 @@ def suppress_keyboard_interrupt_message():
     sys.excepthook = new_hook
 
 
+class RateLimiter(object):
+    """A token bucket whose rate adapts to throttling, shared by all
+    requests to one IA-S3 bucket.
+
+    :meth:`acquire` blocks until a request may be sent. Every
+    :meth:`success` raises the rate by ``increase`` requests per second,
+    every :meth:`throttle` multiplies it by ``decrease`` and pauses all
+    callers for a jittered, exponentially growing delay (AIMD). A
+    throttle reported for a request sent before the previous throttle
+    is ignored, so concurrent 503s only slow the bucket down once.
+    """
+
+    def __init__(self, rate=None, min_rate=None, max_rate=None, increase=None,
+                 decrease=None, backoff=None):
+        self.max_rate = 25.0 if max_rate is None else float(max_rate)
+        self.min_rate = 0.1 if min_rate is None else float(min_rate)
+        self.rate = self.max_rate if rate is None else float(rate)
+        self.increase = 0.1 if increase is None else increase
+        self.decrease = 0.5 if decrease is None else decrease
+        self.backoff = 1.0 if backoff is None else backoff
+        self.epoch = 0
+        self.throttles = 0
+        self._tokens = max(1.0, self.rate)
+        self._updated = time.time()
+        self._resume_at = 0.0
+        self._probing = False
+        self._probe_epoch = None
+        self._probe_result = None
+        self._cond = threading.Condition()
+
+    def _refill(self, now):
+        elapsed = max(0.0, now - self._updated)
+        self._tokens = min(max(1.0, self.rate), self._tokens + elapsed * self.rate)
+        self._updated = max(now, self._updated)
+
+    def acquire(self):
+        """Wait for a token and return the current epoch, which is
+        passed back to :meth:`success` or :meth:`throttle`.
+        """
+        with self._cond:
+            while True:
+                now = time.time()
+                self._refill(now)
+                wait = self._resume_at - now
+                if wait <= 0:
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        return self.epoch
+                    wait = (1 - self._tokens) / self.rate
+                self._cond.wait(wait)
+
+    def success(self, epoch):
+        with self._cond:
+            self.rate = min(self.max_rate, self.rate + self.increase)
+            if epoch == self.epoch:
+                self.throttles = 0
+
+    def throttle(self, epoch, max_delay=None):
+        """Slow down after a request sent in ``epoch`` was throttled.
+
+        :type max_delay: float
+        :param max_delay: (optional) Upper bound of the backoff delay.
+
+        :returns: The number of seconds until requests are resumed.
+        """
+        with self._cond:
+            now = time.time()
+            if epoch == self.epoch:
+                self.epoch += 1
+                self.throttles += 1
+                self.rate = max(self.min_rate, self.rate * self.decrease)
+                delay = self.backoff * 2 ** min(self.throttles - 1, 16)
+                if max_delay is not None:
+                    delay = min(delay, max_delay)
+                # Jitter keeps clients that were throttled together
+                # from retrying together.
+                delay = random.uniform(delay / 2, delay)
+                self._resume_at = max(self._resume_at, now + delay)
+                self._tokens = 0.0
+                self._updated = self._resume_at
+            return max(0.0, self._resume_at - now)
+
+    def probe(self, check):
+        """Return the result of ``check()``, which is only called once
+        per epoch. Concurrent callers wait for and share one result.
+        """
+        with self._cond:
+            while self._probing:
+                self._cond.wait()
+            if self._probe_epoch == self.epoch:
+                return self._probe_result
+            epoch = self.epoch
+            self._probing = True
+        try:
+            result = check()
+        except Exception:
+            with self._cond:
+                self._probing = False
+                self._cond.notify_all()
+            raise
+        with self._cond:
+            self._probe_epoch = epoch
+            self._probe_result = result
+            self._probing = False
+            self._cond.notify_all()
+        return result
+
+
+class FileSlice(object):
+    """A read-only file-like view of ``size`` bytes of the file at
+    ``path``, starting at ``offset``. Every slice opens its own file
+    handle, so slices of one file can be read concurrently.
+    """
+
+    def __init__(self, path, offset, size):
+        self._fp = open(path, 'rb')
+        self._fp.seek(offset)
+        self._remaining = size
+        self.length = size
+
+    def read(self, size=-1):
+        if size is None or size < 0 or size > self._remaining:
+            size = self._remaining
+        data = self._fp.read(size)
+        self._remaining -= len(data)
+        return data
+
+    def close(self):
+        self._fp.close()
+
+    def __len__(self):
+        return self.length
+
+
+class HashingFileAdapter(object):
+    """Wrap a file-like object, computing the md5 digest of the data
+    as it is read, e.g. while it is being uploaded.
+
+    :type size: int
+    :param size: The length of the data, or None if it is a stream read
+                 until EOF.
+    """
+
+    def __init__(self, fp, size):
+        self.fp = fp
+        self.length = size
+        self.md5 = hashlib.md5()
+        self.bytes_read = 0
+        self._eof = False
+
+    def read(self, size=-1):
+        data = self.fp.read(size)
+        self.md5.update(data)
+        self.bytes_read += len(data)
+        if not data and size != 0:
+            self._eof = True
+        return data
+
+    def hexdigest(self):
+        """Return the md5 of the data read, or None if the file has not
+        been read to the end.
+        """
+        if self.length is None and not self._eof:
+            return None
+        elif self.length is not None and self.bytes_read != self.length:
+            return None
+        return self.md5.hexdigest()
+
+    def __len__(self):
+        return self.length
+
+
+class MmapFileAdapter(object):
+    """An upload body for a file on disk, sent as ``memoryview`` slices
+    of a read-only memory map of the file so the data is never copied
+    in Python. It is iterated by the HTTP client rather than read, and
+    is only supported on Python 3, where the standard library sends an
+    iterable body chunk by chunk.
+
+    :type callback: callable
+    :param callback: (optional) Called with the number of bytes sent so
+                     far after every chunk, e.g. to report progress.
+
+    :type md5: bool
+    :param md5: (optional) Compute the md5 of the file as it is sent.
+    """
+
+    def __init__(self, fp, size=None, chunk_size=None, callback=None, md5=None):
+        self.length = os.fstat(fp.fileno()).st_size if size is None else size
+        self.chunk_size = 1048576 if chunk_size is None else chunk_size
+        self.callback = callback
+        self.hash_md5 = True if md5 else False
+        self.md5 = None
+        self.bytes_read = 0
+        self._mmap = mmap.mmap(fp.fileno(), self.length, access=mmap.ACCESS_READ)
+
+    def __iter__(self):
+        self.bytes_read = 0
+        self.md5 = hashlib.md5() if self.hash_md5 else None
+        view = memoryview(self._mmap)
+        for offset in range(0, self.length, self.chunk_size):
+            chunk = view[offset:offset + self.chunk_size]
+            if self.md5 is not None:
+                self.md5.update(chunk)
+            self.bytes_read += len(chunk)
+            yield chunk
+            if self.callback:
+                self.callback(self.bytes_read)
+
+    def hexdigest(self):
+        """Return the md5 of the data sent, or None if the file has not
+        been sent to the end.
+        """
+        if self.md5 is None or self.bytes_read != self.length:
+            return None
+        return self.md5.hexdigest()
+
+    def close(self):
+        try:
+            self._mmap.close()
+        except BufferError:
+            # Slices are still referenced, the map is closed once they
+            # are garbage collected.
+            pass
+
+    def __len__(self):
+        return self.length
+
+
 class IterableToFileAdapter(object):
-    def __init__(self, iterable, size):
+    """A file-like object reading the byte strings yielded by
+    ``iterable``, e.g. a generator or a progress bar wrapping the chunks
+    of a file.
+
+    ``read(size)`` returns exactly ``size`` bytes until the data runs
+    out. Reads within a chunk are sliced from it, and only reads
+    spanning several chunks are assembled in a buffer that is reused
+    across reads.
+
+    :type size: int
+    :param size: (optional) The total length of the data. If it is not
+                 known, ``len()`` is 0 and requests sends the body with
+                 chunked transfer encoding.
+    """
+
+    def __init__(self, iterable, size=None):
         self.iterator = iter(iterable)
         self.length = size
+        self._chunk = b''
+        self._offset = 0
+        self._buffer = bytearray()
+
+    def read(self, size=-1):
+        chunk, offset = self._chunk, self._offset
+        if size is None or size < 0:
+            self._chunk, self._offset = b'', 0
+            return b''.join([chunk[offset:]] + list(self.iterator))
+        elif size == 0:
+            return b''
+        while len(chunk) == offset:
+            chunk, offset = next(self.iterator, None), 0
+            if chunk is None:
+                self._chunk = b''
+                return b''
+        if len(chunk) - offset >= size:
+            self._chunk, self._offset = chunk, offset + size
+            if offset == 0 and size == len(chunk):
+                return chunk
+            return chunk[offset:offset + size]
 
-    def read(self, size=-1):  # TBD: add buffer for `len(data) > size` case
-        return next(self.iterator, b'')
+        buf = self._buffer
+        del buf[:]
+        buf += memoryview(chunk)[offset:]
+        self._chunk, self._offset = b'', 0
+        for chunk in self.iterator:
+            needed = size - len(buf)
+            if len(chunk) >= needed:
+                buf += memoryview(chunk)[:needed]
+                self._chunk, self._offset = chunk, needed
+                break
+            buf += chunk
+        return bytes(buf)
+
+    def __iter__(self):
+        chunk, offset = self._chunk, self._offset
+        self._chunk, self._offset = b'', 0
+        if len(chunk) > offset:
+            yield chunk[offset:]
+        for chunk in self.iterator:
+            # An empty chunk would end a chunked request body.
+            if chunk:
+                yield chunk
 
     def __len__(self):
-        return self.length
+        return self.length or 0
+
+    # requests tests the truth value of the body, which must hold even
+    # if the length is unknown.
+    def __bool__(self):
+        return True
+
+    __nonzero__ = __bool__
+
+
+class JSONStream(object):
+    """An incremental reader of a JSON document arriving as chunks of
+    UTF-8 encoded bytes, e.g. from ``Response.iter_content()``.
+
+    Objects and arrays can be walked member by member with
+    :meth:`members` and :meth:`items`, while :meth:`value` decodes the
+    next complete value. Only the data not yet parsed is buffered.
+
+        >>> stream = JSONStream([b'{"a": 1, "b": [{"c"', b': 2}]}'])
+        >>> for key in stream.members():
+        ...     if key == 'b':
+        ...         print(list(stream.items()))
+        ...     else:
+        ...         print(stream.value())
+        1
+        [{'c': 2}]
+    """
+
+    _whitespace = re.compile(r'[ \t\n\r]*')
+    _number_chars = '0123456789.eE+-'
+    _decoder = json.JSONDecoder()
+
+    def __init__(self, chunks):
+        self.chunks = iter(chunks)
+        self.decoder = codecs.getincrementaldecoder('utf-8')()
+        self.buf = ''
+        self.pos = 0
+        self.eof = False
+
+    def _read(self):
+        chunk = next(self.chunks, None)
+        if chunk is None:
+            self.eof = True
+            text = self.decoder.decode(b'', True)
+        else:
+            text = self.decoder.decode(chunk)
+        self.buf = self.buf[self.pos:] + text
+        self.pos = 0
+
+    def peek(self):
+        """Return the next character that is not whitespace, without
+        consuming it.
+        """
+        while True:
+            self.pos = self._whitespace.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if self.eof:
+                raise ValueError('Unexpected end of JSON data')
+            self._read()
+
+    def expect(self, chars):
+        """Consume and return the next character, one of ``chars``."""
+        c = self.peek()
+        if c not in chars:
+            raise ValueError('Expecting one of {0!r} at position {1}, found {2!r}'.format(
+                chars, self.pos, c))
+        self.pos += 1
+        return c
+
+    def value(self):
+        """Decode and return the next value."""
+        self.peek()
+        needed = 0
+        while True:
+            if self.eof or len(self.buf) - self.pos >= needed:
+                try:
+                    value, end = self._decoder.raw_decode(self.buf, idx=self.pos)
+                except ValueError:
+                    if self.eof:
+                        raise
+                    # Retry once the buffered data has doubled, so a
+                    # value spanning many chunks is not parsed over and
+                    # over again.
+                    needed = 2 * (len(self.buf) - self.pos)
+                else:
+                    # A number is only complete once it is followed by
+                    # a character that can not continue it, e.g. "1."
+                    # may be the start of "1.5" in the next chunk.
+                    number = self.buf[self.pos] in self._number_chars
+                    follows = self.buf[end:end + 1]
+                    if not number or self.eof or (follows and
+                                                  follows not in self._number_chars):
+                        self.pos = end
+                        return value
+                    needed = len(self.buf) - self.pos + 1
+            self._read()
+
+    def members(self):
+        """Yield the keys of the next object. The value of each key has
+        to be consumed before the next key is read.
+        """
+        self.expect('{')
+        if self.peek() == '}':
+            self.pos += 1
+            return
+        while True:
+            key = self.value()
+            self.expect(':')
+            yield key
+            if self.expect(',}') == '}':
+                return
+
+    def items(self):
+        """Yield the values of the next array."""
+        self.expect('[')
+        if self.peek() == ']':
+            self.pos += 1
+            return
+        while True:
+            yield self.value()
+            if self.expect(',]') == ']':
+                return
 
 
 class IdentifierListAsItems(object):
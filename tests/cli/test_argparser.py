@@ -3,7 +3,7 @@ import os
 import sys
 inc_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.insert(0, inc_path)
-from internetarchive.cli.argparser import get_args_dict, get_xml_text
+from internetarchive.cli.argparser import get_args_dict, get_xml_text, get_jobs
 
 
 def test_get_xml_text():
@@ -40,3 +40,13 @@ def test_get_args_dict():
     args_dict = get_args_dict(test_input)
     for key, value in args_dict.items():
         assert test_output[key] == value
+
+
+def test_get_jobs():
+    assert get_jobs(None, 4) == (1, 4, False)
+    assert get_jobs(8, 2, progress=True) == (4, 2, True)
+    assert get_jobs(8, 2, progress=False) == (4, 2, False)
+    assert get_jobs(3, 2) == (1, 2, False)
+    # --jobs also limits the workers of a single item.
+    assert get_jobs(2, 4, single=True, progress=True) == (1, 2, False)
+    assert get_jobs(8, 2, single=True) == (1, 2, False)
@@ -3,8 +3,13 @@ import sys
 inc_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.insert(0, inc_path)
 import shutil
+import re
 from subprocess import Popen, PIPE
 
+import responses
+
+from internetarchive.cli import ia
+
 
 if sys.version_info < (2, 7, 9):
     protocol = 'http:'
@@ -12,6 +17,15 @@ else:
     protocol = 'https:'
 
 
+ROOT_DIR = os.getcwd()
+TEST_JSON_FILE = os.path.join(ROOT_DIR, 'tests/data/nasa_meta.json')
+with open(TEST_JSON_FILE, 'r') as fh:
+    ITEM_METADATA = fh.read().strip()
+
+METADATA_URL_RE = re.compile(r'{0}//archive.org/metadata/.*'.format(protocol))
+DOWNLOAD_URL_RE = re.compile(r'{0}//archive.org/download/.*'.format(protocol))
+
+
 def call(cmd):
     proc = Popen(cmd, shell=True, stdout=PIPE, stderr=PIPE)
     stdout, stderr = proc.communicate()
@@ -177,3 +191,54 @@ def test_destdir(tmpdir):
     assert exit_code == 0
 
     rm('thisdirdoesnotexist')
+
+
+def test_itemlist_jobs(tmpdir, capsys):
+    tmpdir.chdir()
+    with open('itemlist.txt', 'w') as fh:
+        fh.write('nasa\nnasa2\nnasa3\n')
+
+    with responses.RequestsMock(assert_all_requests_are_fired=False) as rsps:
+        rsps.add(responses.GET, METADATA_URL_RE,
+                 body=ITEM_METADATA,
+                 status=200,
+                 content_type='application/json')
+        rsps.add(responses.GET, DOWNLOAD_URL_RE, body='test content', status=200)
+        sys.argv = ['ia', 'download', '--itemlist=itemlist.txt', '--glob=*.xml',
+                    '--jobs=4', '--workers=2', '--queue-size=2']
+        try:
+            ia.main()
+        except SystemExit as exc:
+            assert not exc.code
+
+    out, err = capsys.readouterr()
+    expected_output = set(['nasa (1/3): - success',
+                           'nasa2 (2/3): - success',
+                           'nasa3 (3/3): - success'])
+    assert set(out.strip().split('\n')) == expected_output
+    for identifier in ['nasa', 'nasa2', 'nasa3']:
+        assert set(os.listdir(identifier)) == set(['nasa_files.xml',
+                                                   'nasa_meta.xml',
+                                                   'nasa_reviews.xml'])
+
+
+def test_itemlist_metadata_error(tmpdir, capsys):
+    tmpdir.chdir()
+    with open('itemlist.txt', 'w') as fh:
+        fh.write('nasa\nmissing\n')
+
+    with responses.RequestsMock(assert_all_requests_are_fired=False) as rsps:
+        rsps.add(responses.GET, '{0}//archive.org/metadata/nasa'.format(protocol),
+                 body=ITEM_METADATA,
+                 status=200,
+                 content_type='application/json')
+        rsps.add(responses.GET, DOWNLOAD_URL_RE, body='test content', status=200)
+        sys.argv = ['ia', 'download', '--itemlist=itemlist.txt', '--glob=nasa_meta.xml']
+        try:
+            ia.main()
+        except SystemExit as exc:
+            assert not exc.code
+
+    out, err = capsys.readouterr()
+    assert 'nasa (1/2): d - success' in out
+    assert 'missing: failed to retrieve item metadata - errors' in out
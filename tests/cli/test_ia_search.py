@@ -26,16 +26,10 @@ with open(TEST_JSON_FILE) as fh:
 
 
 def test_ia_search_sort_asc(capsys):
-    url1 = ('{0}//archive.org/advancedsearch.php?q=collection%3Anasa&output=json&'
-            'rows=0&sort%5B0%5D=identifier+asc'.format(protocol))
-    url2 = ('{0}//archive.org/advancedsearch.php?q=collection%3Anasa&output=json&'
-            'rows=250&sort%5B0%5D=identifier+asc&page=1'.format(protocol))
+    url = ('{0}//archive.org/advancedsearch.php?q=collection%3Anasa&output=json&'
+           'rows=250&sort%5B0%5D=identifier+asc&page=1'.format(protocol))
     with responses.RequestsMock() as rsps:
-        rsps.add(responses.GET, url1,
-                 body=TEST_SEARCH_RESPONSE,
-                 status=200,
-                 match_querystring=True)
-        rsps.add(responses.GET, url2,
+        rsps.add(responses.GET, url,
                  body=TEST_SEARCH_RESPONSE,
                  status=200,
                  match_querystring=True)
@@ -54,23 +48,13 @@ def test_ia_search_sort_asc(capsys):
 
 def test_ia_search_multi_page(capsys):
     j = json.loads(TEST_SEARCH_RESPONSE)
-    url1 = ('{0}//archive.org/advancedsearch.php?'
-            'q=collection%3Anasa&output=json&rows=0&sort%5B0%5D=identifier+asc&'
-            'fl%5B0%5D=identifier'.format(protocol))
     url2 = ('{0}//archive.org/advancedsearch.php?'
             'q=collection%3Anasa&output=json&rows=25&page=1&sort%5B0%5D=identifier+asc&'
             'fl%5B0%5D=identifier'.format(protocol))
     url3 = ('{0}//archive.org/advancedsearch.php?'
             'q=collection%3Anasa&output=json&rows=25&page=2&sort%5B0%5D=identifier+asc&'
             'fl%5B0%5D=identifier'.format(protocol))
-    url4 = ('{0}//archive.org/advancedsearch.php?'
-            'q=collection%3Anasa&output=json&rows=25&page=3&sort%5B0%5D=identifier+asc&'
-            'fl%5B0%5D=identifier'.format(protocol))
     with responses.RequestsMock() as rsps:
-        rsps.add(responses.GET, url1,
-                 body=TEST_SEARCH_RESPONSE,
-                 status=200,
-                 match_querystring=True)
         _j = deepcopy(j)
         _j['response']['docs'] = j['response']['docs'][:25]
         rsps.add(responses.GET, url2,
@@ -83,12 +67,6 @@ def test_ia_search_multi_page(capsys):
                  body=json.dumps(_j),
                  status=200,
                  match_querystring=True)
-        _j = deepcopy(j)
-        _j['response']['docs'] = []
-        rsps.add(responses.GET, url4,
-                 body=json.dumps(_j),
-                 status=200,
-                 match_querystring=True)
 
         sys.argv = ['ia', 'search', 'collection:nasa', '-p', 'rows:25', '-f',
                     'identifier']
@@ -110,17 +88,10 @@ def test_ia_search_multi_page(capsys):
 
 def test_ia_search_itemlist(capsys):
     with responses.RequestsMock() as rsps:
-        url1 = ('{0}//archive.org/advancedsearch.php?'
-                'q=collection%3Aattentionkmartshoppers&output=json&rows=0&'
-                'sort%5B0%5D=identifier+asc&fl%5B0%5D=identifier'.format(protocol))
-        url2 = ('{0}//archive.org/advancedsearch.php?'
-                'fl%5B0%5D=identifier&rows=250&sort%5B0%5D=identifier+asc&q=collection%3'
-                'Aattentionkmartshoppers&output=json&page=1'.format(protocol))
-        rsps.add(responses.GET, url1,
-                 body=TEST_SEARCH_RESPONSE,
-                 status=200,
-                 match_querystring=True)
-        rsps.add(responses.GET, url2,
+        url = ('{0}//archive.org/advancedsearch.php?'
+               'fl%5B0%5D=identifier&rows=250&sort%5B0%5D=identifier+asc&q=collection%3'
+               'Aattentionkmartshoppers&output=json&page=1'.format(protocol))
+        rsps.add(responses.GET, url,
                  body=TEST_SEARCH_RESPONSE,
                  status=200,
                  match_querystring=True)
@@ -3,6 +3,8 @@ import sys
 inc_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.insert(0, inc_path)
 import json
+import re
+import threading
 
 import responses
 
@@ -49,6 +51,98 @@ def test_ia_upload(tmpdir):
                 'test.txt'.format(protocol)) in fh.read()
 
 
+def test_ia_upload_workers(tmpdir, capsys, monkeypatch):
+    monkeypatch.chdir(str(tmpdir))
+    for name in ['test1.txt', 'test2.txt', 'test3.txt']:
+        with open(name, 'w') as fh:
+            fh.write('foo')
+
+    with responses.RequestsMock(assert_all_requests_are_fired=False) as rsps:
+        rsps.add(responses.GET, '{0}//archive.org/metadata/nasa'.format(protocol),
+                 body=ITEM_METADATA,
+                 status=200,
+                 content_type='application/json')
+        rsps.add(responses.PUT, '{0}//s3.us.archive.org/nasa/test1.txt'.format(protocol),
+                 body='',
+                 status=200)
+        rsps.add(responses.PUT, '{0}//s3.us.archive.org/nasa/test2.txt'.format(protocol),
+                 body='',
+                 status=200)
+        rsps.add(responses.PUT, '{0}//s3.us.archive.org/nasa/test3.txt'.format(protocol),
+                 body='',
+                 status=200)
+        sys.argv = ['ia', 'upload', 'nasa', 'test1.txt', 'test2.txt', 'test3.txt',
+                    '--workers=2']
+        try:
+            ia.main()
+        except SystemExit as exc:
+            assert not exc.code
+
+    out, err = capsys.readouterr()
+    assert ' uploaded test1.txt' in out
+    assert ' uploaded test2.txt' in out
+
+
+def test_ia_upload_stdin(capsys, monkeypatch):
+    r, w = os.pipe()
+    os.write(w, b'foo')
+    os.close(w)
+    monkeypatch.setattr(sys, 'stdin', os.fdopen(r, 'r'))
+    body = []
+
+    def request_callback(request):
+        body.append(b''.join(request.body))
+        return (200, {}, '')
+
+    with responses.RequestsMock() as rsps:
+        rsps.add(responses.GET, '{0}//archive.org/metadata/nasa'.format(protocol),
+                 body=ITEM_METADATA,
+                 status=200,
+                 content_type='application/json')
+        rsps.add_callback(responses.PUT,
+                          '{0}//s3.us.archive.org/nasa/hi.txt'.format(protocol),
+                          callback=request_callback)
+        sys.argv = ['ia', 'upload', 'nasa', '-', '--remote-name=hi.txt']
+        try:
+            ia.main()
+        except SystemExit as exc:
+            assert not exc.code
+
+    assert body == [b'foo']
+
+
+def test_ia_upload_stdin_checksum_error(capsys, monkeypatch):
+    r, w = os.pipe()
+    os.write(w, b'foo')
+    os.close(w)
+    monkeypatch.setattr(sys, 'stdin', os.fdopen(r, 'r'))
+
+    def request_callback(request):
+        b''.join(request.body)
+        # The md5 of an empty body.
+        return (200, {'ETag': '"d41d8cd98f00b204e9800998ecf8427e"'}, '')
+
+    with responses.RequestsMock() as rsps:
+        rsps.add(responses.GET, '{0}//archive.org/metadata/nasa'.format(protocol),
+                 body=ITEM_METADATA,
+                 status=200,
+                 content_type='application/json')
+        rsps.add_callback(responses.PUT,
+                          '{0}//s3.us.archive.org/nasa/hi.txt'.format(protocol),
+                          callback=request_callback)
+        sys.argv = ['ia', 'upload', 'nasa', '-', '--remote-name=hi.txt']
+        try:
+            ia.main()
+        except SystemExit as exc:
+            assert exc.code == 1
+        else:
+            assert False
+
+    out, err = capsys.readouterr()
+    assert 'error uploading to nasa' in err
+    assert 'does not match the ETag' in err
+
+
 def test_ia_upload_status_check(capsys):
     with responses.RequestsMock() as rsps:
         rsps.add(responses.GET, '{0}//s3.us.archive.org'.format(protocol),
@@ -83,6 +177,125 @@ def test_ia_upload_status_check(capsys):
                 'Expect 503 SlowDown errors.') in err
 
 
+def test_ia_upload_spreadsheet(tmpdir, capsys, monkeypatch):
+    monkeypatch.chdir(str(tmpdir))
+    for name in ['a.txt', 'b.txt', 'c.txt', 'd.txt']:
+        with open(name, 'w') as fh:
+            fh.write('foo')
+    with open('metadata.csv', 'w') as fh:
+        fh.write('identifier,file,title\n'
+                 'nasa,a.txt,NASA\n'
+                 ',b.txt,\n'
+                 'nasa2,c.txt,Other\n'
+                 'nasa,d.txt,\n')
+
+    lock = threading.Lock()
+    puts = []
+
+    def put_callback(request):
+        with lock:
+            puts.append((request.url.split('/', 3)[-1],
+                         request.headers['x-archive-meta00-title']))
+        return (200, {}, '')
+
+    with responses.RequestsMock(assert_all_requests_are_fired=False) as rsps:
+        for identifier in ['nasa', 'nasa2']:
+            rsps.add(responses.GET,
+                     '{0}//archive.org/metadata/{1}'.format(protocol, identifier),
+                     body=ITEM_METADATA,
+                     status=200,
+                     content_type='application/json')
+        rsps.add_callback(responses.PUT,
+                          re.compile(r'{0}//s3.us.archive.org/.*'.format(protocol)),
+                          callback=put_callback)
+        sys.argv = ['ia', 'upload', '--spreadsheet=metadata.csv', '--jobs=2',
+                    '--report=report.csv']
+        try:
+            ia.main()
+        except SystemExit as exc:
+            assert not exc.code
+        # Metadata is fetched once per item.
+        assert len([c for c in rsps.calls if c.request.method == 'GET']) == 2
+
+    assert sorted(puts) == [('nasa/a.txt', 'NASA'), ('nasa/b.txt', 'NASA'),
+                            ('nasa/d.txt', 'NASA'), ('nasa2/c.txt', 'Other')]
+    out, err = capsys.readouterr()
+    assert 'nasa: - success' in out
+    assert 'nasa2: - success' in out
+    with open('report.csv') as fh:
+        report = fh.read().splitlines()
+    assert report[0] == 'identifier,file,status,error'
+    assert sorted(report[1:]) == ['nasa,a.txt,uploaded,', 'nasa,b.txt,uploaded,',
+                                  'nasa,d.txt,uploaded,', 'nasa2,c.txt,uploaded,']
+
+
+def test_ia_upload_resume(tmpdir, capsys, monkeypatch):
+    monkeypatch.chdir(str(tmpdir))
+    for name in ['a.txt', 'b.txt']:
+        with open(name, 'w') as fh:
+            fh.write('foo')
+    with open('metadata.csv', 'w') as fh:
+        fh.write('identifier,file\nnasa,a.txt\nnasa,b.txt\n')
+
+    with responses.RequestsMock(assert_all_requests_are_fired=False) as rsps:
+        rsps.add(responses.GET, '{0}//archive.org/metadata/nasa'.format(protocol),
+                 body=ITEM_METADATA,
+                 status=200,
+                 content_type='application/json')
+        rsps.add(responses.PUT, re.compile(r'.*s3.us.archive.org/.*'), status=200)
+        sys.argv = ['ia', 'upload', 'nasa', 'a.txt', 'b.txt', '--journal=journal']
+        try:
+            ia.main()
+        except SystemExit as exc:
+            assert not exc.code
+
+    # Completed uploads are skipped without any requests.
+    with responses.RequestsMock() as rsps:
+        for argv in [['nasa', 'a.txt', 'b.txt'], ['--spreadsheet=metadata.csv']]:
+            sys.argv = ['ia', 'upload', '--journal=journal', '--resume'] + argv
+            try:
+                ia.main()
+            except SystemExit as exc:
+                assert not exc.code
+    out, err = capsys.readouterr()
+    assert out.count('nasa: already uploaded, skipping.') == 2
+
+    sys.argv = ['ia', 'upload', 'nasa', 'a.txt', '--resume']
+    try:
+        ia.main()
+    except SystemExit as exc:
+        assert exc.code == 1
+    out, err = capsys.readouterr()
+    assert '--resume requires --journal' in err
+
+
+def test_ia_upload_status_check_spreadsheet(capsys, tmpdir):
+    spreadsheet = str(tmpdir.join('metadata.csv'))
+    with open(spreadsheet, 'w') as fh:
+        fh.write('identifier,file\nnasa,a.txt\n,b.txt\nbusy,c.txt\nnasa,d.txt\n')
+
+    def callback(request):
+        j = json.loads(STATUS_CHECK_RESPONSE)
+        j['over_limit'] = 1 if 'bucket=busy' in request.url else 0
+        return (200, {}, json.dumps(j))
+
+    with responses.RequestsMock(assert_all_requests_are_fired=False) as rsps:
+        rsps.add_callback(responses.GET,
+                          re.compile(r'{0}//s3.us.archive.org.*'.format(protocol)),
+                          callback=callback)
+        sys.argv = ['ia', 'upload', '--spreadsheet', spreadsheet, '--status-check']
+        try:
+            ia.main()
+        except SystemExit as exc:
+            assert exc.code == 1
+        assert len(rsps.calls) == 2
+
+    out, err = capsys.readouterr()
+    assert out == 'success: nasa is accepting requests.\n'
+    assert ('warning: busy is over limit, and not accepting requests. '
+            'Expect 503 SlowDown errors.') in err
+
+
 def test_ia_upload_debug(capsys):
     with responses.RequestsMock() as rsps:
         rsps.add(responses.GET, '{0}//archive.org/metadata/nasa'.format(protocol),
@@ -14,11 +14,25 @@ else:
     protocol = 'https:'
 
 
+@pytest.fixture(autouse=True)
+def checksum_cache(tmpdir_factory, monkeypatch):
+    """Keep the checksum cache of every session out of the home directory."""
+    path = str(tmpdir_factory.mktemp('checksums').join('ia-checksums.sqlite'))
+    monkeypatch.setattr('internetarchive.session.get_checksum_cache_path', lambda: path)
+    return path
+
+
 @pytest.fixture
 def json_filename():
     return os.path.join(os.path.dirname(__file__), 'data/nasa_meta.json')
 
 
+@pytest.fixture
+def nasa_meta_xml():
+    with open(os.path.join(os.path.dirname(__file__), 'data/nasa_meta.xml'), 'r') as fh:
+        return fh.read()
+
+
 @pytest.fixture
 def session():
     return get_session()
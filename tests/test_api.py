@@ -6,6 +6,7 @@ sys.path.insert(0, inc_path)
 import json
 from copy import deepcopy
 import re
+import time
 
 import six
 import pytest
@@ -369,6 +370,20 @@ def test_search_items():
         assert list(r.iter_as_results()) == expected_results
 
 
+def test_search_items_repr():
+    search_response_str = json.dumps(SEARCH_RESPONSE)
+    with responses.RequestsMock() as rsps:
+        r = search_items('identifier:nasa')
+        # No request is sent to show the search.
+        assert repr(r) == "Search(query={0!r})".format('identifier:nasa')
+        rsps.add(responses.GET, '{0}//archive.org/advancedsearch.php'.format(protocol),
+                 body=search_response_str,
+                 status=200)
+        assert [d for d in r] == [{'identifier': 'nasa'}]
+        assert repr(r) == "Search(query={0!r}, num_found=1)".format('identifier:nasa')
+        assert len(rsps.calls) == 1
+
+
 def test_search_items_with_fields():
     search_r = deepcopy(SEARCH_RESPONSE)
     search_r['response']['docs'] = [
@@ -415,3 +430,181 @@ def test_page_row_specification():
         assert [x.identifier for x in r.iter_as_items()] == ['nasa']
         assert r.iter_as_items().search == r
         assert len(r.iter_as_items()) == 1
+
+
+class FakeScrape(object):
+    """A local stand-in for the scrape API, paging through ``docs`` with
+    an opaque cursor.
+    """
+
+    def __init__(self, docs):
+        self.docs = docs
+        self.requests = []
+
+    def __call__(self, request):
+        params = dict(six.moves.urllib.parse.parse_qsl(
+            six.moves.urllib.parse.urlparse(request.url).query))
+        self.requests.append(params)
+        if params.get('total_only') == 'true':
+            return (200, {}, json.dumps(dict(total=len(self.docs))))
+        count = int(params['count'])
+        if not 100 <= count <= 10000:
+            return (400, {}, json.dumps(dict(error='invalid count')))
+        start = int(params.get('cursor', 'c0')[1:])
+        fields = params.get('fields', 'identifier').split(',')
+        items = [dict((f, d[f]) for f in fields if f in d)
+                 for d in self.docs[start:start + count]]
+        body = dict(items=items, count=len(items), total=len(self.docs))
+        if start + count < len(self.docs):
+            body['cursor'] = 'c{0}'.format(start + count)
+        return (200, {}, json.dumps(body))
+
+
+def test_search_items_scrape():
+    docs = [dict(identifier='item{0:04d}'.format(i), title='Item {0}'.format(i))
+            for i in range(320)]
+    scrape = FakeScrape(docs)
+    with responses.RequestsMock(assert_all_requests_are_fired=False) as rsps:
+        rsps.add_callback(responses.GET,
+                          '{0}//archive.org/services/search/v1/scrape'.format(protocol),
+                          callback=scrape)
+        r = search_items('collection:test', fields=['identifier', 'title'],
+                         params={'rows': '150'}, scrape=True)
+        # list() would ask for len() up front.
+        assert [doc for doc in r] == docs
+        # The count is read from the results.
+        assert r.num_found == 320
+        assert len(r) == 320
+        assert scrape.requests[0] == dict(q='collection:test', fields='identifier,title',
+                                          count='150')
+        assert [p.get('cursor') for p in scrape.requests] == [None, 'c150', 'c300']
+        assert all(p['count'] == '150' for p in scrape.requests)
+        assert all('sorts' not in p for p in scrape.requests)
+
+        # Before iterating, only the count is requested.
+        del scrape.requests[:]
+        r = search_items('collection:test', scrape=True)
+        assert r.num_found == 320
+        assert scrape.requests == [dict(q='collection:test', total_only='true')]
+
+        del scrape.requests[:]
+        r = search_items('collection:test', params={'sort[0]': 'date desc'},
+                         scrape=True)
+        assert list(r) == [dict(identifier=d['identifier']) for d in docs]
+        assert [p.get('count') for p in scrape.requests] == [None, '10000']
+        assert scrape.requests[-1]['sorts'] == 'date desc'
+
+
+class FakeAdvancedSearch(object):
+    """A local stand-in for advancedsearch.php, paging through ``docs``.
+    Earlier pages are answered more slowly than later ones.
+    """
+
+    def __init__(self, docs, delay=0):
+        self.docs = docs
+        self.delay = delay
+        self.requests = []
+
+    def __call__(self, request):
+        params = dict(six.moves.urllib.parse.parse_qsl(
+            six.moves.urllib.parse.urlparse(request.url).query))
+        self.requests.append(params)
+        rows = int(params['rows'])
+        page = int(params.get('page', 1))
+        docs = self.docs[(page - 1) * rows:page * rows] if rows else []
+        time.sleep(self.delay / page)
+        body = deepcopy(SEARCH_RESPONSE)
+        body['response'].update(numFound=len(self.docs), docs=docs)
+        return (200, {}, json.dumps(body))
+
+
+def test_search_items_prefetch():
+    docs = [dict(identifier='item{0:04d}'.format(i)) for i in range(100)]
+    search = FakeAdvancedSearch(docs, delay=.05)
+    with responses.RequestsMock(assert_all_requests_are_fired=False) as rsps:
+        rsps.add_callback(responses.GET,
+                          '{0}//archive.org/advancedsearch.php'.format(protocol),
+                          callback=search)
+        r = search_items('collection:test', rows=10, prefetch=4)
+        assert not search.requests
+        assert [doc for doc in r] == docs
+        assert [doc for doc in r] == docs
+        assert r.num_found == 100
+        # The count is read from the first page of results.
+        pages = [p['page'] for p in search.requests]
+        expected = [str(i) for i in range(1, 11)] * 2
+        assert sorted(pages, key=int) == sorted(expected, key=int)
+
+        # Before iterating, only the count is requested.
+        del search.requests[:]
+        r = search_items('collection:test', rows=10, prefetch=4)
+        assert r.num_found == 100
+        assert len(search.requests) == 1
+        assert search.requests[0]['rows'] == '0'
+        assert 'page' not in search.requests[0]
+
+        # Pending pages are cancelled when the consumer stops early.
+        del search.requests[:]
+        results = iter(r)
+        assert [next(results) for _ in range(15)] == docs[:15]
+        results.iterator.close()
+        time.sleep(.1)
+        assert 2 <= len(search.requests) <= 6
+
+
+def test_search_items_streamed():
+    docs = [dict(identifier='item{0:05d}'.format(i)) for i in range(2500)]
+    search = FakeAdvancedSearch(docs)
+    with responses.RequestsMock(assert_all_requests_are_fired=False) as rsps:
+        rsps.add_callback(responses.GET,
+                          '{0}//archive.org/advancedsearch.php'.format(protocol),
+                          callback=search)
+        # Pages of 1,000 rows are parsed as they arrive, one at a time.
+        r = search_items('collection:test', rows=1000)
+        results = iter(r)
+        assert next(results) == docs[0]
+        assert r.num_found == 2500
+        assert [p['page'] for p in search.requests] == ['1']
+        assert list(results) == docs[1:]
+        assert [p['page'] for p in search.requests] == ['1', '2', '3']
+
+
+def test_search_items_as_items_concurrent():
+    docs = [dict(identifier='item{0:02d}'.format(i), title='Item {0}'.format(i))
+            for i in range(30)]
+    search = FakeAdvancedSearch(docs)
+    fetched = []
+
+    def metadata(request):
+        identifier = request.url.split('/')[-1]
+        fetched.append(identifier)
+        # Later items are retrieved faster than earlier ones.
+        time.sleep(.001 * (30 - int(identifier[4:])))
+        return (200, {}, json.dumps(dict(metadata=dict(identifier=identifier))))
+
+    with responses.RequestsMock(assert_all_requests_are_fired=False) as rsps:
+        rsps.add_callback(responses.GET,
+                          '{0}//archive.org/advancedsearch.php'.format(protocol),
+                          callback=search)
+        rsps.add_callback(responses.GET,
+                          re.compile(r'{0}//archive.org/metadata/.*'.format(protocol)),
+                          callback=metadata)
+        r = search_items('collection:test', fields=['identifier', 'title'])
+        identifiers = [d['identifier'] for d in docs]
+        items = r.iter_as_items(workers=4)
+        assert items.search == r
+        assert [i.identifier for i in items] == identifiers
+        assert sorted(fetched) == identifiers
+
+        del fetched[:]
+        items = list(r.iter_as_items(workers=4, ordered=False))
+        assert sorted(i.identifier for i in items) == identifiers
+        assert all(i.exists for i in items)
+
+        # The search results hold all the metadata asked for.
+        del fetched[:]
+        items = list(r.iter_as_items(workers=4, metadata_fields=['title']))
+        assert [i.metadata for i in items] == docs
+        assert not fetched
+        items = list(r.iter_as_items(metadata_fields=['title', 'date']))
+        assert len(fetched) == 30
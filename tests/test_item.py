@@ -7,14 +7,23 @@ except ImportError:
 import types
 import re
 import os
+import io
+import hashlib
+import threading
+import time
 from copy import deepcopy
 
 import pytest
 import responses
-from requests.exceptions import HTTPError
+from requests.exceptions import HTTPError, ConnectionError
+from requests.packages.urllib3.exceptions import MaxRetryError
+from six.moves import BaseHTTPServer, socketserver, urllib
 
 from internetarchive import get_session
 import internetarchive.files
+import internetarchive.utils
+from internetarchive.utils import get_md5
+from internetarchive.exceptions import ChecksumError
 
 
 if sys.version_info < (2, 7, 9):
@@ -63,6 +72,24 @@ def test_get_file(testitem):
     assert _file.name == 'nasa_meta.xml'
 
 
+def test_get_file_attributes(testitem):
+    _file = testitem.get_file('globe_west_540.jpg')
+    assert _file.md5 == '9366a4b09386bf673c447e33d806d904'
+    assert _file.size == 66065
+    assert _file.format == 'JPEG'
+    assert _file.url == '{0}//archive.org/download/nasa/globe_west_540.jpg'.format(
+        protocol)
+    assert not _file.__dict__
+
+    # Keys without a slot are kept as well.
+    _file = testitem.get_file('nasa_archive.torrent')
+    assert _file.btih == '81ea3dbf71b379b0ef1c34d19bc91d731b8101e2'
+    assert list(_file.__dict__) == ['btih']
+
+    _file.url = 'http://example.com/nasa_archive.torrent'
+    assert _file.url == 'http://example.com/nasa_archive.torrent'
+
+
 def test_get_files(testitem):
     files = testitem.get_files()
     assert isinstance(files, types.GeneratorType)
@@ -145,6 +172,42 @@ def test_get_files_no_matches(testitem):
     assert list(testitem.get_files(formats='none')) == []
 
 
+def test_get_files_order(testitem):
+    files = [f.name for f in testitem.get_files(source='original',
+                                                glob_pattern=['*.jpg', '*'])]
+    assert files == [f['name'] for f in testitem.files]
+
+
+def test_get_file_table(testitem):
+    table = testitem.get_file_table()
+    assert len(table) == 6
+    assert table is testitem.get_file_table()
+    assert [table.names[i] for i in table.filter(formats='JPEG')] == \
+        ['globe_west_540.jpg']
+    rows = table.filter(source='original', min_size=50000)
+    assert [table.names[i] for i in rows] == ['globe_west_540.jpg']
+    assert [table.names[i] for i in table.filter(max_size=1600)] == \
+        ['nasa_reviews.xml', 'nasa_archive.torrent', 'nasa_files.xml']
+    assert table.filter(glob_pattern='*.xml', rows=[0, 1, 2]) == [2]
+
+    assert table.total_size() == 114030
+    assert table.total_size(by='source') == dict(original=104431, metadata=9599)
+    assert table.total_size(by='format', rows=table.filter(source='original')) == \
+        {'JPEG': 66065, 'Collection Header': 38366}
+    assert [table.names[i] for i in table.sort(key='size', reverse=True)][:2] == \
+        ['globe_west_540.jpg', 'NASAarchiveLogo.jpg']
+    assert [table.names[i] for i in table.newest(1)] == ['nasa_archive.torrent']
+
+
+def test_get_file_index_reload(testitem):
+    assert testitem.get_file('nasa_meta.xml').size == 7852
+    item_metadata = deepcopy(testitem.item_metadata)
+    item_metadata['files'] = [dict(name='nasa_meta.xml', size='100')]
+    testitem.load(item_metadata)
+    assert testitem.get_file('nasa_meta.xml').size == 100
+    assert not testitem.get_file('globe_west_540.jpg').exists
+
+
 def test_download(tmpdir, testitem):
     tmpdir.chdir()
     with responses.RequestsMock() as rsps:
@@ -158,6 +221,386 @@ def test_download(tmpdir, testitem):
             assert fh.read() == 'new test content'
 
 
+def test_download_workers(tmpdir, testitem):
+    tmpdir.chdir()
+    with responses.RequestsMock(assert_all_requests_are_fired=False) as rsps:
+        rsps.add(responses.GET, DOWNLOAD_URL_RE, body='test content', status=200)
+        errors = testitem.download(workers=4)
+        assert errors == []
+        expected_files = set(['NASAarchiveLogo.jpg',
+                              'globe_west_540.jpg',
+                              'nasa_reviews.xml',
+                              'nasa_meta.xml',
+                              'nasa_archive.torrent',
+                              'nasa_files.xml', ])
+        assert set(os.listdir('nasa')) == expected_files
+        for name in expected_files:
+            with open(os.path.join('nasa', name), 'r') as fh:
+                assert fh.read() == 'test content'
+
+
+def test_download_workers_errors(tmpdir, testitem):
+    tmpdir.chdir()
+    with responses.RequestsMock(assert_all_requests_are_fired=False) as rsps:
+        rsps.add(responses.GET, DOWNLOAD_URL_RE, body='not found', status=404)
+        errors = testitem.download(formats='JPEG', workers=4, retries=1,
+                                   ignore_errors=True)
+        assert errors == ['globe_west_540.jpg']
+        assert not os.path.exists('nasa/globe_west_540.jpg')
+
+
+def _write_partial_download(testitem, path, content, **journal):
+    _file = testitem.get_file('nasa_meta.xml')
+    journal.setdefault('size', _file.size)
+    journal.setdefault('md5', _file.md5)
+    journal.setdefault('mtime', _file.mtime)
+    if not os.path.exists(os.path.dirname(path)):
+        os.makedirs(os.path.dirname(path))
+    with open('{0}.part'.format(path), 'w') as fh:
+        fh.write(content)
+    with open('{0}.part.json'.format(path), 'w') as fh:
+        json.dump(journal, fh)
+
+
+def test_download_resume(tmpdir, testitem):
+    tmpdir.chdir()
+    _write_partial_download(testitem, 'nasa/nasa_meta.xml', 'test ', etag='"abc"')
+
+    def request_callback(request):
+        assert request.headers['Range'] == 'bytes=5-'
+        assert request.headers['If-Range'] == '"abc"'
+        headers = {'Content-Range': 'bytes 5-11/12', 'ETag': '"abc"'}
+        return (206, headers, 'content')
+
+    with responses.RequestsMock() as rsps:
+        rsps.add_callback(responses.GET, DOWNLOAD_URL_RE, callback=request_callback)
+        assert testitem.get_file('nasa_meta.xml').download('nasa/nasa_meta.xml')
+    with open('nasa/nasa_meta.xml', 'r') as fh:
+        assert fh.read() == 'test content'
+    assert os.listdir('nasa') == ['nasa_meta.xml']
+
+
+def test_download_resume_changed_file(tmpdir, testitem):
+    tmpdir.chdir()
+    _write_partial_download(testitem, 'nasa/nasa_meta.xml', 'stale ', md5='changed')
+
+    def request_callback(request):
+        assert 'Range' not in request.headers
+        return (200, {}, 'new test content')
+
+    with responses.RequestsMock() as rsps:
+        rsps.add_callback(responses.GET, DOWNLOAD_URL_RE, callback=request_callback)
+        testitem.download(files='nasa_meta.xml')
+    with open('nasa/nasa_meta.xml', 'r') as fh:
+        assert fh.read() == 'new test content'
+    assert os.listdir('nasa') == ['nasa_meta.xml']
+
+
+def test_download_resume_range_ignored(tmpdir, testitem):
+    tmpdir.chdir()
+    _write_partial_download(testitem, 'nasa/nasa_meta.xml', 'test ')
+    with responses.RequestsMock() as rsps:
+        rsps.add(responses.GET, DOWNLOAD_URL_RE, body='test content', status=200)
+        testitem.download(files='nasa_meta.xml')
+    with open('nasa/nasa_meta.xml', 'r') as fh:
+        assert fh.read() == 'test content'
+
+
+def test_download_incomplete(tmpdir, testitem):
+    tmpdir.chdir()
+    with responses.RequestsMock(assert_all_requests_are_fired=False) as rsps:
+        rsps.add(responses.GET, DOWNLOAD_URL_RE,
+                 body='test',
+                 status=200,
+                 adding_headers={'content-length': '12'})
+        r = testitem.get_file('nasa_meta.xml').download('nasa/nasa_meta.xml',
+                                                        retries=1,
+                                                        ignore_errors=True)
+        assert r is False
+    # The partial file is kept so that the download can be resumed.
+    assert set(os.listdir('nasa')) == set(['nasa_meta.xml.part',
+                                           'nasa_meta.xml.part.json'])
+    with open('nasa/nasa_meta.xml.part.json', 'r') as fh:
+        journal = json.load(fh)
+    assert journal['bytes_written'] == 4
+    assert journal['expected_size'] == 12
+
+
+def test_download_retried_request(tmpdir, testitem):
+    tmpdir.chdir()
+    calls = list()
+
+    def request_callback(request):
+        # The HTTP adapter has already retried this request.
+        calls.append(request)
+        raise ConnectionError(MaxRetryError(None, request.url))
+
+    with responses.RequestsMock() as rsps:
+        rsps.add_callback(responses.GET, DOWNLOAD_URL_RE, callback=request_callback)
+        r = testitem.get_file('nasa_meta.xml').download('nasa/nasa_meta.xml',
+                                                        retries=2,
+                                                        ignore_errors=True)
+        assert r is False
+    assert len(calls) == 1
+
+
+def test_download_stale_size(tmpdir, testitem):
+    tmpdir.chdir()
+    # The size in the item metadata is stale, but the server sent every
+    # byte it reported, so an unverified download succeeds.
+    with responses.RequestsMock() as rsps:
+        rsps.add(responses.GET, DOWNLOAD_URL_RE, body='test content', status=200)
+        r = testitem.get_file('nasa_meta.xml').download('nasa/nasa_meta.xml',
+                                                        ignore_errors=True)
+        assert r is True
+    with open('nasa/nasa_meta.xml', 'r') as fh:
+        assert fh.read() == 'test content'
+    assert os.listdir('nasa') == ['nasa_meta.xml']
+
+    os.remove('nasa/nasa_meta.xml')
+    with responses.RequestsMock() as rsps:
+        rsps.add(responses.GET, DOWNLOAD_URL_RE, body='test content', status=200)
+        r = testitem.get_file('nasa_meta.xml').download('nasa/nasa_meta.xml',
+                                                        verify=True,
+                                                        ignore_errors=True)
+        assert r is False
+    assert os.listdir('nasa') == []
+
+
+def test_download_verify(tmpdir, testitem, nasa_meta_xml):
+    tmpdir.chdir()
+    with responses.RequestsMock() as rsps:
+        rsps.add(responses.GET, DOWNLOAD_URL_RE, body='corrupt content', status=200)
+        r = testitem.get_file('nasa_meta.xml').download('nasa/nasa_meta.xml',
+                                                        verify=True,
+                                                        ignore_errors=True)
+        assert r is False
+        assert os.listdir('nasa') == []
+
+    with responses.RequestsMock() as rsps:
+        rsps.add(responses.GET, DOWNLOAD_URL_RE, body=nasa_meta_xml, status=200)
+        r = testitem.get_file('nasa_meta.xml').download('nasa/nasa_meta.xml',
+                                                        verify=True)
+        assert r is True
+        assert os.listdir('nasa') == ['nasa_meta.xml']
+
+
+def _range_callback(content, requested_ranges=None):
+    def request_callback(request):
+        start, end = [int(x) for x in request.headers['Range'][6:].split('-')]
+        if requested_ranges is not None:
+            requested_ranges.append((start, end))
+        headers = {
+            'Content-Range': 'bytes {0}-{1}/{2}'.format(start, end, len(content)),
+        }
+        return (206, headers, content[start:end + 1])
+    return request_callback
+
+
+def test_download_segments(tmpdir, testitem, nasa_meta_xml):
+    tmpdir.chdir()
+    requested_ranges = list()
+    with responses.RequestsMock(assert_all_requests_are_fired=False) as rsps:
+        rsps.add_callback(responses.GET, DOWNLOAD_URL_RE,
+                          callback=_range_callback(nasa_meta_xml, requested_ranges))
+        r = testitem.get_file('nasa_meta.xml').download('nasa/nasa_meta.xml',
+                                                        segments=4,
+                                                        segment_threshold=0)
+        assert r is True
+    assert sorted(requested_ranges) == [(0, 1962), (1963, 3925), (3926, 5888),
+                                        (5889, 7851)]
+    with open('nasa/nasa_meta.xml', 'r') as fh:
+        assert fh.read() == nasa_meta_xml
+    assert os.listdir('nasa') == ['nasa_meta.xml']
+
+
+def test_download_segments_resume(tmpdir, testitem, nasa_meta_xml):
+    tmpdir.chdir()
+    f = testitem.get_file('nasa_meta.xml')
+    os.mkdir('nasa')
+    with open('nasa/nasa_meta.xml.part', 'w') as fh:
+        fh.write(nasa_meta_xml[:10])
+        fh.truncate(f.size)
+    with open('nasa/nasa_meta.xml.part.json', 'w') as fh:
+        json.dump(dict(size=f.size, md5=f.md5, mtime=f.mtime,
+                       segments=[[0, 3925, 10], [3926, 7851, 0]]), fh)
+
+    requested_ranges = list()
+    with responses.RequestsMock(assert_all_requests_are_fired=False) as rsps:
+        rsps.add_callback(responses.GET, DOWNLOAD_URL_RE,
+                          callback=_range_callback(nasa_meta_xml, requested_ranges))
+        assert f.download('nasa/nasa_meta.xml', segments=2, segment_threshold=0)
+    assert sorted(requested_ranges) == [(10, 3925), (3926, 7851)]
+    with open('nasa/nasa_meta.xml', 'r') as fh:
+        assert fh.read() == nasa_meta_xml
+
+
+def test_download_segments_range_ignored(tmpdir, testitem, nasa_meta_xml):
+    tmpdir.chdir()
+    with responses.RequestsMock(assert_all_requests_are_fired=False) as rsps:
+        rsps.add(responses.GET, DOWNLOAD_URL_RE, body=nasa_meta_xml, status=200)
+        r = testitem.get_file('nasa_meta.xml').download('nasa/nasa_meta.xml',
+                                                        segments=4,
+                                                        segment_threshold=0)
+        assert r is True
+    with open('nasa/nasa_meta.xml', 'r') as fh:
+        assert fh.read() == nasa_meta_xml
+    assert os.listdir('nasa') == ['nasa_meta.xml']
+
+
+def test_download_segments_http_error(tmpdir, testitem, nasa_meta_xml):
+    tmpdir.chdir()
+    range_callback = _range_callback(nasa_meta_xml)
+    failures = ['bytes=0-3925']
+
+    def request_callback(request):
+        # The first request for the first segment fails, and is retried.
+        if request.headers['Range'] in failures:
+            failures.remove(request.headers['Range'])
+            return (503, {}, '')
+        return range_callback(request)
+
+    with responses.RequestsMock(assert_all_requests_are_fired=False) as rsps:
+        rsps.add_callback(responses.GET, DOWNLOAD_URL_RE, callback=request_callback)
+        r = testitem.get_file('nasa_meta.xml').download('nasa/nasa_meta.xml',
+                                                        segments=2,
+                                                        segment_threshold=0)
+        assert r is True
+    with open('nasa/nasa_meta.xml', 'r') as fh:
+        assert fh.read() == nasa_meta_xml
+
+
+def test_download_segments_failed(tmpdir, testitem, nasa_meta_xml):
+    tmpdir.chdir()
+    range_callback = _range_callback(nasa_meta_xml)
+
+    def request_callback(request):
+        if request.headers['Range'].startswith('bytes=0-'):
+            return (503, {}, '')
+        return range_callback(request)
+
+    with responses.RequestsMock(assert_all_requests_are_fired=False) as rsps:
+        rsps.add_callback(responses.GET, DOWNLOAD_URL_RE, callback=request_callback)
+        r = testitem.get_file('nasa_meta.xml').download('nasa/nasa_meta.xml',
+                                                        segments=2,
+                                                        segment_threshold=0,
+                                                        ignore_errors=True)
+        assert r is False
+    # Every segment has stopped, the partial download is kept for resuming.
+    with open('nasa/nasa_meta.xml.part.json', 'r') as fh:
+        journal = json.load(fh)
+    assert journal['segments'][0][2] == 0
+    assert set(os.listdir('nasa')) == set(['nasa_meta.xml.part',
+                                           'nasa_meta.xml.part.json'])
+
+
+@pytest.fixture
+def local_server(nasa_meta_xml):
+    body = nasa_meta_xml.encode('utf-8')
+
+    class Handler(BaseHTTPServer.BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_GET(self):
+            self.send_response(200)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    class Server(socketserver.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+        daemon_threads = True
+
+    server = Server(('127.0.0.1', 0), Handler)
+    t = threading.Thread(target=server.serve_forever)
+    t.daemon = True
+    t.start()
+    yield 'http://127.0.0.1:{0}'.format(server.server_address[1])
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.mark.parametrize('readinto', [False, True])
+def test_download_chunk_size(tmpdir, testitem, nasa_meta_xml, local_server, readinto):
+    tmpdir.chdir()
+    f = testitem.get_file('nasa_meta.xml')
+    f.url = '{0}/nasa/nasa_meta.xml'.format(local_server)
+    # Twice over the same connection, which must be left reusable.
+    for _ in range(2):
+        assert f.download('nasa/nasa_meta.xml', ignore_existing=False, verify=True,
+                          chunk_size=1000, readinto=readinto)
+        with open('nasa/nasa_meta.xml', 'r') as fh:
+            assert fh.read() == nasa_meta_xml
+        os.remove('nasa/nasa_meta.xml')
+
+
+def test_download_readinto_segments(tmpdir, testitem, nasa_meta_xml):
+    tmpdir.chdir()
+    with responses.RequestsMock(assert_all_requests_are_fired=False) as rsps:
+        rsps.add_callback(responses.GET, DOWNLOAD_URL_RE,
+                          callback=_range_callback(nasa_meta_xml))
+        assert testitem.get_file('nasa_meta.xml').download('nasa/nasa_meta.xml',
+                                                           segments=3,
+                                                           segment_threshold=0,
+                                                           chunk_size=1000,
+                                                           readinto=True)
+    with open('nasa/nasa_meta.xml', 'r') as fh:
+        assert fh.read() == nasa_meta_xml
+
+
+def test_download_verify_retry(tmpdir, testitem, nasa_meta_xml):
+    tmpdir.chdir()
+    bodies = ['corrupt content', nasa_meta_xml]
+
+    def request_callback(request):
+        return (200, {}, bodies.pop(0))
+
+    with responses.RequestsMock(assert_all_requests_are_fired=False) as rsps:
+        rsps.add_callback(responses.GET, DOWNLOAD_URL_RE, callback=request_callback)
+        assert testitem.get_file('nasa_meta.xml').download('nasa/nasa_meta.xml',
+                                                           verify=True)
+    assert bodies == []
+    with open('nasa/nasa_meta.xml', 'r') as fh:
+        assert fh.read() == nasa_meta_xml
+
+
+def test_download_verify_resume(tmpdir, testitem, nasa_meta_xml):
+    tmpdir.chdir()
+    _write_partial_download(testitem, 'nasa/nasa_meta.xml', nasa_meta_xml[:100])
+
+    def request_callback(request):
+        assert request.headers['Range'] == 'bytes=100-'
+        headers = {'Content-Range': 'bytes 100-7851/7852'}
+        return (206, headers, nasa_meta_xml[100:])
+
+    with responses.RequestsMock() as rsps:
+        rsps.add_callback(responses.GET, DOWNLOAD_URL_RE, callback=request_callback)
+        assert testitem.get_file('nasa_meta.xml').download('nasa/nasa_meta.xml',
+                                                           verify=True)
+    with open('nasa/nasa_meta.xml', 'r') as fh:
+        assert fh.read() == nasa_meta_xml
+
+
+def test_download_checksum_cache(tmpdir, testitem, nasa_meta_xml):
+    tmpdir.chdir()
+    cache = internetarchive.utils.ChecksumCache(str(tmpdir.join('md5.sqlite')))
+    testitem.session.checksum_cache = cache
+    f = testitem.get_file('nasa_meta.xml')
+    with responses.RequestsMock() as rsps:
+        rsps.add(responses.GET, DOWNLOAD_URL_RE, body=nasa_meta_xml, status=200)
+        assert f.download('nasa/nasa_meta.xml', verify=True)
+    assert cache.get('nasa/nasa_meta.xml') == f.md5
+
+    # Skipping based on checksum uses the cached digest, without
+    # reading the file.
+    with open('nasa/nasa_meta.xml', 'w') as fh:
+        fh.write('x' * f.size)
+    os.utime('nasa/nasa_meta.xml', (0, f.mtime))
+    assert f.download('nasa/nasa_meta.xml', checksum=True) is None
+
+
 def test_download_io_error(tmpdir, testitem):
     tmpdir.chdir()
     try:
@@ -209,12 +652,6 @@ def test_download_clobber(tmpdir, testitem):
             assert fh.read() == 'new test content'
 
 
-@pytest.fixture
-def nasa_meta_xml():
-    with open(os.path.join(os.path.dirname(__file__), 'data/nasa_meta.xml'), 'r') as fh:
-        return fh.read()
-
-
 def test_download_checksum(tmpdir, testitem_with_logging, nasa_meta_xml):
     log_file = os.path.join(os.getcwd(), 'internetarchive.log')
     tmpdir.chdir()
@@ -286,7 +723,7 @@ def test_download_verbose(tmpdir, capsys, testitem):
         rsps.add(responses.GET, DOWNLOAD_URL_RE,
                  body='no dest dir',
                  status=200,
-                 adding_headers={'content-length': '100'})
+                 adding_headers={'content-length': '11'})
         testitem.download(files='nasa_meta.xml', verbose=True)
         out, err = capsys.readouterr()
         assert 'nasa:\n downloaded nasa/nasa_meta.xml to nasa/nasa_meta.xml\n'in out
@@ -449,6 +886,362 @@ def test_upload_dir(tmpdir, testitem):
             assert p.url in expected_eps
 
 
+def test_upload_workers(tmpdir, testitem):
+    tmpdir.chdir()
+    paths = []
+    for i in range(10):
+        path = 'file{0}.txt'.format(i)
+        with open(path, 'w') as fh:
+            fh.write('test {0}'.format(i))
+        paths.append(path)
+
+    lock = threading.Lock()
+    requests = []
+
+    def request_callback(request):
+        with lock:
+            requests.append((request.url.split('/')[-1],
+                             str(request.headers['x-archive-queue-derive'])))
+        return (200, {}, '')
+
+    with responses.RequestsMock(assert_all_requests_are_fired=False) as rsps:
+        rsps.add_callback(responses.PUT, S3_URL_RE, callback=request_callback)
+        resp = testitem.upload(paths,
+                               access_key='test_access',
+                               secret_key='test_secret',
+                               workers=4)
+    # Responses are in input order.
+    assert [r.url.split('/')[-1] for r in resp] == paths
+    # Only the last request to finish queues a derive.
+    assert requests[-1] == ('file9.txt', '1')
+    assert sorted(requests[:-1]) == [(p, '0') for p in paths[:-1]]
+
+
+@pytest.mark.parametrize('workers', [1, 4])
+@pytest.mark.parametrize('kwargs', [{}, dict(checksum=True), dict(delete=True)])
+def test_upload_last_file_skipped(tmpdir, monkeypatch, testitem, nasa_meta_xml,
+                                  workers, kwargs):
+    tmpdir.chdir()
+    # Without the checksum cache, every file checked for a skip is hashed.
+    monkeypatch.setattr(testitem.session, 'checksum_cache', None)
+    hashed = []
+
+    def _get_md5(fp, cache=None):
+        hashed.append(os.path.basename(fp.name))
+        return get_md5(fp, cache)
+
+    monkeypatch.setattr('internetarchive.item.get_md5', _get_md5)
+    paths = ['file0.txt', 'file1.txt', 'nasa_meta.xml']
+    for path in paths[:-1]:
+        with open(path, 'w') as fh:
+            fh.write('test content')
+    # The item already has this file, so it is skipped.
+    with open('nasa_meta.xml', 'w') as fh:
+        fh.write(nasa_meta_xml)
+
+    lock = threading.Lock()
+    requests = []
+
+    def request_callback(request):
+        with lock:
+            requests.append((request.url.split('/')[-1],
+                             str(request.headers['x-archive-queue-derive'])))
+        return (200, {}, '')
+
+    with responses.RequestsMock(assert_all_requests_are_fired=False) as rsps:
+        rsps.add_callback(responses.PUT, S3_URL_RE, callback=request_callback)
+        resp = testitem.upload(paths,
+                               access_key='test_access',
+                               secret_key='test_secret',
+                               workers=workers,
+                               **kwargs)
+    assert [r.url.split('/')[-1] for r in resp] == paths
+    # The derive is queued by the last file that was uploaded.
+    assert requests == [('file0.txt', '0'), ('file1.txt', '1')]
+    # Files are hashed at most once, to check for a skip or to delete them.
+    assert sorted(hashed) == sorted(set(hashed))
+    assert 'nasa_meta.xml' in hashed
+
+
+def test_upload_workers_checksum(tmpdir, monkeypatch, testitem):
+    tmpdir.chdir()
+    # The item already has these files, so each is hashed to check if it
+    # can be skipped.
+    paths = ['NASAarchiveLogo.jpg', 'globe_west_540.jpg', 'nasa_reviews.xml',
+             'nasa_meta.xml']
+    for path in paths:
+        with open(path, 'w') as fh:
+            fh.write('changed {0}'.format(path))
+    monkeypatch.setattr(testitem.session, 'checksum_cache', None)
+    lock = threading.Lock()
+    hashing = []
+    concurrent = []
+
+    def _get_md5(fp, cache=None):
+        with lock:
+            hashing.append(fp.name)
+            concurrent.append(len(hashing))
+        time.sleep(0.1)
+        with lock:
+            hashing.remove(fp.name)
+        return get_md5(fp, cache)
+
+    monkeypatch.setattr('internetarchive.item.get_md5', _get_md5)
+    requests = []
+
+    def request_callback(request):
+        with lock:
+            requests.append((request.url.split('/')[-1],
+                             str(request.headers['x-archive-queue-derive'])))
+        return (200, {}, '')
+
+    with responses.RequestsMock(assert_all_requests_are_fired=False) as rsps:
+        rsps.add_callback(responses.PUT, S3_URL_RE, callback=request_callback)
+        testitem.upload(paths,
+                        access_key='test_access',
+                        secret_key='test_secret',
+                        workers=4)
+    # Files are checked by the workers, not one at a time.
+    assert max(concurrent) > 1
+    assert requests[-1] == ('nasa_meta.xml', '1')
+    assert sorted(requests[:-1]) == sorted((p, '0') for p in paths[:-1])
+
+
+def test_upload_503_shared_backoff(tmpdir, testitem):
+    tmpdir.chdir()
+    paths = []
+    for i in range(6):
+        path = 'file{0}.txt'.format(i)
+        with open(path, 'w') as fh:
+            fh.write('test {0}'.format(i))
+        paths.append(path)
+
+    lock = threading.Lock()
+    checks = []
+    puts = []
+
+    def check_callback(request):
+        with lock:
+            checks.append(request.url)
+        return (200, {}, '{"over_limit": 0}')
+
+    def put_callback(request):
+        with lock:
+            puts.append(request.url)
+            status = 503 if len(puts) <= 3 else 200
+        return (status, {}, '')
+
+    with responses.RequestsMock(assert_all_requests_are_fired=False) as rsps:
+        rsps.add_callback(responses.GET, S3_URL_RE, callback=check_callback)
+        rsps.add_callback(responses.PUT, S3_URL_RE, callback=put_callback)
+        resp = testitem.upload(paths,
+                               access_key='test_access',
+                               secret_key='test_secret',
+                               retries=3,
+                               retries_sleep=.1,
+                               workers=3)
+    assert [r.status_code for r in resp] == [200] * 6
+    assert len(puts) == 9
+    limiter = testitem.session._get_s3_rate_limiter('nasa')
+    assert limiter.rate < limiter.max_rate
+    # The overload check is shared, rather than repeated before every request.
+    assert 1 <= len(checks) <= limiter.epoch + 1 <= 4
+    assert 'bucket=nasa' in checks[0]
+    assert 'accesskey=test_access' in checks[0]
+
+
+def test_upload_overload_rechecked(tmpdir, testitem):
+    tmpdir.chdir()
+    with open('file0.txt', 'w') as fh:
+        fh.write('test 0')
+    checks = []
+
+    def check_callback(request):
+        checks.append(request.url)
+        over_limit = 1 if len(checks) == 1 else 0
+        return (200, {}, json.dumps(dict(over_limit=over_limit)))
+
+    with responses.RequestsMock(assert_all_requests_are_fired=False) as rsps:
+        rsps.add_callback(responses.GET, S3_URL_RE, callback=check_callback)
+        rsps.add(responses.PUT, S3_URL_RE, status=200)
+        resp = testitem.upload('file0.txt',
+                               access_key='test_access',
+                               secret_key='test_secret',
+                               retries=3,
+                               retries_sleep=.1)
+        assert [r.status_code for r in resp] == [200]
+        # The check is repeated after backing off, not served from the cache.
+        assert len(checks) == 2
+        assert len([c for c in rsps.calls if c.request.method == 'PUT']) == 1
+
+
+def test_upload_journal(tmpdir, testitem):
+    tmpdir.chdir()
+    paths = []
+    for i in range(3):
+        path = 'file{0}.txt'.format(i)
+        with open(path, 'w') as fh:
+            fh.write('test {0}'.format(i))
+        paths.append(path)
+    puts = []
+    fail = ['file2.txt']
+
+    def request_callback(request):
+        _read_body(request.body)
+        key = request.url.split('/')[-1]
+        puts.append(key)
+        if key in fail:
+            fail.remove(key)
+            return (500, {}, '')
+        return (200, {}, '')
+
+    with responses.RequestsMock(assert_all_requests_are_fired=False) as rsps:
+        rsps.add_callback(responses.PUT, S3_URL_RE, callback=request_callback)
+        journal = internetarchive.utils.UploadJournal('journal')
+        with pytest.raises(HTTPError):
+            testitem.upload(paths,
+                            access_key='test_access',
+                            secret_key='test_secret',
+                            journal=journal)
+        journal.close()
+        assert puts == ['file0.txt', 'file1.txt', 'file2.txt']
+
+        # An interrupted upload is resumed where it stopped, without
+        # hashing or uploading the files that made it.
+        del puts[:]
+        journal = internetarchive.utils.UploadJournal('journal', resume=True)
+        resp = testitem.upload(paths,
+                               access_key='test_access',
+                               secret_key='test_secret',
+                               journal=journal)
+        journal.close()
+        assert puts == ['file2.txt']
+    assert [r.status_code for r in resp] == [None, None, 200]
+    with open('journal') as fh:
+        entries = [json.loads(line) for line in fh]
+    assert [e['key'] for e in entries] == paths
+    assert entries[0]['md5'] == hashlib.md5(b'test 0').hexdigest()
+    assert entries[0]['size'] == 6
+
+
+def _read_body(body):
+    """Read a request body the way the HTTP client would."""
+    if hasattr(body, 'read'):
+        return body.read()
+    elif body is None or isinstance(body, bytes):
+        return body
+    return b''.join(bytes(chunk) for chunk in body)
+
+
+class FakeS3(object):
+    """A minimal in-process IA-S3 endpoint supporting multipart uploads."""
+
+    def __init__(self, fail_parts=None):
+        self.lock = threading.Lock()
+        self.requests = []
+        self.uploads = {}
+        self.objects = {}
+        # {part_number: number of times to fail it with a 500}
+        self.fail_parts = {} if fail_parts is None else fail_parts
+
+    def __call__(self, request):
+        url = urllib.parse.urlparse(request.url)
+        key = url.path.lstrip('/')
+        query = dict(urllib.parse.parse_qsl(url.query, keep_blank_values=True))
+        body = _read_body(request.body)
+        with self.lock:
+            self.requests.append((request.method, query, request.headers))
+            if request.method == 'POST' and 'uploads' in query:
+                upload_id = 'upload-{0}'.format(len(self.uploads))
+                self.uploads[upload_id] = {}
+                return (200, {}, '<InitiateMultipartUploadResult><UploadId>{0}'
+                                 '</UploadId></InitiateMultipartUploadResult>'.format(
+                                     upload_id))
+            parts = self.uploads[query['uploadId']]
+            if request.method == 'PUT':
+                part_number = int(query['partNumber'])
+                if self.fail_parts.get(part_number):
+                    self.fail_parts[part_number] -= 1
+                    return (500, {}, '')
+                md5 = hashlib.md5(body).hexdigest()
+                if request.headers['Content-MD5'] != md5:
+                    return (400, {}, '<Error><Code>BadDigest</Code></Error>')
+                parts[part_number] = body
+                return (200, {'ETag': '"{0}"'.format(md5)}, '')
+            elif request.method == 'POST':
+                numbers = [int(n) for n in
+                           re.findall(r'<PartNumber>(\d+)<', body.decode())]
+                assert numbers == sorted(parts)
+                self.objects[key] = b''.join(parts[n] for n in numbers)
+                del self.uploads[query['uploadId']]
+                return (200, {}, '<CompleteMultipartUploadResult/>')
+            elif request.method == 'DELETE':
+                del self.uploads[query['uploadId']]
+                return (204, {}, '')
+
+
+@pytest.mark.parametrize('on_disk', [True, False])
+def test_upload_multipart(tmpdir, testitem, on_disk):
+    tmpdir.chdir()
+    content = os.urandom(10000)
+    with open('big.bin', 'wb') as fh:
+        fh.write(content)
+    body = 'big.bin' if on_disk else io.BytesIO(content)
+    s3 = FakeS3(fail_parts={2: 1})
+
+    with responses.RequestsMock(assert_all_requests_are_fired=False) as rsps:
+        for method in (responses.POST, responses.PUT, responses.DELETE):
+            rsps.add_callback(method, S3_URL_RE, callback=s3)
+        resp = testitem.upload_file(body,
+                                    key='big.bin',
+                                    metadata={'title': 'Big'},
+                                    access_key='test_access',
+                                    secret_key='test_secret',
+                                    retries_sleep=0,
+                                    verbose=True,
+                                    multipart_threshold=1000,
+                                    part_size=3000)
+    assert resp.status_code == 200
+    assert s3.objects == {'nasa/big.bin': content}
+    assert s3.uploads == {}
+
+    initiate = s3.requests[0]
+    assert initiate[0] == 'POST'
+    assert str(initiate[2]['x-archive-meta00-title']) == 'Big'
+    assert str(initiate[2]['x-archive-size-hint']) == '10000'
+    part_numbers = [int(q['partNumber']) for m, q, h in s3.requests if m == 'PUT']
+    # Part 2 failed once and was retried.
+    assert sorted(part_numbers) == [1, 2, 2, 3, 4]
+    assert not any('x-archive-queue-derive' in h for m, q, h in s3.requests
+                   if m == 'PUT')
+    complete = s3.requests[-1]
+    assert complete[0] == 'POST'
+    assert str(complete[2]['x-archive-queue-derive']) == '1'
+
+
+def test_upload_multipart_abort(tmpdir, testitem):
+    tmpdir.chdir()
+    with open('big.bin', 'wb') as fh:
+        fh.write(os.urandom(10000))
+    s3 = FakeS3(fail_parts={3: 100})
+
+    with responses.RequestsMock(assert_all_requests_are_fired=False) as rsps:
+        for method in (responses.POST, responses.PUT, responses.DELETE):
+            rsps.add_callback(method, S3_URL_RE, callback=s3)
+        with pytest.raises(HTTPError):
+            testitem.upload_file('big.bin',
+                                 access_key='test_access',
+                                 secret_key='test_secret',
+                                 retries_sleep=0,
+                                 multipart_threshold=1000,
+                                 part_size=3000)
+    assert s3.requests[-1][0] == 'DELETE'
+    assert s3.uploads == {}
+    assert s3.objects == {}
+    # The failing part was tried once and retried 3 times.
+    assert s3.fail_parts == {3: 96}
+
+
 def test_upload_queue_derive(testitem, json_filename):
     with responses.RequestsMock(assert_all_requests_are_fired=False) as rsps:
         _expected_headers = deepcopy(EXPECTED_S3_HEADERS)
@@ -549,6 +1342,166 @@ def test_upload_checksum(tmpdir, testitem):
             assert r.status_code is None
 
 
+def _pipe(content):
+    """Return a non-seekable file object reading ``content``."""
+    r, w = os.pipe()
+    os.write(w, content)
+    os.close(w)
+    return os.fdopen(r, 'rb')
+
+
+def test_upload_stream(testitem):
+    content = b'streamed content' * 1000
+    requests = []
+
+    def request_callback(request):
+        requests.append(request.headers)
+        body = _read_body(request.body)
+        return (200, {'ETag': '"{0}"'.format(hashlib.md5(body).hexdigest())}, '')
+
+    with responses.RequestsMock() as rsps:
+        rsps.add_callback(responses.PUT, S3_URL_RE, callback=request_callback)
+        resp = testitem.upload_file(_pipe(content),
+                                    key='stream.txt',
+                                    access_key='test_access',
+                                    secret_key='test_secret',
+                                    checksum=True,
+                                    delete=True)
+    assert resp.status_code == 200
+    headers = requests[0]
+    assert headers['Transfer-Encoding'] == 'chunked'
+    assert 'x-archive-size-hint' not in headers
+    assert 'Content-MD5' not in headers
+
+
+def test_upload_stream_multipart(testitem):
+    content = os.urandom(10000)
+    s3 = FakeS3()
+
+    with responses.RequestsMock(assert_all_requests_are_fired=False) as rsps:
+        for method in (responses.POST, responses.PUT, responses.DELETE):
+            rsps.add_callback(method, S3_URL_RE, callback=s3)
+        resp = testitem.upload_file(_pipe(content),
+                                    key='stream.bin',
+                                    headers={'x-archive-size-hint': '10000'},
+                                    access_key='test_access',
+                                    secret_key='test_secret',
+                                    multipart_threshold=1000,
+                                    part_size=3000)
+    assert resp.status_code == 200
+    assert s3.objects == {'nasa/stream.bin': content}
+    assert str(s3.requests[0][2]['x-archive-size-hint']) == '10000'
+    assert len([m for m, q, h in s3.requests if m == 'PUT']) == 4
+
+
+def test_upload_streaming_md5(tmpdir, testitem):
+    tmpdir.chdir()
+    cache = internetarchive.utils.ChecksumCache(str(tmpdir.join('md5.sqlite')))
+    testitem.session.checksum_cache = cache
+    with open('test.txt', 'w') as fh:
+        fh.write('test content')
+    md5 = hashlib.md5(b'test content').hexdigest()
+    requests = []
+
+    def request_callback(request):
+        requests.append(request.headers.get('Content-MD5'))
+        body = _read_body(request.body)
+        return (200, {'ETag': '"{0}"'.format(hashlib.md5(body).hexdigest())}, '')
+
+    with responses.RequestsMock(assert_all_requests_are_fired=False) as rsps:
+        rsps.add_callback(responses.PUT, S3_URL_RE, callback=request_callback)
+        # Without verify, the file is hashed while it is sent, and the
+        # digest cached.
+        testitem.upload_file('test.txt',
+                             access_key='test_access',
+                             secret_key='test_secret',
+                             verify=False)
+        assert requests == [None]
+        assert cache.get('test.txt') == md5
+
+        # A cached digest is sent as Content-MD5 without hashing the file.
+        testitem.upload_file('test.txt',
+                             access_key='test_access',
+                             secret_key='test_secret')
+        assert requests == [None, md5]
+
+
+def test_upload_verify_md5(tmpdir, testitem):
+    tmpdir.chdir()
+    testitem.session.checksum_cache = None
+    with open('test.txt', 'w') as fh:
+        fh.write('test content')
+    requests = []
+
+    def request_callback(request):
+        requests.append(request.headers.get('Content-MD5'))
+        return (200, {}, '')
+
+    with responses.RequestsMock() as rsps:
+        rsps.add_callback(responses.PUT, S3_URL_RE, callback=request_callback)
+        # The file is hashed before it is sent, so IA-S3 can reject a
+        # corrupted upload.
+        testitem.upload_file('test.txt',
+                             access_key='test_access',
+                             secret_key='test_secret')
+    assert requests == [hashlib.md5(b'test content').hexdigest()]
+
+
+def test_upload_streaming_md5_mismatch(tmpdir, testitem):
+    tmpdir.chdir()
+    testitem.session.checksum_cache = internetarchive.utils.ChecksumCache(
+        str(tmpdir.join('md5.sqlite')))
+    with open('test.txt', 'w') as fh:
+        fh.write('test content')
+
+    def request_callback(request):
+        _read_body(request.body)
+        return (200, {'ETag': '"d41d8cd98f00b204e9800998ecf8427e"'}, '')
+
+    with responses.RequestsMock() as rsps:
+        rsps.add_callback(responses.PUT, S3_URL_RE, callback=request_callback)
+        with pytest.raises(ChecksumError):
+            testitem.upload_file(_pipe(b'test content'),
+                                 key='test.txt',
+                                 access_key='test_access',
+                                 secret_key='test_secret')
+        # Unverified, the mismatch isn't raised but the md5 isn't cached.
+        testitem.upload_file('test.txt',
+                             access_key='test_access',
+                             secret_key='test_secret',
+                             verify=False)
+    assert testitem.session.checksum_cache.get('test.txt') is None
+
+
+def test_upload_streaming_md5_no_etag(tmpdir, testitem, caplog):
+    tmpdir.chdir()
+    testitem.session.checksum_cache = internetarchive.utils.ChecksumCache(
+        str(tmpdir.join('md5.sqlite')))
+    with open('test.txt', 'w') as fh:
+        fh.write('test content')
+
+    def request_callback(request):
+        _read_body(request.body)
+        return (200, {}, '')
+
+    with responses.RequestsMock() as rsps:
+        rsps.add_callback(responses.PUT, S3_URL_RE, callback=request_callback)
+        resp = testitem.upload_file(_pipe(b'test content'),
+                                    key='test.txt',
+                                    access_key='test_access',
+                                    secret_key='test_secret')
+        assert resp.status_code == 200
+        assert 'could not be verified' in caplog.text
+
+        resp = testitem.upload_file('test.txt',
+                                    access_key='test_access',
+                                    secret_key='test_secret',
+                                    verify=False)
+        assert resp.status_code == 200
+    # The unconfirmed md5 is not cached.
+    assert testitem.session.checksum_cache.get('test.txt') is None
+
+
 def test_modify_metadata(testitem, testitem_metadata):
     with responses.RequestsMock(assert_all_requests_are_fired=False) as rsps:
         rsps.add(responses.POST, '{0}//archive.org/metadata/nasa'.format(protocol),
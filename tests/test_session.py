@@ -3,6 +3,11 @@ import sys
 inc_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.insert(0, inc_path)
 
+import json
+import re
+import threading
+import time
+
 import responses
 
 import internetarchive.session
@@ -136,3 +141,81 @@ def test_s3_is_overloaded():
         s = internetarchive.session.ArchiveSession(CONFIG)
         r = s.s3_is_overloaded('nasa')
         assert r is True
+
+
+def test_s3_is_overloaded_cached():
+    lock = threading.Lock()
+    checks = []
+
+    def callback(request):
+        with lock:
+            checks.append(request.url)
+        # Give concurrent callers time to pile up on the request.
+        time.sleep(.1)
+        over_limit = 1 if 'bucket=busy' in request.url else 0
+        return (200, {}, json.dumps(dict(over_limit=over_limit)))
+
+    with responses.RequestsMock(assert_all_requests_are_fired=False) as rsps:
+        rsps.add_callback(responses.GET,
+                          re.compile(r'{0}//s3.us.archive.org.*'.format(protocol)),
+                          callback=callback)
+        s = internetarchive.session.ArchiveSession(CONFIG)
+        results = []
+        threads = [threading.Thread(
+                   target=lambda: results.append(s.s3_is_overloaded('nasa', 'key')))
+                   for _ in range(5)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert results == [False] * 5
+        assert len(checks) == 1
+        assert 'accesskey=key' in checks[0]
+        assert 'bucket=nasa' in checks[0]
+
+        # Cached per bucket and access key.
+        assert s.s3_is_overloaded('nasa', 'key') is False
+        assert len(checks) == 1
+        assert s.s3_is_overloaded('nasa', 'other') is False
+        assert len(checks) == 2
+        assert s.s3_is_overloaded('nasa', 'key', ttl=0) is False
+        assert len(checks) == 3
+
+        r = s.s3_are_overloaded(['nasa', 'busy', 'idle'], 'key')
+        assert r == dict(nasa=False, busy=True, idle=False)
+        assert len(checks) == 5
+
+
+def test_checksum_cache_config(tmpdir, checksum_cache):
+    s = internetarchive.session.ArchiveSession()
+    assert s.checksum_cache.path == checksum_cache
+    path = str(tmpdir.join('cache.sqlite'))
+    s = internetarchive.session.ArchiveSession({'general': {'checksum_cache': path}})
+    assert s.checksum_cache.path == path
+    for value in (False, 'false', 'off', 'no', '0'):
+        s = internetarchive.session.ArchiveSession({'general': {'checksum_cache': value}})
+        assert s.checksum_cache is None
+
+
+def test_mount_http_adapter():
+    s = internetarchive.session.ArchiveSession()
+    s._mount_http_adapter(max_retries=4, pool_maxsize=40)
+    # Downloads are redirected to datanodes, which share the sized pool,
+    # over either protocol.
+    for url in ('{0}//archive.org/download/nasa/nasa_meta.xml'.format(s.protocol),
+                'https://ia800201.us.archive.org/0/items/nasa',
+                'http://ia800201.us.archive.org/0/items/nasa'):
+        adapter = s.get_adapter(url)
+        assert adapter._pool_maxsize == 40
+        assert adapter.max_retries.total == 4
+    # IA-S3 requests are never retried by the adapter.
+    adapter = s.get_adapter('{0}//s3.us.archive.org/nasa'.format(s.protocol))
+    assert adapter.max_retries.total == 0
+    # Other hosts keep the default adapter.
+    adapter = s.get_adapter('{0}//example.com/'.format(s.protocol))
+    assert adapter is s.adapters['{0}//'.format(s.protocol)]
+    assert adapter.max_retries.total == 0
+
+    # Remounting with a smaller pool doesn't shrink it.
+    s._mount_http_adapter(max_retries=4, pool_maxsize=10)
+    assert s.get_adapter('{0}//archive.org'.format(s.protocol))._pool_maxsize == 40
@@ -5,7 +5,14 @@ import string
 inc_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.insert(0, inc_path)
 
+import hashlib
+import json
+import threading
+
+import pytest
+import requests
 import six
+from six.moves import BaseHTTPServer
 
 import responses
 
@@ -20,9 +27,30 @@ else:
 
 def test_utils():
     list(internetarchive.utils.chunk_generator(open(__file__), 10))
-    ifp = internetarchive.utils.IterableToFileAdapter([1, 2], 200)
+    ifp = internetarchive.utils.IterableToFileAdapter([b'1', b'2'], 200)
     assert len(ifp) == 200
-    ifp.read()
+    assert ifp.read() == b'12'
+
+
+def test_iterable_to_file_adapter():
+    chunks = [b'abc', b'defgh', b'', b'ij', b'klmnopqrst']
+    ifp = internetarchive.utils.IterableToFileAdapter(iter(chunks), 20)
+    assert ifp.read(4) == b'abcd'
+    assert ifp.read(1) == b'e'
+    assert ifp.read(5) == b'fghij'
+    # A chunk of exactly the requested size is returned as is.
+    assert ifp.read(10) is chunks[-1]
+    assert ifp.read(10) == b''
+
+    ifp = internetarchive.utils.IterableToFileAdapter(iter(chunks))
+    assert len(ifp) == 0
+    assert ifp
+    assert ifp.read(2) == b'ab'
+    assert ifp.read() == b'cdefghijklmnopqrst'
+
+    ifp = internetarchive.utils.IterableToFileAdapter(iter(chunks))
+    assert ifp.read(4) == b'abcd'
+    assert list(ifp) == [b'efgh', b'ij', b'klmnopqrst']
 
 
 def test_needs_quote():
@@ -47,6 +75,284 @@ def test_get_md5():
     assert isinstance(md5, six.string_types)
 
 
+def test_checksum_cache(tmpdir):
+    cache = internetarchive.utils.ChecksumCache(str(tmpdir.join('cache', 'md5.sqlite')))
+    path = str(tmpdir.join('file.txt'))
+    with open(path, 'w') as fh:
+        fh.write('test content')
+    md5 = '9473fdd0d880a43c21b7778d34872157'
+
+    assert cache.get(path) is None
+    with open(path, 'rb') as fh:
+        assert internetarchive.utils.get_md5(fh, cache) == md5
+    assert cache.get(path) == md5
+
+    # Cached digests are used without reading the file.
+    cache.set(path, 'cached')
+    with open(path, 'rb') as fh:
+        assert internetarchive.utils.get_md5(fh, cache) == 'cached'
+
+    # Modified files are rehashed.
+    with open(path, 'w') as fh:
+        fh.write('new test content')
+    assert cache.get(path) is None
+    with open(path, 'rb') as fh:
+        assert internetarchive.utils.get_md5(fh, cache) != 'cached'
+
+
+def test_checksum_cache_unavailable(tmpdir):
+    tmpdir.join('file.txt').write('test content')
+    path = str(tmpdir.join('file.txt', 'md5.sqlite'))
+    cache = internetarchive.utils.ChecksumCache(path)
+    with open(str(tmpdir.join('file.txt')), 'rb') as fh:
+        assert internetarchive.utils.get_md5(fh, cache) == \
+            '9473fdd0d880a43c21b7778d34872157'
+
+
+def test_upload_journal(tmpdir):
+    path = str(tmpdir.join('test.txt'))
+    with open(path, 'w') as fh:
+        fh.write('foo')
+    journal_path = str(tmpdir.join('journal'))
+    journal = internetarchive.utils.UploadJournal(journal_path)
+    journal.record('nasa', 'test.txt', path, 'acbd18db4cc2f85cedef654fccc4a4d8')
+    journal.record('nasa', 'stdin.txt', None)
+    assert journal.is_uploaded('nasa', 'test.txt', path)
+    assert not journal.is_uploaded('nasa', 'other.txt', path)
+    journal.close()
+    # Simulate a run interrupted while writing.
+    with open(journal_path, 'a') as fh:
+        fh.write('{"identifier": "nasa", "key": "other.txt"')
+
+    journal = internetarchive.utils.UploadJournal(journal_path)
+    assert not journal.is_uploaded('nasa', 'test.txt', path)
+    journal = internetarchive.utils.UploadJournal(journal_path, resume=True)
+    assert journal.is_uploaded('nasa', 'test.txt', path)
+    assert not journal.is_uploaded('nasa', 'other.txt', path)
+    journal.record('nasa', 'new.txt', path, status='skipped')
+    journal.close()
+    with open(journal_path) as fh:
+        lines = fh.read().splitlines()
+    assert len(lines) == 3
+    assert '"status": "skipped"' in lines[-1]
+
+    # Changed files are uploaded again.
+    with open(path, 'w') as fh:
+        fh.write('bar!')
+    journal = internetarchive.utils.UploadJournal(journal_path, resume=True)
+    assert not journal.is_uploaded('nasa', 'test.txt', path)
+
+
+def test_checksums(nasa_meta_xml):
+    data = nasa_meta_xml.encode('utf-8')
+    expected = dict(md5='0e339f4a29a8bc42303813cbec9243e5',
+                    sha1='2fbcd566449fbd717b395607c9b79ff72ded8398',
+                    crc32='3a41fbda')
+    checksums = internetarchive.utils.Checksums()
+    checksums.update(data[:100])
+    checksums.update(data[100:])
+    assert checksums.hexdigests() == expected
+    assert internetarchive.utils.get_checksums(six.BytesIO(data)).hexdigests() == expected
+    partial = internetarchive.utils.get_checksums(six.BytesIO(data), 100)
+    assert partial.hexdigests()['md5'] == internetarchive.utils.get_md5(
+        six.BytesIO(data[:100]))
+
+
+@pytest.mark.skipif(six.PY2, reason='iterable request bodies require Python 3')
+def test_mmap_file_adapter(tmpdir):
+    content = os.urandom(2500)
+    path = str(tmpdir.join('test.bin'))
+    with open(path, 'wb') as fh:
+        fh.write(content)
+    received = []
+
+    class Handler(BaseHTTPServer.BaseHTTPRequestHandler):
+        def do_PUT(self):
+            received.append(self.rfile.read(int(self.headers['Content-Length'])))
+            self.send_response(200)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    server = BaseHTTPServer.HTTPServer(('127.0.0.1', 0), Handler)
+    t = threading.Thread(target=server.handle_request)
+    t.daemon = True
+    t.start()
+
+    sent = []
+    with open(path, 'rb') as fh:
+        body = internetarchive.utils.MmapFileAdapter(fh, chunk_size=1000,
+                                                     callback=sent.append, md5=True)
+        assert len(body) == 2500
+        assert all(isinstance(chunk, memoryview) for chunk in body)
+        del sent[:]
+        r = requests.put('http://127.0.0.1:{0}/'.format(server.server_address[1]),
+                         data=body)
+        body.close()
+    t.join()
+    server.server_close()
+    assert r.status_code == 200
+    assert received == [content]
+    assert sent == [1000, 2000, 2500]
+    assert body.hexdigest() == hashlib.md5(content).hexdigest()
+
+
+def test_rate_limiter():
+    limiter = internetarchive.utils.RateLimiter(max_rate=10, backoff=.2)
+    epoch = limiter.acquire()
+    delay = limiter.throttle(epoch, max_delay=.05)
+    assert .025 <= delay <= .05
+    assert limiter.rate == 5
+    # Throttles of requests sent before the last throttle are ignored.
+    limiter.throttle(epoch)
+    assert limiter.rate == 5
+    assert limiter.throttles == 1
+
+    epoch = limiter.acquire()
+    assert epoch == 1
+    limiter.success(epoch)
+    assert limiter.rate == 5.1
+    assert limiter.throttles == 0
+
+
+def test_rate_limiter_probe():
+    limiter = internetarchive.utils.RateLimiter()
+    calls = []
+    started = threading.Event()
+    release = threading.Event()
+
+    def check():
+        calls.append(1)
+        started.set()
+        release.wait()
+        return True
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(limiter.probe(check)))
+               for _ in range(4)]
+    threads[0].start()
+    started.wait()
+    for t in threads[1:]:
+        t.start()
+    release.set()
+    for t in threads:
+        t.join()
+    assert results == [True] * 4
+    assert len(calls) == 1
+
+    # A throttle starts a new epoch, which is probed again.
+    limiter.throttle(limiter.epoch, max_delay=0)
+    assert limiter.probe(check) is True
+    assert len(calls) == 2
+
+
+def test_iter_threaded():
+    results = internetarchive.utils.iter_threaded(lambda x: x * 2, range(50), 4)
+    assert list(results) == [x * 2 for x in range(50)]
+
+    results = internetarchive.utils.iter_threaded(lambda x: x * 2, range(50), 4,
+                                                  ordered=False)
+    assert sorted(results) == [x * 2 for x in range(50)]
+
+
+def test_iter_threaded_exception():
+    def f(x):
+        if x == 3:
+            raise ValueError('bad value')
+        return x
+
+    results = internetarchive.utils.iter_threaded(f, range(10), 2)
+    assert [next(results) for _ in range(3)] == [0, 1, 2]
+    try:
+        next(results)
+    except Exception as exc:
+        assert isinstance(exc, ValueError)
+    else:
+        assert False
+
+
+def test_iter_threaded_base_exception():
+    def f(x):
+        if x == 3:
+            sys.exit(2)
+        return x
+
+    # Workers pass on exceptions not derived from Exception as well, so
+    # the consumer doesn't wait forever for their results.
+    results = internetarchive.utils.iter_threaded(f, range(10), 2)
+    assert [next(results) for _ in range(3)] == [0, 1, 2]
+    with pytest.raises(SystemExit):
+        next(results)
+
+
+def test_iter_threaded_bounded_window():
+    consumed = []
+
+    def source():
+        for i in range(1000):
+            consumed.append(i)
+            yield i
+
+    results = internetarchive.utils.iter_threaded(lambda x: x, source(), 2, window=4)
+    assert next(results) == 0
+    results.close()
+    assert len(consumed) <= 5
+
+
+def test_json_stream():
+    doc = {'responseHeader': {'status': 0},
+           'response': {'numFound': 12345, 'docs': [
+               {'identifier': 'item{0}'.format(i), 'title': u'ȧƈƈḗƞŧḗḓ {0}'.format(i),
+                'downloads': i * 1000, 'score': 1.5, 'private': i % 2 == 0, 'x': None}
+               for i in range(20)]},
+           'trailer': [1, 2]}
+    data = json.dumps(doc, indent=1, ensure_ascii=False).encode('utf-8')
+    read = []
+
+    def chunks(size):
+        for i in range(0, len(data), size):
+            read.append(i)
+            yield data[i:i + size]
+
+    for size in (1, 7, 1024):
+        del read[:]
+        stream = internetarchive.utils.JSONStream(chunks(size))
+        result = {}
+        for key in stream.members():
+            if key != 'response':
+                result[key] = stream.value()
+                continue
+            for key in stream.members():
+                if key != 'docs':
+                    result[key] = stream.value()
+                    continue
+                docs = stream.items()
+                assert next(docs) == doc['response']['docs'][0]
+                if size < 1024:
+                    # Docs are yielded before all the data has been read.
+                    assert len(read) < len(data) // size
+                assert list(docs) == doc['response']['docs'][1:]
+        assert result == {'responseHeader': {'status': 0}, 'numFound': 12345,
+                          'trailer': [1, 2]}
+
+    # Numbers split after any of their characters.
+    for number in (b'-12.5e+3', b'1.25E-2', b'0', b'-7', b'123456'):
+        data = b'[' + number + b', 2]'
+        for i in range(1, len(data)):
+            stream = internetarchive.utils.JSONStream([data[:i], data[i:]])
+            assert list(stream.items()) == [json.loads(number.decode('ascii')), 2]
+        stream = internetarchive.utils.JSONStream([b'{"a": ' + number + b'}'])
+        assert next(stream.members()) == 'a'
+        assert stream.value() == json.loads(number.decode('ascii'))
+
+    stream = internetarchive.utils.JSONStream([b'{"a": [1, 2'])
+    assert next(stream.members()) == 'a'
+    with pytest.raises(ValueError):
+        stream.value()
+
+
 def test_map2x():
     keys = ('first', 'second')
     columns = ('first', 'second')